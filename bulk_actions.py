@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+分块批量操作
+Chunked Bulk Actions
+
+目标ID (显式列表或筛选条件) 先写入临时表 temp.bulk_selection，再按ID区间
+分块执行 UPDATE ... WHERE id IN (SELECT id FROM temp.bulk_selection ...)；
+每条语句的参数个数固定，不受SQLite变量上限影响，每块完成后产出进度
+Target IDs (an explicit list or a filter) are loaded into the
+temp.bulk_selection table, then each action runs as
+UPDATE ... WHERE id IN (SELECT id FROM temp.bulk_selection ...) per id
+range. Statement parameter counts stay fixed however many rows are
+selected, and progress is reported after every chunk
+"""
+
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+# 每块处理的目标行数
+BULK_CHUNK_SIZE = 5000
+
+# 写入临时表时每次 executemany 的ID数
+_LOAD_BATCH_SIZE = 10000
+
+# 当前块的目标ID子查询，替换语句中的 {selection}；两个参数为块的起止ID
+CHUNK_SELECTION_SQL = '(SELECT id FROM temp.bulk_selection WHERE id BETWEEN ? AND ?)'
+
+
+def filter_selection_sql(table: str, alias: str, filter_sql: str) -> str:
+    """按筛选条件 (" AND ..." 形式，同列表接口) 加载目标ID的语句"""
+    return f'''
+        INSERT OR IGNORE INTO temp.bulk_selection (id)
+        SELECT {alias}.id FROM {table} {alias} WHERE 1=1{filter_sql}
+    '''
+
+
+class BulkSelection:
+    """当前连接上的批量操作目标集合 (临时表，结束时删除)
+
+    用法:
+        with BulkSelection(conn, 'products') as selection:
+            selection.add_ids(ids)
+            for progress in selection.run("UPDATE products SET ... WHERE id IN {selection}"):
+                ...
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table: str, chunk_size: int = BULK_CHUNK_SIZE):
+        self.conn = conn
+        self.table = table
+        self.chunk_size = chunk_size
+
+    def open(self):
+        """创建 (或清空) 临时表"""
+        self.conn.execute('DROP TABLE IF EXISTS temp.bulk_selection')
+        self.conn.execute('CREATE TEMP TABLE bulk_selection (id INTEGER PRIMARY KEY)')
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self.conn.execute('DROP TABLE IF EXISTS temp.bulk_selection')
+        except sqlite3.Error:
+            pass
+
+    def add_ids(self, ids: Iterable) -> int:
+        """加入显式ID (去重)，非整数ID抛出 ValueError；返回集合大小"""
+        batch = []
+        for value in ids:
+            if isinstance(value, bool):
+                raise ValueError(f'Invalid ID: {value!r}')
+            try:
+                batch.append((int(value),))
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid ID: {value!r}')
+            if len(batch) >= _LOAD_BATCH_SIZE:
+                self._load(batch)
+                batch = []
+        self._load(batch)
+        return self.count()
+
+    def _load(self, batch: List):
+        if batch:
+            self.conn.executemany('INSERT OR IGNORE INTO temp.bulk_selection (id) VALUES (?)', batch)
+
+    def add_filter(self, filter_sql: str, params: Sequence, alias: str) -> int:
+        """按筛选条件 (" AND ..." 形式，同列表接口) 加入ID；返回集合大小"""
+        self.conn.execute(filter_selection_sql(self.table, alias, filter_sql), list(params))
+        return self.count()
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM temp.bulk_selection').fetchone()[0]
+
+    def missing(self) -> int:
+        """集合中在目标表里不存在的ID个数"""
+        return self.conn.execute(f'''
+            SELECT COUNT(*) FROM temp.bulk_selection s
+            WHERE NOT EXISTS (SELECT 1 FROM {self.table} t WHERE t.id = s.id)
+        ''').fetchone()[0]
+
+    def chunks(self) -> Iterator[tuple]:
+        """按ID顺序划分的 (起始ID, 结束ID, 行数) 区间"""
+        last_id = None
+        while True:
+            row = self.conn.execute('''
+                SELECT MIN(id), MAX(id), COUNT(*) FROM (
+                    SELECT id FROM temp.bulk_selection WHERE id > ? ORDER BY id LIMIT ?
+                )
+            ''', (last_id if last_id is not None else -2 ** 63, self.chunk_size)).fetchone()
+            if not row[2]:
+                return
+            yield row
+            last_id = row[1]
+
+    def run(self, sql: str, params: Sequence = ()) -> Iterator[Dict]:
+        """按块执行语句，每块后产出进度
+
+        sql 中的 {selection} 替换为当前块的子查询，其两个参数追加在 params 之后，
+        因此 {selection} 之后不能再有其他参数。调用方负责提交或回滚
+        """
+        statement = sql.format(selection=CHUNK_SELECTION_SQL)
+        total = self.count()
+        processed = affected = 0
+        for number, (first_id, last_id, rows) in enumerate(list(self.chunks()), 1):
+            cursor = self.conn.execute(statement, list(params) + [first_id, last_id])
+            processed += rows
+            affected += max(cursor.rowcount, 0)
+            yield {'chunk': number, 'processed': processed, 'total': total, 'affected': affected}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+询盘跟进邮件群发
+Inquiry Follow-up Campaigns
+
+按筛选条件 (或ID列表) 选出询盘后，在后台任务中用一条 INSERT ... SELECT 按块
+把每位客户的跟进邮件写入发件箱 (priority = 1，受 EMAIL_BULK_RATE 限速，排在
+事务邮件之后)。每批邮件发送成功后，在标记已发送的同一事务中批量写入
+inquiry_followups 记录并更新询盘的 last_contact_at
+Inquiries are selected by a filter (or an ID list) and a background job
+queues one follow-up per recipient into the email outbox with a chunked
+INSERT ... SELECT (priority 1: throttled by EMAIL_BULK_RATE and sent after
+transactional mail). When a batch has been sent, its inquiry_followups rows
+and the inquiries' last_contact_at are written in the same transaction that
+marks the batch sent
+"""
+
+import json
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from email_outbox import PRIORITY_BULK, on_sent
+
+CAMPAIGN_STATUSES = ('queuing', 'sending', 'cancelled', 'failed')
+
+# 跟进记录的 action_type (见 inquiry_followups)
+FOLLOWUP_ACTION_TYPE = 'email'
+
+# 活动在发件箱中各状态 (已发送除外) 的邮件数
+MESSAGE_COUNTS_SQL = '''
+    SELECT status, COUNT(*) FROM email_outbox WHERE campaign_id = ? AND status <> 'sent' GROUP BY status
+'''
+
+
+def create_campaign(conn: sqlite3.Connection, name: str, followup_type: str, selection: Dict,
+                    created_by: int, job_id: Optional[str] = None) -> int:
+    """创建活动记录 (状态 queuing，不提交)，返回活动ID"""
+    cursor = conn.execute('''
+        INSERT INTO email_campaigns (name, followup_type, selection, created_by, job_id) VALUES (?, ?, ?, ?, ?)
+    ''', (name, followup_type, json.dumps(selection, ensure_ascii=False), created_by, job_id))
+    return cursor.lastrowid
+
+
+def outbox_statement(campaign_id: int, followup_type: str) -> Tuple[str, List]:
+    """把当前块中询盘的跟进邮件写入发件箱的语句 (用于 BulkSelection.run)
+
+    同一邮箱只发一封 (取最新的询盘)，包括与之前各块中已入队的邮件去重
+    """
+    return ('''
+        INSERT INTO email_outbox (template, recipient, context, inquiry_id, campaign_id, priority)
+        SELECT 'inquiry_followup', i.email,
+               json_object('name', i.name, 'product_interest', i.product_interest,
+                           'language', i.language, 'followup_type', ?),
+               MAX(i.id), ?, ?
+        FROM inquiries i
+        WHERE i.email LIKE '%_@_%'
+          AND NOT EXISTS (SELECT 1 FROM email_outbox o WHERE o.campaign_id = ? AND o.recipient = i.email)
+          AND i.id IN {selection}
+        GROUP BY i.email
+    ''', [followup_type, campaign_id, PRIORITY_BULK, campaign_id])
+
+
+def finish_queuing(conn: sqlite3.Connection, campaign_id: int, total_selected: int, queued_count: int) -> bool:
+    """入队完成: 状态改为 sending (不提交)；入队期间活动已被取消时返回 False"""
+    return conn.execute('''
+        UPDATE email_campaigns SET status = 'sending', total_selected = ?, queued_count = ?,
+            queued_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'queuing'
+    ''', (total_selected, queued_count, campaign_id)).rowcount > 0
+
+
+def set_status(conn: sqlite3.Connection, campaign_id: int, status: str):
+    conn.execute('UPDATE email_campaigns SET status = ? WHERE id = ?', (status, campaign_id))
+
+
+def cancel_campaign(conn: sqlite3.Connection, campaign_id: int) -> Optional[int]:
+    """取消尚未发送的邮件 (不提交)；活动不存在时返回 None，否则返回取消的邮件数"""
+    if conn.execute('SELECT 1 FROM email_campaigns WHERE id = ?', (campaign_id,)).fetchone() is None:
+        return None
+    cancelled = conn.execute('''
+        UPDATE email_outbox SET status = 'cancelled', locked_until = NULL
+        WHERE campaign_id = ? AND status = 'pending'
+    ''', (campaign_id,)).rowcount
+    conn.execute('''
+        UPDATE email_campaigns SET status = 'cancelled' WHERE id = ? AND status IN ('queuing', 'sending')
+    ''', (campaign_id,))
+    return cancelled
+
+
+def _with_message_counts(conn: sqlite3.Connection, campaigns: List[Dict]) -> List[Dict]:
+    """附加发件箱中各状态的邮件数 (已发送数取 sent_count，发件箱会清理旧的已发送邮件)"""
+    for campaign in campaigns:
+        counts = {'pending': 0, 'sending': 0, 'dead': 0, 'cancelled': 0}
+        for row in conn.execute(MESSAGE_COUNTS_SQL, (campaign['id'],)):
+            counts[row[0]] = row[1]
+        counts['sent'] = campaign['sent_count']
+        campaign['messages'] = counts
+        campaign['selection'] = json.loads(campaign['selection']) if campaign['selection'] else None
+        campaign['completed'] = campaign['status'] == 'sending' and not (counts['pending'] or counts['sending'])
+    return campaigns
+
+
+def get_campaign(conn: sqlite3.Connection, campaign_id: int) -> Optional[Dict]:
+    row = conn.execute('SELECT * FROM email_campaigns WHERE id = ?', (campaign_id,)).fetchone()
+    if row is None:
+        return None
+    return _with_message_counts(conn, [dict(row)])[0]
+
+
+def list_campaigns(conn: sqlite3.Connection, limit: int = 50) -> List[Dict]:
+    rows = conn.execute('SELECT * FROM email_campaigns ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    return _with_message_counts(conn, [dict(row) for row in rows])
+
+
+@on_sent('inquiry_followup')
+def record_followups(conn: sqlite3.Connection, sent: List[Tuple[sqlite3.Row, str]]):
+    """一批跟进邮件发送成功: 批量写入跟进记录、更新联系时间和活动的已发送数"""
+    campaign_messages = [(message, subject) for message, subject in sent
+                         if message['campaign_id'] is not None and message['inquiry_id'] is not None]
+    conn.executemany(f'''
+        INSERT INTO inquiry_followups (inquiry_id, user_id, action_type, subject, notes, created_at)
+        SELECT ?, created_by, '{FOLLOWUP_ACTION_TYPE}', ?, 'Campaign #' || id || ': ' || name, CURRENT_TIMESTAMP
+        FROM email_campaigns WHERE id = ?
+    ''', [(message['inquiry_id'], subject, message['campaign_id']) for message, subject in campaign_messages])
+
+    inquiry_ids = sorted({message['inquiry_id'] for message, _ in sent if message['inquiry_id'] is not None})
+    if inquiry_ids:
+        conn.execute(f'''
+            UPDATE inquiries SET first_response_at = COALESCE(first_response_at, CURRENT_TIMESTAMP),
+                last_contact_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({','.join('?' * len(inquiry_ids))})
+        ''', inquiry_ids)
+
+    sent_per_campaign: Dict[int, int] = {}
+    for message, _ in sent:
+        if message['campaign_id'] is not None:
+            sent_per_campaign[message['campaign_id']] = sent_per_campaign.get(message['campaign_id'], 0) + 1
+    conn.executemany('UPDATE email_campaigns SET sent_count = sent_count + ? WHERE id = ?',
+                     [(count, campaign_id) for campaign_id, count in sent_per_campaign.items()])
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+数据库连接池
+SQLite Connection Pool
+
+为每个工作线程提供一个长期复用、预先配置好的SQLite连接，
+由 integrated_server.get_db() 与 DatabaseManager 共享
+Hands out one long-lived, pre-configured SQLite connection per worker thread,
+shared by integrated_server.get_db() and DatabaseManager
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+import logging
+from typing import Dict, Optional
+
+DEFAULT_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DEFAULT_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DEFAULT_CHECKPOINT_INTERVAL = float(os.environ.get('DB_CHECKPOINT_INTERVAL', 300))
+
+# 连接创建时应用的PRAGMA配置，可通过 DB_PRAGMA_<NAME> 环境变量覆盖
+# PRAGMA profile applied once per new connection (override with DB_PRAGMA_<NAME>)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',        # 读写并发: 写入不再阻塞读取
+    'synchronous': 'NORMAL',      # WAL模式下安全且更少fsync
+    'busy_timeout': 5000,         # 毫秒，遇锁时等待而不是立即报错
+    'mmap_size': 268435456,       # 256MB 内存映射读取
+    'cache_size': -20000,         # 负数表示KiB，约20MB页缓存
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+
+def load_pragma_profile(overrides: Optional[Dict] = None) -> Dict:
+    """合并默认PRAGMA配置、环境变量与显式覆盖"""
+    profile = {}
+    for name, value in DEFAULT_PRAGMAS.items():
+        profile[name] = os.environ.get(f'DB_PRAGMA_{name.upper()}', value)
+    if overrides:
+        profile.update(overrides)
+    return profile
+
+
+class _ThreadSlot:
+    """线程持有的连接槽位 (线程退出时被回收)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.finalizer = None
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str = 'database.db', max_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_POOL_TIMEOUT, pragmas: Optional[Dict] = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = load_pragma_profile(pragmas)
+        self.logger = logging.getLogger(__name__)
+        self._checkpoint_thread = None
+        self._checkpoint_stop = threading.Event()
+        self.last_checkpoint = None
+
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._counters = {
+            'checkouts': 0,
+            'reuses': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'checkpoints': 0,
+        }
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建并配置新连接"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self._counters[key] += amount
+
+    def _checkout(self) -> sqlite3.Connection:
+        """从空闲队列取出连接，必要时新建或等待"""
+        try:
+            conn = self._idle.get_nowait()
+            self._count('reuses')
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._create_connection()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # 连接池已满，等待其他线程归还
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            self._count('timeouts')
+            raise sqlite3.OperationalError(
+                f'Connection pool exhausted ({self.max_size} connections in use)'
+            )
+        finally:
+            with self._lock:
+                self._counters['waits'] += 1
+                self._counters['wait_time_ms'] += (time.perf_counter() - started) * 1000
+
+        self._count('reuses')
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """获取当前线程的连接 (同一线程内重复调用返回同一连接)"""
+        slot = getattr(self._local, 'slot', None)
+        if slot is not None:
+            return slot.conn
+
+        conn = self._checkout()
+        self._count('checkouts')
+
+        slot = _ThreadSlot(conn)
+        # 线程未调用 release() 就退出时，将连接归还连接池
+        slot.finalizer = weakref.finalize(slot, self._reclaim, conn)
+        self._local.slot = slot
+        return conn
+
+    def release(self):
+        """归还当前线程的连接，未提交的事务将被回滚"""
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            return
+
+        self._local.slot = None
+        # 取消线程退出时的回收回调，直接归还连接
+        slot.finalizer.detach()
+        self._reclaim(slot.conn)
+
+    def _reclaim(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Discarding broken pooled connection: {e}")
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+
+        self._idle.put(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    # ================================================================
+    # WAL检查点 / WAL Checkpointing
+    # ================================================================
+
+    def checkpoint(self, mode: str = 'TRUNCATE') -> Optional[Dict]:
+        """执行WAL检查点，将WAL内容写回主数据库文件并截断WAL"""
+        held = getattr(self._local, 'slot', None) is not None
+        conn = self.acquire()
+        try:
+            row = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            if not held:
+                self.release()
+
+        self.last_checkpoint = {
+            'mode': mode,
+            'busy': row[0],
+            'wal_pages': row[1],
+            'checkpointed_pages': row[2],
+            'at': time.time(),
+        }
+        self._count('checkpoints')
+        return self.last_checkpoint
+
+    def start_checkpoint_job(self, interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        """启动后台定期检查点任务 (interval <= 0 时不启动)"""
+        if interval <= 0 or str(self.pragmas.get('journal_mode')).upper() != 'WAL':
+            return
+        if self._checkpoint_thread and self._checkpoint_thread.is_alive():
+            return
+
+        def run():
+            while not self._checkpoint_stop.wait(interval):
+                try:
+                    self.checkpoint()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"WAL checkpoint failed: {e}")
+
+        self._checkpoint_stop.clear()
+        self._checkpoint_thread = threading.Thread(target=run, name='wal-checkpoint', daemon=True)
+        self._checkpoint_thread.start()
+
+    def stop_checkpoint_job(self):
+        """停止后台检查点任务"""
+        self._checkpoint_stop.set()
+
+    def stats(self) -> Dict:
+        """连接池统计信息"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = self._created
+        stats['max_size'] = self.max_size
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['size'] - stats['idle']
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 2)
+        stats['last_checkpoint'] = self.last_checkpoint
+        return stats
+
+
+# 按数据库路径注册的连接池
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str = 'database.db') -> ConnectionPool:
+    """获取 (或创建) 指定数据库文件的连接池"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[key] = pool
+        return pool
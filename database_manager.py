@@ -12,18 +12,32 @@ import json
 from datetime import datetime, date
 from typing import Dict, List, Optional, Any, Tuple
 import logging
+from connection_pool import get_pool
+from response_cache import response_cache
+from pagination import keyset_clause, keyset_page
+from stats_engine import StatsEngine
+from email_outbox import enqueue_emails
+
+# 产品可批量加载的子集合 / Child collections that can be batch-loaded with products
+PRODUCT_CHILD_COLLECTIONS = ('images', 'applications')
+
+# 单条 IN (...) 查询的最大参数个数 (低于旧版SQLite的999变量上限)
+IN_CLAUSE_CHUNK_SIZE = 500
 
 class DatabaseManager:
     def __init__(self, db_path='database.db'):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
         self.logger = logging.getLogger(__name__)
+        self.stats = StatsEngine(self)
     
     def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        """获取当前线程的连接 (来自连接池)"""
+        return self.pool.acquire()
+    
+    def release_connection(self):
+        """归还当前线程的连接"""
+        self.pool.release()
     
     def execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = True):
         """执行查询"""
@@ -62,8 +76,9 @@ class DatabaseManager:
         return [dict(row) for row in rows]
     
     def get_products(self, category_id: Optional[int] = None, active_only: bool = True, 
-                    featured_only: bool = False, limit: Optional[int] = None) -> List[Dict]:
-        """获取产品列表"""
+                    featured_only: bool = False, limit: Optional[int] = None,
+                    include: Tuple[str, ...] = PRODUCT_CHILD_COLLECTIONS) -> List[Dict]:
+        """获取产品列表 (include 指定需要批量加载的子集合，传空元组则跳过)"""
         conditions = []
         params = []
         
@@ -91,18 +106,58 @@ class DatabaseManager:
         """
         
         rows = self.execute_query(query, tuple(params))
-        products = []
-        
-        for row in rows:
-            product = dict(row)
-            # 获取产品图片
-            product['images'] = self.get_product_images(product['id'])
-            # 获取产品应用场景
-            product['applications'] = self.get_product_applications(product['id'])
-            products.append(product)
+        products = [dict(row) for row in rows]
+        
+        return self.load_product_children(products, include)
+    
+    def load_product_children(self, products: List[Dict],
+                              include: Tuple[str, ...] = PRODUCT_CHILD_COLLECTIONS) -> List[Dict]:
+        """批量加载产品图片和应用场景 (每个子集合一条 IN 查询，避免N+1)"""
+        if not products or not include:
+            return products
+        
+        unknown = set(include) - set(PRODUCT_CHILD_COLLECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown product collections: {', '.join(sorted(unknown))}")
+        
+        products_by_id = {}
+        for product in products:
+            for collection in include:
+                product[collection] = []
+            products_by_id[product['id']] = product
+        
+        product_ids = list(products_by_id)
+        
+        if 'images' in include:
+            rows = self.fetch_in("""
+                SELECT * FROM product_images 
+                WHERE product_id IN ({placeholders}) 
+                ORDER BY product_id, is_primary DESC, sort_order
+            """, product_ids)
+            for row in rows:
+                products_by_id[row['product_id']]['images'].append(dict(row))
+        
+        if 'applications' in include:
+            rows = self.fetch_in("""
+                SELECT * FROM product_applications 
+                WHERE product_id IN ({placeholders}) 
+                ORDER BY product_id, sort_order
+            """, product_ids)
+            for row in rows:
+                products_by_id[row['product_id']]['applications'].append(dict(row))
         
         return products
     
+    def fetch_in(self, query: str, ids: List, params: tuple = ()) -> List:
+        """执行带 IN ({placeholders}) 的查询，ID过多时分块执行"""
+        rows = []
+        for start in range(0, len(ids), IN_CLAUSE_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+            placeholders = ','.join(['?'] * len(chunk))
+            rows.extend(self.execute_query(query.format(placeholders=placeholders),
+                                           tuple(params) + tuple(chunk)))
+        return rows
+    
     def get_product_by_id(self, product_id: int) -> Optional[Dict]:
         """根据ID获取产品"""
         query = """
@@ -117,11 +172,7 @@ class DatabaseManager:
         if not row:
             return None
         
-        product = dict(row)
-        product['images'] = self.get_product_images(product_id)
-        product['applications'] = self.get_product_applications(product_id)
-        
-        return product
+        return self.load_product_children([dict(row)])[0]
     
     def get_product_by_sku(self, sku: str) -> Optional[Dict]:
         """根据SKU获取产品"""
@@ -136,11 +187,7 @@ class DatabaseManager:
         if not row:
             return None
         
-        product = dict(row)
-        product['images'] = self.get_product_images(product['id'])
-        product['applications'] = self.get_product_applications(product['id'])
-        
-        return product
+        return self.load_product_children([dict(row)])[0]
     
     def get_product_images(self, product_id: int) -> List[Dict]:
         """获取产品图片"""
@@ -200,7 +247,9 @@ class DatabaseManager:
             product_data.get('sort_order', 0)
         )
         
-        return self.execute_query(query, params, fetch_all=False)
+        product_id = self.execute_query(query, params, fetch_all=False)
+        response_cache.invalidate('products')
+        return product_id
     
     # ================================================================
     # 询盘管理 / Inquiry Management
@@ -230,6 +279,32 @@ class DatabaseManager:
         rows = self.execute_query(query, tuple(params))
         return [dict(row) for row in rows]
     
+    def get_inquiries_page(self, status: Optional[str] = None, limit: int = 20,
+                           cursor: Optional[Dict] = None) -> Tuple[List[Dict], Dict]:
+        """游标分页获取询盘 (按 created_at, id 倒序)"""
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append("i.status = ?")
+            params.append(status)
+        
+        keyset_condition, keyset_params, order_by = keyset_clause('i', cursor)
+        where_clause = "WHERE 1=1 " + "".join(f" AND {c}" for c in conditions) + keyset_condition
+        
+        query = f"""
+            SELECT i.*, u.username as assigned_user
+            FROM inquiries i
+            LEFT JOIN users u ON i.assigned_to = u.id
+            {where_clause}
+            ORDER BY {order_by}
+            LIMIT ?
+        """
+        
+        rows = self.execute_query(query, tuple(params + keyset_params + [limit + 1]))
+        rows, pagination = keyset_page(rows, cursor, limit)
+        return [dict(row) for row in rows], pagination
+    
     def get_inquiry_by_id(self, inquiry_id: int) -> Optional[Dict]:
         """根据ID获取询盘"""
         query = """
@@ -245,11 +320,12 @@ class DatabaseManager:
         
         inquiry = dict(row)
         inquiry['followups'] = self.get_inquiry_followups(inquiry_id)
+        inquiry['tags'] = self.get_inquiry_tags([inquiry_id])[inquiry_id]
         
         return inquiry
     
-    def create_inquiry(self, inquiry_data: Dict) -> int:
-        """创建询盘"""
+    def create_inquiry(self, inquiry_data: Dict, notifications: List[Tuple[str, str, Dict]] = ()) -> int:
+        """创建询盘；notifications 中的邮件 (模板, 收件人, 上下文) 在同一事务中写入发件箱"""
         query = """
             INSERT INTO inquiries (
                 name, email, company, phone, country, message, product_interest,
@@ -272,7 +348,17 @@ class DatabaseManager:
             inquiry_data.get('language', 'en')
         )
         
-        return self.execute_query(query, params, fetch_all=False)
+        if not notifications:
+            return self.execute_query(query, params, fetch_all=False)
+        
+        try:
+            with self.get_connection() as conn:
+                inquiry_id = conn.execute(query, params).lastrowid
+                enqueue_emails(conn, notifications, inquiry_id)
+            return inquiry_id
+        except Exception as e:
+            self.logger.error(f"Database query error: {e}")
+            raise
     
     def update_inquiry_status(self, inquiry_id: int, status: str, user_id: Optional[int] = None) -> bool:
         """更新询盘状态"""
@@ -305,6 +391,27 @@ class DatabaseManager:
         rows = self.execute_query(query, (inquiry_id,))
         return [dict(row) for row in rows]
     
+    def get_inquiry_tags(self, inquiry_ids: List[int]) -> Dict[int, List[str]]:
+        """批量获取询盘标签: {询盘ID: [标签]}"""
+        tags = {inquiry_id: [] for inquiry_id in inquiry_ids}
+        rows = self.fetch_in("""
+            SELECT inquiry_id, tag FROM inquiry_tags
+            WHERE inquiry_id IN ({placeholders})
+            ORDER BY inquiry_id, tag
+        """, list(tags))
+        for row in rows:
+            tags[row['inquiry_id']].append(row['tag'])
+        return tags
+    
+    def get_inquiry_tag_counts(self) -> List[Dict]:
+        """所有标签及使用次数"""
+        query = """
+            SELECT tag, COUNT(*) as count FROM inquiry_tags
+            GROUP BY tag
+            ORDER BY count DESC, tag
+        """
+        return [dict(row) for row in self.execute_query(query)]
+    
     def add_inquiry_followup(self, followup_data: Dict) -> int:
         """添加询盘跟进记录"""
         query = """
@@ -473,6 +580,7 @@ class DatabaseManager:
         
         try:
             self.execute_query(query, params, fetch_all=False)
+            response_cache.invalidate('content')
             return True
         except:
             return False
@@ -502,72 +610,44 @@ class DatabaseManager:
         
         try:
             self.execute_query(query, (setting_key, setting_value), fetch_all=False)
+            response_cache.invalidate('settings')
             return True
         except:
             return False
     
+    def get_data_versions(self, tables: Tuple[str, ...]) -> Dict[str, Dict]:
+        """获取数据表版本 (由触发器在每次写入时递增，用于ETag/Last-Modified)"""
+        placeholders = ','.join(['?'] * len(tables))
+        query = f"""
+            SELECT table_name, version, updated_at FROM data_versions
+            WHERE table_name IN ({placeholders})
+        """
+        rows = self.execute_query(query, tuple(tables))
+        return {row['table_name']: dict(row) for row in rows}
+    
     # ================================================================
     # 统计和分析 / Statistics and Analytics
     # ================================================================
     
     def get_dashboard_stats(self) -> Dict:
-        """获取仪表板统计数据"""
-        stats = {}
-        
-        # 产品统计
-        stats['total_products'] = self.execute_query(
-            "SELECT COUNT(*) as count FROM products WHERE is_active = 1", 
-            fetch_one=True
-        )['count']
+        """获取仪表板统计数据 (来自统计引擎)"""
+        stats = self.stats.dashboard()
         
-        # 询盘统计
-        stats['total_inquiries'] = self.execute_query(
-            "SELECT COUNT(*) as count FROM inquiries", 
-            fetch_one=True
-        )['count']
-        
-        stats['new_inquiries'] = self.execute_query(
-            "SELECT COUNT(*) as count FROM inquiries WHERE status = 'new'", 
-            fetch_one=True
-        )['count']
-        
-        # 案例统计
-        stats['total_cases'] = self.execute_query(
-            "SELECT COUNT(*) as count FROM cases WHERE is_published = 1", 
-            fetch_one=True
-        )['count']
-        
-        # 最近询盘
-        stats['recent_inquiries'] = self.get_inquiries(limit=5)
-        
-        return stats
+        return {
+            'total_products': stats['products']['active'],
+            'total_inquiries': stats['inquiries']['total'],
+            'new_inquiries': stats['inquiries']['new'],
+            'total_cases': stats['cases']['published'],
+            'recent_inquiries': stats['recent_inquiries'],
+        }
     
     def get_inquiry_stats_by_status(self) -> List[Dict]:
         """按状态获取询盘统计"""
-        query = """
-            SELECT status, COUNT(*) as count 
-            FROM inquiries 
-            GROUP BY status 
-            ORDER BY count DESC
-        """
-        
-        rows = self.execute_query(query)
-        return [dict(row) for row in rows]
+        return self.stats.inquiry_report()['status_distribution']
     
     def get_inquiry_stats_by_month(self, months: int = 12) -> List[Dict]:
-        """按月份获取询盘统计"""
-        query = """
-            SELECT 
-                strftime('%Y-%m', created_at) as month,
-                COUNT(*) as count
-            FROM inquiries 
-            WHERE created_at >= date('now', '-{} months')
-            GROUP BY strftime('%Y-%m', created_at)
-            ORDER BY month
-        """.format(months)
-        
-        rows = self.execute_query(query)
-        return [dict(row) for row in rows]
+        """按月份获取询盘统计 (读取按日汇总表)"""
+        return [{'month': row['month'], 'count': row['total']} for row in self.stats.monthly_trend(months)]
     
     # ================================================================
     # 活动日志 / Activity Logs
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+邮件发件箱
+Transactional Email Outbox
+
+待发送的邮件与业务数据 (如询盘) 在同一事务中写入 email_outbox 表，
+请求在提交后立即返回；后台发送线程再渲染模板，每批通过同一SMTP会话
+(mail_transport 连接池) 发送，失败按指数退避重试，超过最大次数后标记为
+dead (死信)，可在后台查看并手动重试
+Outgoing mail is written to the email_outbox table in the same transaction
+as the business data (e.g. the inquiry), so requests return right after the
+commit. A background dispatcher renders each claimed batch and sends it
+over one pooled SMTP session (mail_transport), retrying failures with
+exponential backoff; messages that exhaust their attempts are marked dead
+and can be inspected and retried from the admin API
+
+多个进程可同时运行发送线程: 每条邮件在发送前被原子地领取 (status = 'sending')，
+领取超时 (进程退出) 后重新变为待发送
+Several processes may run dispatchers: each message is claimed atomically
+(status = 'sending') before sending and released again when the claim
+expires (e.g. the process died)
+
+群发邮件 (priority = 1, 如跟进邮件活动) 只在没有到期的事务邮件时领取，并按
+EMAIL_BULK_RATE (封/秒) 令牌桶限速；模板可注册发送成功后的回调，与标记已发送
+在同一事务中批量写入业务记录。令牌桶保存在 email_throttle 表中，在领取事务内更新，
+所有进程共用同一配额
+Bulk mail (priority = 1, e.g. follow-up campaigns) is only claimed after due
+transactional mail and is throttled by a token bucket at EMAIL_BULK_RATE
+messages/second. The bucket lives in the email_throttle table and is
+updated inside the claim transaction, so all processes share one budget.
+Templates may register an on-sent hook that records the business side
+effects in the same transaction that marks the batch sent
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from email_templates import (EscapedFields, get_admin_notification_html, get_html_email_template,
+                             get_inquiry_confirmation_html, get_inquiry_followup_email)
+from mail_transport import MailTransport, build_message, get_transport
+
+logger = logging.getLogger(__name__)
+
+# 每封邮件的最大发送次数，超过后进入死信
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+# 第一次重试前的等待时间 (秒)，之后每次翻倍，最长 EMAIL_RETRY_MAX_DELAY
+EMAIL_RETRY_BASE_DELAY = float(os.environ.get('EMAIL_RETRY_BASE_DELAY', 60))
+EMAIL_RETRY_MAX_DELAY = float(os.environ.get('EMAIL_RETRY_MAX_DELAY', 3600))
+# 没有新邮件时的轮询间隔 (秒)；本进程入队时会立即唤醒发送线程
+EMAIL_POLL_INTERVAL = float(os.environ.get('EMAIL_POLL_INTERVAL', 5))
+# 已发送邮件的保留天数
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 30))
+# 群发邮件 (priority = 1) 每秒最多发送的封数，0 表示不限速
+EMAIL_BULK_RATE = float(os.environ.get('EMAIL_BULK_RATE', 5))
+# 接收询盘通知的管理员邮箱 (逗号分隔)
+ADMIN_NOTIFICATION_EMAILS = [
+    address.strip()
+    for address in os.environ.get('ADMIN_NOTIFICATION_EMAILS', 'sales@lianjin-led.com,admin@lianjin-led.com').split(',')
+    if address.strip()
+]
+
+OUTBOX_STATUSES = ('pending', 'sending', 'sent', 'dead', 'cancelled')
+
+# 邮件优先级: 事务邮件先于群发邮件领取
+PRIORITY_TRANSACTIONAL = 0
+PRIORITY_BULK = 1
+
+# 每次领取的邮件数，以及领取后视为发送失败 (进程退出) 的时间 (秒)
+_CLAIM_BATCH_SIZE = 20
+_CLAIM_TIMEOUT = 300
+
+# 按优先级领取到期邮件 (参数: 优先级, 条数)，走 idx_email_outbox_due
+DUE_MESSAGES_SQL = '''
+    SELECT * FROM email_outbox
+    WHERE status = 'pending' AND priority = ? AND next_attempt_at <= CURRENT_TIMESTAMP
+    ORDER BY next_attempt_at, id LIMIT ?
+'''
+
+
+def _render_inquiry_confirmation(fields: EscapedFields) -> Tuple[str, str, str]:
+    email_data = get_inquiry_confirmation_html(fields)
+    html = get_html_email_template(email_data, 'inquiry_confirmation')
+    return email_data['subject'], 'Thank you for your inquiry! We will respond within 24 hours.', html
+
+
+def _render_admin_notification(fields: EscapedFields) -> Tuple[str, str, str]:
+    email_data = get_admin_notification_html(fields)
+    html = get_html_email_template(email_data, 'admin_notification')
+    return email_data['subject'], f"New inquiry from {fields.data.get('name') or 'Unknown'}", html
+
+
+def _render_inquiry_followup(fields: EscapedFields) -> Tuple[str, str, None]:
+    # 纯文本模板，使用未转义的原始字段
+    email_data = get_inquiry_followup_email(fields.data, fields.data.get('followup_type'))
+    return email_data['subject'], email_data['body'], None
+
+
+# 模板名 -> 渲染函数 (已转义的上下文) -> (subject, 纯文本正文, HTML正文)
+TEMPLATES: Dict[str, Callable[[EscapedFields], Tuple[str, str, Optional[str]]]] = {
+    'inquiry_confirmation': _render_inquiry_confirmation,
+    'admin_notification': _render_admin_notification,
+    'inquiry_followup': _render_inquiry_followup,
+}
+
+# 模板名 -> 发送成功后的回调 (连接, [(邮件行, subject)])，在标记已发送的事务中执行
+SENT_HOOKS: Dict[str, Callable[[sqlite3.Connection, List[Tuple[sqlite3.Row, str]]], None]] = {}
+
+
+def on_sent(template: str):
+    """注册模板发送成功后的回调 (装饰器)"""
+    def register(func):
+        SENT_HOOKS[template] = func
+        return func
+    return register
+
+
+def inquiry_notifications(inquiry_data: Dict) -> List[Tuple[str, str, Dict]]:
+    """新询盘需要发送的邮件: 客户确认 + 每个管理员的通知，返回 (模板, 收件人, 上下文)"""
+    messages = [('inquiry_confirmation', inquiry_data.get('email'), inquiry_data)]
+    messages.extend(('admin_notification', address, inquiry_data) for address in ADMIN_NOTIFICATION_EMAILS)
+    return messages
+
+
+def enqueue_emails(conn: sqlite3.Connection, messages: Iterable[Tuple[str, str, Dict]],
+                   inquiry_id: Optional[int] = None) -> int:
+    """在调用方的事务中写入待发送邮件 (不提交)，返回写入条数"""
+    rows = []
+    for template, recipient, context in messages:
+        if template not in TEMPLATES:
+            raise ValueError(f'Unknown email template: {template}')
+        if not recipient:
+            continue
+        rows.append((template, recipient, json.dumps(context, ensure_ascii=False, default=str), inquiry_id))
+    conn.executemany('''
+        INSERT INTO email_outbox (template, recipient, context, inquiry_id) VALUES (?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次失败后的等待时间 (秒)"""
+    return min(EMAIL_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), EMAIL_RETRY_MAX_DELAY)
+
+
+def render_message(template: str, context) -> Tuple[str, str, Optional[str]]:
+    """渲染一封邮件；context 为字典或 EscapedFields"""
+    renderer = TEMPLATES.get(template)
+    if renderer is None:
+        raise ValueError(f'Unknown email template: {template}')
+    return renderer(context if isinstance(context, EscapedFields) else EscapedFields(context))
+
+
+class OutboxDispatcher:
+    """后台发送线程: 领取到期的邮件，发送，记录结果或安排重试"""
+
+    def __init__(self, db_path: str = 'database.db', transport: Optional[MailTransport] = None):
+        self.db_path = db_path
+        # 未指定时使用本进程共享的发送通道 (MAIL_TRANSPORT)
+        self.transport = transport
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._last_prune = None
+        # 群发邮件令牌用尽时到下一个令牌的等待时间
+        self._throttle_wait = None
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+    # ---- 记录连接 / bookkeeping connection ----
+
+    def _connection(self) -> sqlite3.Connection:
+        """记录连接 (调用方需持有 _conn_lock)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _execute(self, query: str, params=(), fetch: str = None):
+        with self._conn_lock:
+            cursor = self._connection().execute(query, params)
+            if fetch == 'one':
+                return cursor.fetchone()
+            if fetch == 'all':
+                return cursor.fetchall()
+            self._conn.commit()
+            return cursor.rowcount
+
+    # ---- 客户端接口 / client API ----
+
+    def wakeup(self):
+        """有新邮件入队 (事务已提交) 时调用，立即开始发送"""
+        self.start()
+        self._wakeup.set()
+
+    def status_counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(OUTBOX_STATUSES, 0)
+        for row in self._execute('SELECT status, COUNT(*) AS count FROM email_outbox GROUP BY status', fetch='all'):
+            counts[row['status']] = row['count']
+        return counts
+
+    def transport_metrics(self) -> Dict:
+        """发送通道名称、发送计数和每封邮件的耗时分布"""
+        transport = self.transport or get_transport()
+        return dict(transport.metrics.snapshot(), transport=transport.name)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        query = '''
+            SELECT id, template, recipient, inquiry_id, campaign_id, priority, status, attempts, last_error,
+                   next_attempt_at, created_at, sent_at
+            FROM email_outbox
+        '''
+        params = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self._execute(query, params, fetch='all')]
+
+    def retry(self, message_id: int) -> bool:
+        """把死信重新放回队列 (重置发送次数)"""
+        updated = self._execute('''
+            UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'dead'
+        ''', (message_id,))
+        if updated:
+            self.wakeup()
+        return bool(updated)
+
+    # ---- 发送线程 / dispatcher thread ----
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._work, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                self._maintain()
+                messages = self._claim()
+            except sqlite3.Error as e:
+                # email_outbox 表尚未创建 (迁移未执行) 或数据库暂时被锁
+                logger.debug(f'Email outbox poll failed: {e}')
+                messages = []
+
+            if not messages:
+                self._wakeup.wait(min(EMAIL_POLL_INTERVAL, self._throttle_wait or EMAIL_POLL_INTERVAL))
+                self._wakeup.clear()
+                continue
+
+            self.deliver(messages)
+
+    @staticmethod
+    def _bulk_tokens(conn: sqlite3.Connection, now: float) -> float:
+        """补充共享令牌桶 (容量为一秒的配额)，返回当前令牌数；在领取事务中调用"""
+        capacity = max(EMAIL_BULK_RATE, 1.0)
+        row = conn.execute("SELECT tokens, refilled_at FROM email_throttle WHERE name = 'bulk'").fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row['tokens'] + max(now - row['refilled_at'], 0.0) * EMAIL_BULK_RATE)
+
+    def _claim(self) -> List[sqlite3.Row]:
+        """原子地领取一批到期的邮件 (先释放领取超时的): 先事务邮件，剩余名额再按限速领取群发邮件"""
+        with self._conn_lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 释放领取超时的邮件 (发送进程已退出)，本轮即可重新领取
+                conn.execute('''
+                    UPDATE email_outbox SET status = 'pending', locked_until = NULL
+                    WHERE status = 'sending' AND locked_until < CURRENT_TIMESTAMP
+                ''')
+                rows = conn.execute(DUE_MESSAGES_SQL, (PRIORITY_TRANSACTIONAL, _CLAIM_BATCH_SIZE)).fetchall()
+                bulk_limit = _CLAIM_BATCH_SIZE - len(rows)
+                if EMAIL_BULK_RATE > 0:
+                    now = time.time()
+                    tokens = self._bulk_tokens(conn, now)
+                    bulk_limit = min(bulk_limit, int(tokens))
+                bulk = conn.execute(DUE_MESSAGES_SQL, (PRIORITY_BULK, bulk_limit)).fetchall() if bulk_limit > 0 else []
+                rows.extend(bulk)
+                if EMAIL_BULK_RATE > 0:
+                    tokens -= len(bulk)
+                    conn.execute('''
+                        INSERT INTO email_throttle (name, tokens, refilled_at) VALUES ('bulk', ?, ?)
+                        ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, refilled_at = excluded.refilled_at
+                    ''', (tokens, now))
+                    self._throttle_wait = None if tokens >= 1 else (1 - tokens) / EMAIL_BULK_RATE
+                if rows:
+                    conn.execute(f'''
+                        UPDATE email_outbox SET status = 'sending', attempts = attempts + 1,
+                            locked_until = datetime('now', '+{_CLAIM_TIMEOUT} seconds')
+                        WHERE id IN ({','.join('?' * len(rows))})
+                    ''', [row['id'] for row in rows])
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return rows
+
+    def deliver(self, messages: List[sqlite3.Row]) -> int:
+        """渲染一批已领取的邮件，通过同一会话发送并记录结果，返回发送成功的数量"""
+        rendered, claimed = [], []
+        # 同一询盘的多封邮件共用转义结果，发给多个管理员的相同通知只渲染一次
+        contexts, renders = {}, {}
+        for message in messages:
+            context_key = (message['context'], message['inquiry_id'])
+            render_key = (message['template'],) + context_key
+            try:
+                if render_key not in renders:
+                    if context_key not in contexts:
+                        context = json.loads(message['context'])
+                        context['inquiry_id'] = message['inquiry_id']
+                        contexts[context_key] = EscapedFields(context)
+                    renders[render_key] = render_message(message['template'], contexts[context_key])
+                subject, body, html = renders[render_key]
+            except Exception as e:
+                self._failed(message['id'], message['attempts'] + 1, f'{type(e).__name__}: {e}')
+                continue
+            rendered.append(build_message(message['recipient'], subject, body, html))
+            claimed.append(message)
+
+        transport = self.transport or get_transport()
+        errors = transport.send_many(rendered) if rendered else []
+
+        sent = []
+        for message, email, error in zip(claimed, rendered, errors):
+            if error is None:
+                sent.append((message, email['Subject']))
+            else:
+                self._failed(message['id'], message['attempts'] + 1, f'{type(error).__name__}: {error}')
+        if sent:
+            self._mark_sent(sent)
+        logger.debug(f'Email outbox: sent {len(sent)} of {len(messages)} messages')
+        return len(sent)
+
+    def _mark_sent(self, sent: List[Tuple[sqlite3.Row, str]]):
+        """标记已发送，并在同一事务中执行各模板的发送成功回调
+
+        回调失败时仍然标记已发送 (邮件已经发出，不能因此重发)，只记录错误
+        """
+        ids = [message['id'] for message, _ in sent]
+        mark_sent = f'''
+            UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP,
+                last_error = NULL, locked_until = NULL
+            WHERE id IN ({','.join('?' * len(ids))})
+        '''
+        groups: Dict[str, List[Tuple[sqlite3.Row, str]]] = {}
+        for message, subject in sent:
+            if message['template'] in SENT_HOOKS:
+                groups.setdefault(message['template'], []).append((message, subject))
+
+        with self._conn_lock:
+            conn = self._connection()
+            if groups:
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute(mark_sent, ids)
+                    for template, group in groups.items():
+                        SENT_HOOKS[template](conn, group)
+                    conn.commit()
+                    return
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f'Email outbox on-sent hook failed for {len(ids)} messages: {e}')
+            conn.execute(mark_sent, ids)
+            conn.commit()
+
+    def _failed(self, message_id: int, attempts: int, error: str):
+        if attempts >= EMAIL_MAX_ATTEMPTS:
+            logger.error(f'Email #{message_id} dead-lettered after {attempts} attempts: {error}')
+            self._execute('''
+                UPDATE email_outbox SET status = 'dead', last_error = ?, locked_until = NULL WHERE id = ?
+            ''', (error, message_id))
+            return
+
+        delay = retry_delay(attempts)
+        logger.warning(f'Email #{message_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}')
+        self._execute(f'''
+            UPDATE email_outbox SET status = 'pending', last_error = ?, locked_until = NULL,
+                next_attempt_at = datetime('now', '+{int(delay)} seconds')
+            WHERE id = ?
+        ''', (error, message_id))
+
+    def _maintain(self):
+        """定期清理过期的已发送邮件 (至多每小时一次)"""
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+
+        self._execute('''
+            DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < datetime('now', ?)
+        ''', (f'-{EMAIL_OUTBOX_RETENTION_DAYS} days',))
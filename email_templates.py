@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
 """
 邮件模板系统
+Email Templates
+
+HTML模板按 (模板类型, 语言) 预编译为静态片段和插槽并缓存，渲染时只填充插槽；
+询盘字段通过 EscapedFields 每个只转义一次，同一询盘的多封邮件共用
+HTML templates are precompiled per (template type, language) into static
+segments and slots and cached, so a render only fills the slots. Inquiry
+fields are HTML-escaped once each through EscapedFields and shared by all
+emails for the same inquiry
+
+渲染性能测试 / Render benchmark:
+    python email_templates.py --benchmark [iterations]
 """
 
+import html
+import re
+import sys
+import time
+from functools import lru_cache
+
+from mail_transport import DEFAULT_FROM_EMAIL, build_message, get_transport
+
 def get_inquiry_notification_email(inquiry_data):
     """生成询盘通知邮件内容"""
     
@@ -88,97 +107,156 @@ For any questions, please contact us at sales@lianjin-led.com
         }
     }
 
-def get_inquiry_followup_email(inquiry_data, followup_type='general'):
-    """生成询盘跟进邮件模板"""
-    
-    templates = {
-        'quote_sent': {
-            'subject': f"Quote for {inquiry_data.get('product_interest', 'LED Display')} - Lianjin Optoelectronics",
-            'body': f"""
-Dear {inquiry_data.get('name', 'Valued Customer')},
+# ================================================================
+# 预编译模板 / Precompiled templates
+# ================================================================
 
-Thank you for your interest in our LED display solutions.
+# 插槽语法: {{name}}
+_SLOT = re.compile(r'\{\{(\w+)\}\}')
 
-Please find attached our detailed quotation for your {inquiry_data.get('product_interest', 'LED display')} project.
 
-The quote includes:
-- Product specifications and pricing
-- Installation guidelines
-- Warranty information
-- Technical support details
+class CompiledTemplate:
+    """预编译模板: 静态片段和插槽交替存放，渲染时只填充插槽并做一次 join
 
-This quotation is valid for 30 days. If you have any questions or need modifications, please don't hesitate to contact us.
+    constants 中的插槽 (如语言) 在编译时直接并入静态片段
+    """
 
-We look forward to working with you on this project.
+    __slots__ = ('parts', 'slots')
 
-Best regards,
-Sales Team
-Shenzhen Lianjin Optoelectronics Co., Ltd.
-            """.strip()
-        },
-        'technical_response': {
-            'subject': f"Technical Information - {inquiry_data.get('product_interest', 'LED Display')}",
-            'body': f"""
-Dear {inquiry_data.get('name', 'Valued Customer')},
+    def __init__(self, source, **constants):
+        pieces = _SLOT.split(source)
+        parts = [pieces[0]]
+        slots = []
+        for index in range(1, len(pieces), 2):
+            name, text = pieces[index], pieces[index + 1]
+            if name in constants:
+                parts[-1] += str(constants[name]) + text
+            else:
+                slots.append((len(parts), name))
+                parts.extend((None, text))
+        self.parts = parts
+        self.slots = tuple(slots)
 
-Thank you for your technical inquiry about our {inquiry_data.get('product_interest', 'LED display solutions')}.
+    def render(self, values):
+        parts = list(self.parts)
+        for position, name in self.slots:
+            parts[position] = values[name]
+        return ''.join(parts)
 
-Our technical team has prepared detailed information to address your questions:
 
-[Technical details would be inserted here based on the specific inquiry]
+# 需要转义的字符；大多数字段不含这些字符，可跳过 html.escape
+_HTML_SPECIAL = re.compile(r'[&<>"\']')
 
-If you need additional technical specifications or have further questions, please feel free to contact our technical support team.
 
-Best regards,
-Technical Support Team
-Shenzhen Lianjin Optoelectronics Co., Ltd.
-            """.strip()
-        }
-    }
-    
-    return templates.get(followup_type, templates['quote_sent'])
+def escape_field(value):
+    """HTML转义 (不含特殊字符的值原样返回)"""
+    value = str(value)
+    return html.escape(value) if _HTML_SPECIAL.search(value) else value
 
-def get_html_email_template(content_data, template_type='inquiry_confirmation'):
-    """生成HTML邮件模板"""
-    
-    # 基础HTML模板
-    html_template = f"""
+
+# 批量转义时的字段分隔符 (字段中出现该字符时逐个转义)
+_FIELD_SEPARATOR = '\x00'
+
+
+def _budget_range_label(value):
+    return str(value).replace("-", " - ").replace("k", ",000").replace("over-500k", "Over $500,000")
+
+
+def _estimated_value_label(value):
+    try:
+        return f'${value:,}'
+    except (TypeError, ValueError):
+        return str(value)
+
+
+# 模板使用的派生字段: 名称 -> (源字段, 变换)，变换在转义之前完成
+DERIVED_FIELDS = {
+    'inquiry_type_title': ('inquiry_type', lambda value: str(value).title()),
+    'priority_title': ('priority', lambda value: str(value).title()),
+    'source_title': ('source', lambda value: str(value).title()),
+    'language_upper': ('language', lambda value: str(value).upper()),
+    'user_agent_short': ('user_agent', lambda value: str(value)[:100]),
+    'budget_range_label': ('budget_range', _budget_range_label),
+    'estimated_value_label': ('estimated_value', _estimated_value_label),
+}
+
+
+class EscapedFields:
+    """询盘字段的HTML转义视图，同一询盘的多个模板共用
+
+    values 包含所有非 None 字段和 DERIVED_FIELDS 中的派生字段，全部字段拼接后
+    只调用一次 html.escape
+    """
+
+    __slots__ = ('data', 'values', 'language')
+
+    def __init__(self, data):
+        self.data = data
+        keys = [key for key, value in data.items() if value is not None]
+        texts = [str(data[key]) for key in keys]
+        for name, (source, transform) in DERIVED_FIELDS.items():
+            if data.get(source) is not None:
+                keys.append(name)
+                texts.append(transform(data[source]))
+
+        joined = _FIELD_SEPARATOR.join(texts)
+        if joined.count(_FIELD_SEPARATOR) == len(texts) - 1:
+            escaped = html.escape(joined).split(_FIELD_SEPARATOR)
+        else:
+            escaped = [escape_field(text) for text in texts]
+        self.values = dict(zip(keys, escaped))
+        self.language = _template_language(data)
+
+
+def _template_language(data):
+    language = data.get('language')
+    return language if isinstance(language, str) and language else 'en'
+
+
+def _escaped(inquiry_data):
+    return inquiry_data if isinstance(inquiry_data, EscapedFields) else EscapedFields(inquiry_data)
+
+
+# (模板类型, 语言) -> 模板源码；缺少某语言的模板时使用英文
+TEMPLATE_SOURCES = {}
+
+TEMPLATE_SOURCES['html_shell', 'en'] = """
     <!DOCTYPE html>
-    <html lang="en">
+    <html lang="{{language}}">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{content_data.get('subject', 'Lianjin Optoelectronics')}</title>
+        <title>{{title}}</title>
         <style>
-            body {{
+            body {
                 font-family: Arial, sans-serif;
                 line-height: 1.6;
                 color: #333;
                 max-width: 600px;
                 margin: 0 auto;
                 padding: 20px;
-            }}
-            .header {{
+            }
+            .header {
                 background: linear-gradient(135deg, #1e40af 0%, #3b82f6 100%);
                 color: white;
                 padding: 30px 20px;
                 text-align: center;
                 border-radius: 8px 8px 0 0;
-            }}
-            .content {{
+            }
+            .content {
                 background: #ffffff;
                 padding: 30px 20px;
                 border: 1px solid #e5e7eb;
-            }}
-            .footer {{
+            }
+            .footer {
                 background: #f9fafb;
                 padding: 20px;
                 text-align: center;
                 font-size: 12px;
                 color: #6b7280;
                 border-radius: 0 0 8px 8px;
-            }}
-            .button {{
+            }
+            .button {
                 display: inline-block;
                 background: #1e40af;
                 color: white;
@@ -186,20 +264,20 @@ def get_html_email_template(content_data, template_type='inquiry_confirmation'):
                 text-decoration: none;
                 border-radius: 6px;
                 margin: 20px 0;
-            }}
-            .info-box {{
+            }
+            .info-box {
                 background: #f0f9ff;
                 border: 1px solid #bae6fd;
                 padding: 15px;
                 border-radius: 6px;
                 margin: 20px 0;
-            }}
-            .contact-info {{
+            }
+            .contact-info {
                 background: #f9fafb;
                 padding: 15px;
                 border-radius: 6px;
                 margin: 20px 0;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -209,7 +287,7 @@ def get_html_email_template(content_data, template_type='inquiry_confirmation'):
         </div>
         
         <div class="content">
-            {content_data.get('body_html', content_data.get('body', '').replace('\\n', '<br>'))}
+            {{body}}
         </div>
         
         <div class="footer">
@@ -221,24 +299,19 @@ def get_html_email_template(content_data, template_type='inquiry_confirmation'):
     </body>
     </html>
     """
-    
-    return html_template
 
-def get_inquiry_confirmation_html(inquiry_data):
-    """生成询盘确认的HTML邮件"""
-    
-    body_html = f"""
+TEMPLATE_SOURCES['inquiry_confirmation', 'en'] = """
     <h2>Thank you for your inquiry!</h2>
-    <p>Dear {inquiry_data.get('name', 'Valued Customer')},</p>
+    <p>Dear {{name}},</p>
     
     <p>We have successfully received your inquiry and our team will respond within 24 hours.</p>
     
     <div class="info-box">
         <h3>Inquiry Summary</h3>
-        <p><strong>Inquiry Type:</strong> {inquiry_data.get('inquiry_type', 'General').title()}</p>
-        <p><strong>Product Interest:</strong> {inquiry_data.get('product_interest', 'General LED Solutions')}</p>
-        {f'<p><strong>Budget Range:</strong> {inquiry_data.get("budget_range", "").replace("-", " - ").replace("k", ",000").replace("over-500k", "Over $500,000")}</p>' if inquiry_data.get('budget_range') else ''}
-        {f'<p><strong>Screen Size:</strong> {inquiry_data.get("screen_size")}</p>' if inquiry_data.get('screen_size') else ''}
+        <p><strong>Inquiry Type:</strong> {{inquiry_type}}</p>
+        <p><strong>Product Interest:</strong> {{product_interest}}</p>
+        {{budget_range_line}}
+        {{screen_size_line}}
     </div>
     
     <h3>What Happens Next?</h3>
@@ -261,64 +334,48 @@ def get_inquiry_confirmation_html(inquiry_data):
     <strong>Sales Team</strong><br>
     Shenzhen Lianjin Optoelectronics Co., Ltd.</p>
     """
-    
-    return {
-        'subject': f"Thank you for your inquiry - Reference #{inquiry_data.get('inquiry_id', 'N/A')}",
-        'body_html': body_html
-    }
 
-def get_admin_notification_html(inquiry_data):
-    """生成管理员通知的HTML邮件"""
-    
-    priority_color = {
-        'high': '#dc2626',
-        'normal': '#059669',
-        'low': '#6b7280'
-    }
-    
-    priority = inquiry_data.get('priority', 'normal')
-    
-    body_html = f"""
-    <h2 style="color: {priority_color.get(priority, '#059669')};">
-        New {priority.title()} Priority Inquiry
+TEMPLATE_SOURCES['admin_notification', 'en'] = """
+    <h2 style="color: {{priority_color}};">
+        New {{priority}} Priority Inquiry
     </h2>
     
     <div class="info-box">
         <h3>Contact Information</h3>
-        <p><strong>Name:</strong> {inquiry_data.get('name', 'N/A')}</p>
-        <p><strong>Email:</strong> <a href="mailto:{inquiry_data.get('email', '')}">{inquiry_data.get('email', 'N/A')}</a></p>
-        <p><strong>Company:</strong> {inquiry_data.get('company', 'N/A')}</p>
-        <p><strong>Phone:</strong> {inquiry_data.get('phone', 'N/A')}</p>
-        <p><strong>Country:</strong> {inquiry_data.get('country', 'N/A')}</p>
+        <p><strong>Name:</strong> {{name}}</p>
+        <p><strong>Email:</strong> <a href="mailto:{{email_href}}">{{email}}</a></p>
+        <p><strong>Company:</strong> {{company}}</p>
+        <p><strong>Phone:</strong> {{phone}}</p>
+        <p><strong>Country:</strong> {{country}}</p>
     </div>
     
     <div class="info-box">
         <h3>Inquiry Details</h3>
-        <p><strong>Type:</strong> {inquiry_data.get('inquiry_type', 'General').title()}</p>
-        <p><strong>Product Interest:</strong> {inquiry_data.get('product_interest', 'N/A')}</p>
-        <p><strong>Screen Size:</strong> {inquiry_data.get('screen_size', 'N/A')}</p>
-        <p><strong>Budget Range:</strong> {inquiry_data.get('budget_range', 'N/A')}</p>
-        <p><strong>Priority:</strong> <span style="color: {priority_color.get(priority, '#059669')}; font-weight: bold;">{priority.title()}</span></p>
-        {f'<p><strong>Estimated Value:</strong> ${inquiry_data.get("estimated_value", "N/A"):,}</p>' if inquiry_data.get('estimated_value') else ''}
+        <p><strong>Type:</strong> {{inquiry_type}}</p>
+        <p><strong>Product Interest:</strong> {{product_interest}}</p>
+        <p><strong>Screen Size:</strong> {{screen_size}}</p>
+        <p><strong>Budget Range:</strong> {{budget_range}}</p>
+        <p><strong>Priority:</strong> <span style="color: {{priority_color}}; font-weight: bold;">{{priority}}</span></p>
+        {{estimated_value_line}}
     </div>
     
     <div class="info-box">
         <h3>Message</h3>
         <p style="background: #f9fafb; padding: 15px; border-radius: 4px; font-style: italic;">
-            "{inquiry_data.get('message', 'No message provided')}"
+            "{{message}}"
         </p>
     </div>
     
     <div class="info-box">
         <h3>Additional Information</h3>
-        <p><strong>Newsletter:</strong> {'Yes' if inquiry_data.get('newsletter') == '1' else 'No'}</p>
-        <p><strong>Language:</strong> {inquiry_data.get('language', 'en').upper()}</p>
-        <p><strong>Source:</strong> {inquiry_data.get('source', 'website').title()}</p>
-        <p><strong>User Agent:</strong> {inquiry_data.get('user_agent', 'N/A')[:100]}...</p>
-        <p><strong>Timestamp:</strong> {inquiry_data.get('timestamp', 'N/A')}</p>
+        <p><strong>Newsletter:</strong> {{newsletter}}</p>
+        <p><strong>Language:</strong> {{language_label}}</p>
+        <p><strong>Source:</strong> {{source}}</p>
+        <p><strong>User Agent:</strong> {{user_agent}}...</p>
+        <p><strong>Timestamp:</strong> {{timestamp}}</p>
     </div>
     
-    <a href="http://localhost:5000/admin/inquiries/{inquiry_data.get('inquiry_id', '')}" class="button">
+    <a href="http://localhost:5000/admin/inquiries/{{inquiry_id}}" class="button">
         View in Admin Panel
     </a>
     
@@ -326,126 +383,218 @@ def get_admin_notification_html(inquiry_data):
         ⚠️ Please respond to this inquiry within 24 hours.
     </p>
     """
+
+# 跟进邮件为纯文本，字段不做HTML转义
+TEMPLATE_SOURCES['followup_quote_sent', 'en'] = """
+Dear {{name}},
+
+Thank you for your interest in our LED display solutions.
+
+Please find attached our detailed quotation for your {{product_interest_project}} project.
+
+The quote includes:
+- Product specifications and pricing
+- Installation guidelines
+- Warranty information
+- Technical support details
+
+This quotation is valid for 30 days. If you have any questions or need modifications, please don't hesitate to contact us.
+
+We look forward to working with you on this project.
+
+Best regards,
+Sales Team
+Shenzhen Lianjin Optoelectronics Co., Ltd.
+"""
+
+TEMPLATE_SOURCES['followup_technical_response', 'en'] = """
+Dear {{name}},
+
+Thank you for your technical inquiry about our {{product_interest_solutions}}.
+
+Our technical team has prepared detailed information to address your questions:
+
+[Technical details would be inserted here based on the specific inquiry]
+
+If you need additional technical specifications or have further questions, please feel free to contact our technical support team.
+
+Best regards,
+Technical Support Team
+Shenzhen Lianjin Optoelectronics Co., Ltd.
+"""
+
+TEMPLATE_SOURCES['followup_quote_sent_subject', 'en'] = "Quote for {{product_interest}} - Lianjin Optoelectronics"
+TEMPLATE_SOURCES['followup_technical_response_subject', 'en'] = "Technical Information - {{product_interest}}"
+
+FOLLOWUP_TYPES = ('quote_sent', 'technical_response')
+
+PRIORITY_COLORS = {
+    'high': '#dc2626',
+    'normal': '#059669',
+    'low': '#6b7280'
+}
+
+
+def compiled_template(template_type, language='en'):
+    """按 (模板类型, 语言) 取编译后的模板；该语言没有此模板时使用英文
+
+    语言来自表单等外部输入，先映射到 TEMPLATE_SOURCES 中存在的键再查缓存，
+    缓存项数不超过模板源码数
+    """
+    if (template_type, language) not in TEMPLATE_SOURCES:
+        language = 'en'
+    return _compile_template(template_type, language)
+
+
+@lru_cache(maxsize=256)
+def _compile_template(template_type, language):
+    source = TEMPLATE_SOURCES[template_type, language]
+    if template_type.startswith('followup_'):
+        # 纯文本模板与原先的 .strip() 输出一致
+        source = source.strip()
+    return CompiledTemplate(source, language=language)
+
+
+def get_inquiry_followup_email(inquiry_data, followup_type='general'):
+    """生成询盘跟进邮件模板"""
+    
+    if followup_type not in FOLLOWUP_TYPES:
+        followup_type = 'quote_sent'
+    language = _template_language(inquiry_data)
+    product_interest = inquiry_data.get('product_interest')
+    values = {
+        'name': inquiry_data.get('name') or 'Valued Customer',
+        'product_interest': product_interest or 'LED Display',
+        'product_interest_project': product_interest or 'LED display',
+        'product_interest_solutions': product_interest or 'LED display solutions',
+    }
     
     return {
-        'subject': f"🔔 New {priority.title()} Priority Inquiry from {inquiry_data.get('name', 'Unknown')} - {inquiry_data.get('inquiry_type', 'General').title()}",
-        'body_html': body_html
+        'subject': compiled_template(f'followup_{followup_type}_subject', language).render(values),
+        'body': compiled_template(f'followup_{followup_type}', language).render(values)
     }
 
-def send_email_notification(to_email, subject, body, from_email="noreply@lianjin-led.com", html_body=None):
-    """
-    发送邮件通知（增强版本）
-    在实际生产环境中，这里应该集成真正的邮件服务
+def get_html_email_template(content_data, template_type='inquiry_confirmation'):
+    """生成HTML邮件模板 (静态外壳按语言预编译，只填充标题和正文)"""
+    
+    body_html = content_data.get('body_html')
+    if body_html is None:
+        body_html = escape_field(content_data.get('body', '')).replace('\n', '<br>')
+    
+    return compiled_template('html_shell', _template_language(content_data)).render({
+        'title': escape_field(content_data.get('subject', 'Lianjin Optoelectronics')),
+        'body': body_html
+    })
+
+def get_inquiry_confirmation_html(inquiry_data):
+    """生成询盘确认的HTML邮件 (inquiry_data 可为 EscapedFields，与其他模板共用转义结果)"""
+    
+    fields = _escaped(inquiry_data)
+    escaped = fields.values
+    budget_range = escaped.get('budget_range_label')
+    screen_size = escaped.get('screen_size')
+    
+    body_html = compiled_template('inquiry_confirmation', fields.language).render({
+        'name': escaped.get('name', 'Valued Customer'),
+        'inquiry_type': escaped.get('inquiry_type_title', 'General'),
+        'product_interest': escaped.get('product_interest', 'General LED Solutions'),
+        'budget_range_line': f'<p><strong>Budget Range:</strong> {budget_range}</p>' if budget_range else '',
+        'screen_size_line': f'<p><strong>Screen Size:</strong> {screen_size}</p>' if screen_size else '',
+    })
+    
+    return {
+        'subject': f"Thank you for your inquiry - Reference #{fields.data.get('inquiry_id') or 'N/A'}",
+        'body_html': body_html,
+        'language': fields.language
+    }
+
+def get_admin_notification_html(inquiry_data):
+    """生成管理员通知的HTML邮件 (inquiry_data 可为 EscapedFields，与其他模板共用转义结果)"""
+    
+    fields = _escaped(inquiry_data)
+    data, escaped = fields.data, fields.values
+    priority = data.get('priority') or 'normal'
+    color = PRIORITY_COLORS.get(priority, '#059669')
+    estimated_value = escaped.get('estimated_value_label') if data.get('estimated_value') else ''
+    
+    body_html = compiled_template('admin_notification', fields.language).render({
+        'priority_color': color,
+        'priority': escaped.get('priority_title', 'Normal'),
+        'name': escaped.get('name', 'N/A'),
+        'email_href': escaped.get('email', ''),
+        'email': escaped.get('email', 'N/A'),
+        'company': escaped.get('company', 'N/A'),
+        'phone': escaped.get('phone', 'N/A'),
+        'country': escaped.get('country', 'N/A'),
+        'inquiry_type': escaped.get('inquiry_type_title', 'General'),
+        'product_interest': escaped.get('product_interest', 'N/A'),
+        'screen_size': escaped.get('screen_size', 'N/A'),
+        'budget_range': escaped.get('budget_range', 'N/A'),
+        'estimated_value_line': f'<p><strong>Estimated Value:</strong> {estimated_value}</p>' if estimated_value else '',
+        'message': escaped.get('message', 'No message provided'),
+        'newsletter': 'Yes' if data.get('newsletter') == '1' else 'No',
+        'language_label': escaped.get('language_upper', 'EN'),
+        'source': escaped.get('source_title', 'Website'),
+        'user_agent': escaped.get('user_agent_short', 'N/A'),
+        'timestamp': escaped.get('timestamp', 'N/A'),
+        'inquiry_id': escaped.get('inquiry_id', ''),
+    })
+    
+    return {
+        'subject': f"🔔 New {priority.title()} Priority Inquiry from {data.get('name') or 'Unknown'} - {str(data.get('inquiry_type') or 'General').title()}",
+        'body_html': body_html,
+        'language': fields.language
+    }
+
+def send_email_notification(to_email, subject, body, from_email=DEFAULT_FROM_EMAIL, html_body=None):
     """
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    from email.mime.base import MIMEBase
-    from email import encoders
-    import os
-    
-    # 开发环境：打印邮件内容
-    print(f"📧 EMAIL NOTIFICATION:")
-    print(f"To: {to_email}")
-    print(f"From: {from_email}")
-    print(f"Subject: {subject}")
-    print(f"Has HTML: {'Yes' if html_body else 'No'}")
-    print("-" * 50)
-    
-    # 在生产环境中，取消注释以下代码来实际发送邮件
+    发送邮件通知
+    通过共享的发送通道 (MAIL_TRANSPORT: smtp 连接池 / maildir / console) 发送
     """
-    try:
-        # 创建邮件对象
-        msg = MIMEMultipart('alternative')
-        msg['From'] = from_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # 添加纯文本版本
-        text_part = MIMEText(body, 'plain', 'utf-8')
-        msg.attach(text_part)
-        
-        # 添加HTML版本（如果提供）
-        if html_body:
-            html_part = MIMEText(html_body, 'html', 'utf-8')
-            msg.attach(html_part)
-        
-        # SMTP配置（需要根据实际邮件服务器配置）
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        smtp_username = os.getenv('SMTP_USERNAME', '')
-        smtp_password = os.getenv('SMTP_PASSWORD', '')
-        
-        # 发送邮件
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        
-        print(f"✅ Email sent successfully to {to_email}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {str(e)}")
+    error = get_transport().send(build_message(to_email, subject, body, html_body, from_email))
+    if error is not None:
+        print(f"❌ Failed to send email to {to_email}: {error}")
         return False
-    """
-    
-    # 开发环境：假设发送成功
     return True
 
-def send_inquiry_notifications(inquiry_data, inquiry_id=None):
-    """发送询盘相关的所有通知邮件"""
-    
-    if inquiry_id:
-        inquiry_data['inquiry_id'] = inquiry_id
-    
-    notifications_sent = []
+def benchmark_templates(iterations=5000):
+    """渲染性能测试: 返回每种模板每秒渲染次数"""
+    inquiry = {
+        'inquiry_id': 1024, 'name': 'Alex <Chen>', 'email': 'alex@example.com', 'company': 'Stage & Screen Ltd',
+        'phone': '+1 555 0100', 'country': 'US', 'message': 'We need a 6x3m P2.5 rental wall for a "launch" event. ' * 4,
+        'product_interest': 'Rental LED', 'inquiry_type': 'quote', 'budget_range': '50k-100k', 'screen_size': '6x3m',
+        'priority': 'high', 'estimated_value': 75000, 'language': 'en', 'source': 'website',
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'timestamp': '2024-06-01T10:00:00Z'
+    }
     
-    try:
-        # 发送客户确认邮件
-        customer_email_data = get_inquiry_confirmation_html(inquiry_data)
-        customer_html = get_html_email_template(customer_email_data, 'inquiry_confirmation')
-        
-        customer_success = send_email_notification(
-            to_email=inquiry_data.get('email'),
-            subject=customer_email_data['subject'],
-            body=f"Thank you for your inquiry! We will respond within 24 hours.",
-            html_body=customer_html
-        )
-        
-        if customer_success:
-            notifications_sent.append('customer_confirmation')
-        
-        # 发送管理员通知邮件
-        admin_email_data = get_admin_notification_html(inquiry_data)
-        admin_html = get_html_email_template(admin_email_data, 'admin_notification')
-        
-        admin_emails = [
-            'sales@lianjin-led.com',
-            'admin@lianjin-led.com'  # 可以配置多个管理员邮箱
-        ]
-        
-        for admin_email in admin_emails:
-            admin_success = send_email_notification(
-                to_email=admin_email,
-                subject=admin_email_data['subject'],
-                body=f"New inquiry from {inquiry_data.get('name', 'Unknown')}",
-                html_body=admin_html
-            )
-            
-            if admin_success:
-                notifications_sent.append(f'admin_notification_{admin_email}')
-        
-        return {
-            'success': True,
-            'notifications_sent': notifications_sent,
-            'total_sent': len(notifications_sent)
-        }
-        
-    except Exception as e:
-        print(f"Error sending inquiry notifications: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e),
-            'notifications_sent': notifications_sent
-        }
\ No newline at end of file
+    def confirmation():
+        get_html_email_template(get_inquiry_confirmation_html(inquiry), 'inquiry_confirmation')
+    
+    def admin_notification():
+        get_html_email_template(get_admin_notification_html(inquiry), 'admin_notification')
+    
+    def inquiry_notifications():
+        # 一个询盘的全部邮件 (客户确认 + 管理员通知)，字段只转义一次
+        fields = EscapedFields(inquiry)
+        get_html_email_template(get_inquiry_confirmation_html(fields), 'inquiry_confirmation')
+        get_html_email_template(get_admin_notification_html(fields), 'admin_notification')
+    
+    def followup():
+        get_inquiry_followup_email(inquiry, 'quote_sent')
+    
+    results = {}
+    for name, render in (('inquiry_confirmation', confirmation), ('admin_notification', admin_notification),
+                         ('inquiry_notifications', inquiry_notifications), ('followup', followup)):
+        render()  # 预热 (编译并缓存模板)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        results[name] = iterations / (time.perf_counter() - started)
+    return results
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        position = sys.argv.index('--benchmark')
+        iterations = int(sys.argv[position + 1]) if len(sys.argv) > position + 1 else 5000
+        for name, rate in benchmark_templates(iterations).items():
+            print(f'{name:<24} {rate:>10,.0f} renders/s')
@@ -8,13 +8,32 @@ import re
 import hashlib
 import secrets
 import time
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for, Response, session
+import json
+import zlib
+import threading
+from datetime import datetime, timedelta, timezone
+from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for, Response, session, stream_with_context, make_response, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import MultiDict
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from database_manager import db_manager
+from database_manager import db_manager, PRODUCT_CHILD_COLLECTIONS
+from connection_pool import get_pool
+from response_cache import response_cache
+from rate_limiter import create_rate_limiter
+from product_filters import ProductFilter, get_facet_counts, get_range_bounds, SORT_OPTIONS
+from pagination import decode_cursor, keyset_clause, keyset_page, cached_count
+from search_index import fts_available, build_match_query, BM25_WEIGHTS, SuggestIndex
+from exporters import get_exporter
+from schema_migrations import run_migrations
+from stats_engine import rebuild_stats_counters, rebuild_inquiry_rollup
+from product_import import ProductImporter, iter_import_rows, IMPORT_FORMATS
+from bulk_actions import BulkSelection
+from jobs import JobQueue, JobCancelled, JOB_OUTPUT_DIR
+from email_outbox import OutboxDispatcher, inquiry_notifications, OUTBOX_STATUSES
+from email_templates import FOLLOWUP_TYPES
+import campaigns
 from functools import wraps
 import logging
 
@@ -57,8 +76,8 @@ logging.basicConfig(
 )
 security_logger = logging.getLogger('security')
 
-# Rate limiting storage
-rate_limit_storage = {}
+# Rate limiting counters (RATE_LIMIT_BACKEND=memory|sqlite)
+rate_limiter = create_rate_limiter()
 
 # CSRF token storage
 csrf_tokens = {}
@@ -123,7 +142,11 @@ def csrf_protect(f):
     return decorated_function
 
 def rate_limit(max_requests=None, window=None):
-    """Rate limiting decorator"""
+    """Rate limiting decorator.
+
+    Counts requests per client and endpoint with a sliding window counter and
+    adds X-RateLimit-Limit/Remaining/Reset headers (plus Retry-After on 429).
+    """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -134,28 +157,108 @@ def rate_limit(max_requests=None, window=None):
             limit = max_requests or SECURITY_CONFIG['RATE_LIMIT_REQUESTS']
             time_window = window or SECURITY_CONFIG['RATE_LIMIT_WINDOW']
             
-            # Get client identifier
             client_id = get_client_identifier()
-            current_time = time.time()
+            try:
+                result = rate_limiter.hit(f'{request.endpoint}:{client_id}', limit, time_window)
+            except sqlite3.Error as e:
+                # Fail open: a locked or missing counter store must not take the endpoint down
+                security_logger.error(f'Rate limiter unavailable: {e}')
+                return f(*args, **kwargs)
             
-            # Clean old entries
-            if client_id in rate_limit_storage:
-                rate_limit_storage[client_id] = [
-                    timestamp for timestamp in rate_limit_storage[client_id]
-                    if current_time - timestamp < time_window
-                ]
+            if not result.allowed:
+                security_logger.warning(f'Rate limit exceeded for {client_id} on {request.endpoint}')
+                response = jsonify({'error': 'Rate limit exceeded'})
+                response.status_code = 429
             else:
-                rate_limit_storage[client_id] = []
+                response = make_response(f(*args, **kwargs))
+            response.headers.extend(result.headers())
+            return response
+        return decorated_function
+    return decorator
+
+def cached_endpoint(*tags):
+    """Read-through response cache for public GET endpoints.
+
+    Responses are keyed by (endpoint, path, lang, query args) and dropped
+    when an admin write calls response_cache.invalidate() with one of the tags.
+    Under conditional_endpoint the key also holds the data_versions it read,
+    so a write made by another worker (whose invalidation never reaches this
+    process) moves readers to a fresh key instead of the stale body.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
             
-            # Check rate limit
-            if len(rate_limit_storage[client_id]) >= limit:
-                security_logger.warning(f'Rate limit exceeded for {client_id} on {request.endpoint}')
-                return jsonify({'error': 'Rate limit exceeded'}), 429
+            cache_key = (
+                request.endpoint,
+                request.path,
+                request.args.get('lang', 'en'),
+                tuple(sorted(request.args.items(multi=True))),
+                g.get('data_versions')
+            )
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                body, mimetype = cached
+                return Response(body, status=200, mimetype=mimetype)
             
-            # Add current request
-            rate_limit_storage[client_id].append(current_time)
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                body = response.get_data()
+                response_cache.set(cache_key, (body, response.mimetype), size=len(body), tags=tags)
+            return response
+        return decorated_function
+    return decorator
+
+def conditional_endpoint(*tables):
+    """ETag / Last-Modified support driven by the data_versions table.
+
+    The strong ETag hashes the request (path, query args) with the write
+    counters of the tables the endpoint reads, so If-None-Match and
+    If-Modified-Since can be answered with 304 before the view runs.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
             
-            return f(*args, **kwargs)
+            try:
+                versions = db_manager.get_data_versions(tables)
+            except sqlite3.Error:
+                return f(*args, **kwargs)
+            if len(versions) != len(tables):
+                return f(*args, **kwargs)
+            
+            # Read by cached_endpoint: the cached body is keyed on the same versions as the ETag
+            g.data_versions = tuple((table, versions[table]['version']) for table in tables)
+            
+            fingerprint = '|'.join([request.path, str(sorted(request.args.items(multi=True)))] + [
+                f"{table}:{versions[table]['version']}" for table in tables
+            ])
+            etag = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+            last_modified = max(
+                datetime.strptime(versions[table]['updated_at'], '%Y-%m-%d %H:%M:%S')
+                for table in tables
+            ).replace(tzinfo=timezone.utc)
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(request.if_modified_since and last_modified <= request.if_modified_since)
+            
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers.setdefault('Cache-Control', 'no-cache')
+            return response
         return decorated_function
     return decorator
 
@@ -200,6 +303,14 @@ def validate_input(data, validation_rules):
     
     return len(errors) == 0, errors
 
+# Languages the site is published in; other language tags are stored as 'en'
+CONTACT_LANGUAGES = ('en', 'zh')
+
+def contact_language(value):
+    """Map a browser language tag (e.g. 'zh-CN') to one of CONTACT_LANGUAGES"""
+    primary = re.split(r'[-_]', str(value or ''), 1)[0].lower()
+    return primary if primary in CONTACT_LANGUAGES else 'en'
+
 def validate_field_type(value, field_type):
     """Validate field type"""
     patterns = {
@@ -373,26 +484,84 @@ def detect_suspicious_request():
 
 # --- Database Setup ---
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return this thread's pooled connection (shared with db_manager)"""
+    return get_pool(DATABASE).acquire()
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Return the thread's connection to the pool at the end of the request"""
+    get_pool(DATABASE).release()
+
+def table_version(table):
+    """Current write counter of a table from data_versions (None if untracked)"""
+    try:
+        return db_manager.get_data_versions((table,)).get(table, {}).get('version')
+    except sqlite3.Error:
+        return None
+
+def wants_keyset_pagination():
+    """Cursor mode is used when a cursor is passed or ?paginate=cursor is set"""
+    return 'cursor' in request.args or request.args.get('paginate') == 'cursor'
+
+def wants_async():
+    """?async=true asks a slow admin endpoint to queue a background job instead"""
+    return request.args.get('async', 'false').lower() == 'true'
+
+def job_accepted(job, **extra):
+    """202 response for a newly queued job, pointing at its status endpoint"""
+    response = jsonify(dict(extra, success=True, job=job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_job', job_id=job['id'])
+    return response
+
+# Periodically fold the WAL back into database.db (DB_CHECKPOINT_INTERVAL seconds)
+get_pool(DATABASE).start_checkpoint_job()
+
+# Background jobs for slow admin operations (handlers are registered below)
+job_queue = JobQueue(DATABASE)
+
+# Sends the emails queued in email_outbox (contact form notifications, follow-up campaigns)
+email_dispatcher = OutboxDispatcher(DATABASE)
+
+_app_ready = False
+_app_ready_lock = threading.Lock()
+
+def ensure_app_ready():
+    """Apply pending migrations and start the background workers, once per process.
+
+    WSGI servers and Vercel only import `app`, so this also runs before the
+    first request; against an up-to-date database it costs a single query.
+    """
+    global _app_ready
+    if _app_ready:
+        return
+    with _app_ready_lock:
+        if _app_ready:
+            return
+        applied = run_migrations(get_db())
+        if applied:
+            print(f"Database migrated: {', '.join(f'{m.version:04d}_{m.name}' for m in applied)}")
+        # Pick up jobs and emails queued before the restart
+        job_queue.start()
+        email_dispatcher.start()
+        _app_ready = True
+
+@app.before_request
+def prepare_app():
+    ensure_app_ready()
 
 def init_db(create_admin=True, use_enhanced_schema=True):
     """Initialize database with enhanced schema"""
     with app.app_context():
         db = get_db()
         
-        # Choose which schema to use
-        schema_file = 'schema_enhanced.sql' if use_enhanced_schema else 'schema.sql'
-        
-        try:
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                db.cursor().executescript(f.read())
-            print(f"Database initialized with {schema_file}")
-        except FileNotFoundError:
-            print(f"Schema file {schema_file} not found, falling back to basic schema")
+        if use_enhanced_schema:
+            # Versioned migrations (migrations/): only pending ones run
+            ensure_app_ready()
+        else:
             with app.open_resource('schema.sql', mode='r') as f:
                 db.cursor().executescript(f.read())
+            print("Database initialized with schema.sql")
         
         if create_admin:
             # Check if admin user already exists
@@ -432,6 +601,8 @@ def serve_static(filename):
 
 # Get products API for the public website
 @app.route('/api/products', methods=['GET'])
+@conditional_endpoint('products', 'product_categories', 'product_images')
+@cached_endpoint('products')
 def get_products():
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -489,6 +660,8 @@ def get_products():
 
 # Get single product API for the public website
 @app.route('/api/products/<int:product_id>', methods=['GET'])
+@conditional_endpoint('products', 'product_categories', 'product_images', 'product_applications')
+@cached_endpoint('products')
 def get_product_detail(product_id):
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -554,6 +727,67 @@ def get_product_detail(product_id):
             return jsonify({'error': 'Product not found'}), 404
         return jsonify(dict(product))
 
+# Faceted product filtering for the public website
+@app.route('/api/products/filter', methods=['GET'])
+@conditional_endpoint('products', 'product_categories', 'product_images')
+@cached_endpoint('products')
+def filter_products():
+    """Filter products by spec ranges and multi-select facets, with facet counts"""
+    db = get_db()
+    language = request.args.get('lang', 'en')
+    sort = request.args.get('sort', 'default')
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 24, type=int), 1), 100)
+    
+    if sort not in SORT_OPTIONS:
+        return jsonify({'error': 'Invalid sort option'}), 400
+    
+    try:
+        product_filter = ProductFilter(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        where, params = product_filter.where()
+        
+        total = db.execute(f'''
+            SELECT COUNT(*) as total
+            FROM products p
+            LEFT JOIN product_categories c ON p.category_id = c.id
+            {where}
+        ''', params).fetchone()['total']
+        
+        rows = db.execute(f'''
+            SELECT p.id, p.sku,
+                   CASE WHEN ? = 'zh' THEN p.name_zh ELSE p.name_en END as name,
+                   p.pixel_pitch, p.pixel_pitch_mm, p.brightness, p.refresh_rate,
+                   p.power_consumption, p.weight, p.ip_rating, p.is_featured,
+                   c.slug as category_slug,
+                   CASE WHEN ? = 'zh' THEN c.name_zh ELSE c.name_en END as category,
+                   (SELECT image_url FROM product_images pi
+                    WHERE pi.product_id = p.id AND pi.is_primary = 1 LIMIT 1) as image_url
+            FROM products p
+            LEFT JOIN product_categories c ON p.category_id = c.id
+            {where}
+            ORDER BY {SORT_OPTIONS[sort]}
+            LIMIT ? OFFSET ?
+        ''', [language, language] + params + [limit, (page - 1) * limit]).fetchall()
+        
+        return jsonify({
+            'products': [dict(row) for row in rows],
+            'facets': get_facet_counts(db, product_filter, language),
+            'ranges': get_range_bounds(db, product_filter),
+            'pagination': {
+                'current': page,
+                'total': total,
+                'pages': (total + limit - 1) // limit,
+                'limit': limit
+            }
+        })
+        
+    except sqlite3.Error as e:
+        return jsonify({'error': 'Database error'}), 500
+
 # Security API Endpoints
 @app.route('/api/csrf-token', methods=['GET'])
 def get_csrf_token():
@@ -614,7 +848,8 @@ def handle_contact():
         'country': {'required': False, 'max_length': 100},
         'product_interest': {'required': False, 'max_length': 200},
         'inquiry_type': {'required': False, 'max_length': 50},
-        'budget_range': {'required': False, 'max_length': 50}
+        'budget_range': {'required': False, 'max_length': 50},
+        'language': {'required': False, 'max_length': 16, 'pattern': r'^[A-Za-z]{2,3}([-_][A-Za-z0-9]{2,8})?$'}
     }
     
     # Validate input
@@ -666,14 +901,19 @@ def handle_contact():
             'message': data.get('message'),
             'product_interest': data.get('product_interest', ''),
             'inquiry_type': data.get('inquiry_type', 'general'),
-            'language': data.get('language', 'en'),
+            'language': contact_language(data.get('language')),
             'source': data.get('source', 'website'),
             'estimated_value': estimated_value,
             'priority': priority
         }
         
-        # Create inquiry using database manager
-        inquiry_id = db_manager.create_inquiry(inquiry_data)
+        # Create the inquiry and queue its notification emails in one transaction;
+        # the outbox dispatcher sends them after the response has gone out
+        notification_data = dict(data, priority=priority, estimated_value=estimated_value,
+                                 language=inquiry_data['language'],
+                                 user_agent=request.headers.get('User-Agent', ''))
+        inquiry_id = db_manager.create_inquiry(inquiry_data, inquiry_notifications(notification_data))
+        email_dispatcher.wakeup()
         
         # Log the inquiry submission
         db_manager.log_activity(
@@ -686,23 +926,6 @@ def handle_contact():
             user_agent=request.headers.get('User-Agent', '')
         )
         
-        # Send email notifications
-        try:
-            from email_templates import send_inquiry_notifications
-            
-            # 发送所有相关的邮件通知
-            notification_result = send_inquiry_notifications(data, inquiry_id)
-            
-            if notification_result['success']:
-                print(f"✅ Successfully sent {notification_result['total_sent']} email notifications")
-            else:
-                print(f"❌ Failed to send some email notifications: {notification_result.get('error', 'Unknown error')}")
-            
-        except ImportError:
-            print("Email templates not available, skipping email notifications")
-        except Exception as e:
-            print(f"Failed to send email notifications: {e}")
-        
         return jsonify({
             'success': True,
             'message': 'Inquiry received successfully! We will contact you within 24 hours.',
@@ -742,6 +965,173 @@ def api_admin_logout():
     logout_user()
     return redirect(url_for('admin_login'))
 
+# Columns the admin product grid may request through ?fields=
+ADMIN_PRODUCT_COLUMNS = (
+    'sku', 'category_id', 'name_en', 'name_zh', 'description_en', 'description_zh',
+    'specs_en', 'specs_zh', 'price', 'currency', 'pixel_pitch', 'brightness',
+    'resolution', 'refresh_rate', 'viewing_angle', 'ip_rating', 'power_consumption',
+    'weight', 'dimensions', 'is_featured', 'is_active', 'sort_order',
+    'created_at', 'updated_at'
+)
+ADMIN_PRODUCT_EXTRA_FIELDS = ('category_name_en', 'category_name_zh', 'primary_image', 'images')
+
+def parse_admin_product_fields(fields_param):
+    """Parse a comma separated ?fields= projection.
+
+    Returns [] when no projection was requested and None when it names
+    an unknown field.
+    """
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    allowed = set(ADMIN_PRODUCT_COLUMNS) | set(ADMIN_PRODUCT_EXTRA_FIELDS) | {'id'}
+    if any(field not in allowed for field in fields):
+        return None
+    return [field for field in fields if field != 'id']
+
+def build_product_filters(args, alias='p'):
+    """Build the WHERE conditions shared by the admin product list and export endpoints.
+
+    Supports category_id, active_only (default true) and search over name/SKU.
+    """
+    conditions = []
+    params = []
+    
+    if args.get('active_only', 'true').lower() == 'true':
+        conditions.append(f'{alias}.is_active = 1')
+    
+    category_id = args.get('category_id', type=int)
+    if category_id:
+        conditions.append(f'{alias}.category_id = ?')
+        params.append(category_id)
+    
+    if args.get('search'):
+        conditions.append(f'({alias}.name_en LIKE ? OR {alias}.name_zh LIKE ? OR {alias}.sku LIKE ?)')
+        search_param = f"%{args.get('search')}%"
+        params.extend([search_param, search_param, search_param])
+    
+    return ''.join(f' AND {condition}' for condition in conditions), params
+
+# Longest tag accepted by the inquiry tagging endpoints
+MAX_TAG_LENGTH = 50
+
+def normalize_tags(value):
+    """Parse a tag list given as a list or a comma-separated string.
+
+    Tags are stripped and de-duplicated case-insensitively (matching the
+    NOCASE collation of inquiry_tags). Raises ValueError on an over-long tag.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    
+    tags = {}
+    for tag in value:
+        tag = str(tag).strip()
+        if not tag:
+            continue
+        if len(tag) > MAX_TAG_LENGTH:
+            raise ValueError(f'Tags must be at most {MAX_TAG_LENGTH} characters')
+        tags.setdefault(tag.lower(), tag)
+    return list(tags.values())
+
+def build_inquiry_filters(args, alias='i'):
+    """Build the WHERE conditions shared by the inquiry list and export endpoints.
+
+    Supports status, priority, type, search, tag (comma-separated, matches any),
+    a date_from/date_to range (YYYY-MM-DD, inclusive) and contacted_before
+    (YYYY-MM-DD; leads never contacted or last contacted before that day).
+    Raises ValueError on a malformed date or tag.
+    """
+    conditions = []
+    params = []
+    
+    if args.get('status'):
+        conditions.append(f'{alias}.status = ?')
+        params.append(args.get('status'))
+    
+    if args.get('priority'):
+        conditions.append(f'{alias}.priority = ?')
+        params.append(args.get('priority'))
+    
+    if args.get('type'):
+        conditions.append(f'{alias}.inquiry_type = ?')
+        params.append(args.get('type'))
+    
+    if args.get('search'):
+        conditions.append(f'({alias}.name LIKE ? OR {alias}.email LIKE ? OR {alias}.company LIKE ?)')
+        search_param = f"%{args.get('search')}%"
+        params.extend([search_param, search_param, search_param])
+    
+    tags = normalize_tags(args.get('tag'))
+    if tags:
+        # Resolved through idx_inquiry_tags_tag
+        placeholders = ','.join(['?'] * len(tags))
+        conditions.append(f'{alias}.id IN (SELECT inquiry_id FROM inquiry_tags WHERE tag IN ({placeholders}))')
+        params.extend(tags)
+    
+    for arg, operator, modifier in (('date_from', '>=', ''), ('date_to', '<', ', \'+1 day\'')):
+        value = args.get(arg)
+        if not value:
+            continue
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'{arg} must be formatted as YYYY-MM-DD')
+        conditions.append(f'{alias}.created_at {operator} date(?{modifier})')
+        params.append(value)
+    
+    if args.get('contacted_before'):
+        try:
+            datetime.strptime(args.get('contacted_before'), '%Y-%m-%d')
+        except ValueError:
+            raise ValueError('contacted_before must be formatted as YYYY-MM-DD')
+        conditions.append(f'({alias}.last_contact_at IS NULL OR {alias}.last_contact_at < date(?))')
+        params.append(args.get('contacted_before'))
+    
+    return ''.join(f' AND {condition}' for condition in conditions), params
+
+# entity -> (list query template, count query template, table alias, offset paging order)
+ADMIN_LIST_QUERIES = {
+    'products': (
+        '''
+            SELECT {columns}
+            FROM products p
+            LEFT JOIN product_categories c ON p.category_id = c.id
+            WHERE 1=1{filters}
+        ''',
+        'SELECT COUNT(*) as total FROM products p WHERE 1=1{filters}',
+        'p',
+        'p.sort_order, p.created_at DESC',
+    ),
+    'inquiries': (
+        '''
+            SELECT i.*, 
+                   CASE WHEN i.estimated_value IS NOT NULL THEN i.estimated_value ELSE 0 END as est_value
+            FROM inquiries i
+            WHERE 1=1{filters}
+        ''',
+        'SELECT COUNT(*) as total FROM inquiries i WHERE 1=1{filters}',
+        'i',
+        'i.created_at DESC',
+    ),
+}
+
+def admin_list_query(entity, filter_sql, params, limit, page=1, cursor=None, keyset=False,
+                     columns='p.*, c.name_en as category_name_en, c.name_zh as category_name_zh'):
+    """Build one page of an admin list; returns (query, query params, count query).
+
+    Keyset pages are ordered by (created_at, id) and fetch limit + 1 rows for
+    keyset_page(); offset pages use the entity's paging order. columns is the
+    product select list (inquiries always select i.*).
+    """
+    template, count_template, alias, offset_order = ADMIN_LIST_QUERIES[entity]
+    query = template.format(columns=columns, filters=filter_sql)
+    count_query = count_template.format(filters=filter_sql)
+    if keyset:
+        keyset_condition, keyset_params, order_by = keyset_clause(alias, cursor)
+        return f'{query}{keyset_condition} ORDER BY {order_by} LIMIT ?', params + keyset_params + [limit + 1], count_query
+    return f'{query} ORDER BY {offset_order} LIMIT ? OFFSET ?', params + [limit, (page - 1) * limit], count_query
+
 @app.route('/api/admin/products', methods=['GET', 'POST'])
 @login_required
 def admin_manage_products():
@@ -793,6 +1183,7 @@ def admin_manage_products():
             ))
             
             db.commit()
+            response_cache.invalidate('products')
             new_product_id = cursor.lastrowid
             
             # Get the created product with category info
@@ -820,75 +1211,82 @@ def admin_manage_products():
     try:
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 20, type=int)
-        category_id = request.args.get('category_id', type=int)
-        active_only = request.args.get('active_only', 'true').lower() == 'true'
-        search = request.args.get('search', '')
+        filter_sql, params = build_product_filters(request.args)
+        
+        # Optional column projection, e.g. ?fields=sku,name_en,price,images
+        fields = parse_admin_product_fields(request.args.get('fields', ''))
+        if fields is None:
+            return jsonify({'success': False, 'error': 'Invalid fields parameter'}), 400
+        
+        keyset = wants_keyset_pagination()
+        
+        if fields:
+            columns = ['p.id'] + [f'p.{field}' for field in fields if field in ADMIN_PRODUCT_COLUMNS]
+            if keyset and 'created_at' not in fields:
+                # Cursors are built from (created_at, id)
+                columns.append('p.created_at')
+            columns += [f'c.{field[len("category_"):]} as {field}' for field in fields
+                        if field in ('category_name_en', 'category_name_zh')]
+            select_clause = ', '.join(columns)
+            load_images = 'images' in fields or 'primary_image' in fields
+        else:
+            select_clause = 'p.*, c.name_en as category_name_en, c.name_zh as category_name_zh'
+            load_images = True
+        
+        # Cursor pagination on (created_at, id), newest first
+        try:
+            cursor = decode_cursor(request.args.get('cursor')) if keyset else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # Build query
-        base_query = '''
-            SELECT p.*, c.name_en as category_name_en, c.name_zh as category_name_zh,
-                   (SELECT image_url FROM product_images pi WHERE pi.product_id = p.id AND pi.is_primary = 1 LIMIT 1) as primary_image
-            FROM products p
-            LEFT JOIN product_categories c ON p.category_id = c.id
-            WHERE 1=1
-        '''
-        count_query = 'SELECT COUNT(*) as total FROM products p WHERE 1=1'
-        params = []
-        
-        # Add filters
-        if active_only:
-            base_query += ' AND p.is_active = 1'
-            count_query += ' AND p.is_active = 1'
-        
-        if category_id:
-            base_query += ' AND p.category_id = ?'
-            count_query += ' AND p.category_id = ?'
-            params.append(category_id)
-        
-        if search:
-            search_condition = ' AND (p.name_en LIKE ? OR p.name_zh LIKE ? OR p.sku LIKE ?)'
-            base_query += search_condition
-            count_query += search_condition
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param, search_param])
-        
-        # Get total count
-        total_count = db.execute(count_query, params).fetchone()['total']
-        
-        # Add pagination
-        offset = (page - 1) * limit
-        base_query += ' ORDER BY p.sort_order, p.created_at DESC LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-        
-        # Execute query
-        products_cursor = db.execute(base_query, params)
-        products = products_cursor.fetchall()
+        query, query_params, count_query = admin_list_query(
+            'products', filter_sql, params, limit, page, cursor, keyset, columns=select_clause)
         
-        # Format products data
-        products_list = []
-        for product in products:
-            product_dict = dict(product)
-            
-            # Get product images
-            images_cursor = db.execute('''
-                SELECT image_url, alt_text_en, is_primary, sort_order
-                FROM product_images 
-                WHERE product_id = ? 
-                ORDER BY is_primary DESC, sort_order
-            ''', (product['id'],))
-            product_dict['images'] = [dict(img) for img in images_cursor.fetchall()]
-            
-            products_list.append(product_dict)
+        include_total = not keyset or request.args.get('include_total', 'false').lower() == 'true'
         
-        return jsonify({
-            'success': True,
-            'products': products_list,
-            'pagination': {
+        # Total count is cached per products data version
+        total_count = cached_count(db, count_query, params, table_version('products')) if include_total else None
+        
+        rows = db.execute(query, query_params).fetchall()
+        if keyset:
+            products_list, pagination = keyset_page(rows, cursor, limit)
+            products_list = [dict(row) for row in products_list]
+            pagination['total'] = total_count
+        else:
+            products_list = [dict(row) for row in rows]
+            pagination = {
                 'current': page,
                 'total': total_count,
                 'pages': (total_count + limit - 1) // limit,
                 'limit': limit
             }
+        
+        # Load images for the whole page in one query and group them per product
+        if load_images and products_list:
+            images_by_product = {product['id']: [] for product in products_list}
+            image_rows = db_manager.fetch_in('''
+                SELECT product_id, image_url, alt_text_en, is_primary, sort_order
+                FROM product_images 
+                WHERE product_id IN ({placeholders}) 
+                ORDER BY product_id, is_primary DESC, sort_order
+            ''', list(images_by_product))
+            for image in image_rows:
+                image = dict(image)
+                images_by_product[image.pop('product_id')].append(image)
+            
+            for product in products_list:
+                images = images_by_product[product['id']]
+                if not fields or 'primary_image' in fields:
+                    primary = next((img for img in images if img['is_primary']), None)
+                    product['primary_image'] = primary['image_url'] if primary else None
+                if not fields or 'images' in fields:
+                    product['images'] = images
+        
+        return jsonify({
+            'success': True,
+            'products': products_list,
+            'pagination': pagination
         })
         
     except sqlite3.Error as e:
@@ -926,6 +1324,7 @@ def admin_manage_single_product(product_id):
                  image_url, product_id)
             )
             db.commit()
+            response_cache.invalidate('products')
             updated_product = db.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
             return jsonify(dict(updated_product))
         except sqlite3.IntegrityError as e:
@@ -936,6 +1335,7 @@ def admin_manage_single_product(product_id):
             os.remove(product['image_url'])
         db.execute('DELETE FROM products WHERE id = ?', (product_id,))
         db.commit()
+        response_cache.invalidate('products')
         return jsonify({'message': 'Product deleted successfully'})
 
     return jsonify(dict(product))
@@ -944,6 +1344,8 @@ def admin_manage_single_product(product_id):
 
 # Get product categories
 @app.route('/api/categories', methods=['GET'])
+@conditional_endpoint('product_categories')
+@cached_endpoint('categories')
 def get_categories():
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -974,6 +1376,8 @@ def get_categories():
 
 # Get page content
 @app.route('/api/content/<page_key>', methods=['GET'])
+@conditional_endpoint('page_contents')
+@cached_endpoint('content')
 def get_page_content(page_key):
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -1003,6 +1407,8 @@ def get_page_content(page_key):
 
 # Get news articles
 @app.route('/api/news', methods=['GET'])
+@conditional_endpoint('news_articles')
+@cached_endpoint('news')
 def get_news():
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -1038,6 +1444,8 @@ def get_news():
 
 # Get case studies
 @app.route('/api/cases', methods=['GET'])
+@conditional_endpoint('cases')
+@cached_endpoint('cases')
 def get_cases():
     db = get_db()
     language = request.args.get('lang', 'en')
@@ -1086,6 +1494,25 @@ def search_products():
         return jsonify([])
     
     try:
+        match_query = build_match_query(query, language) if fts_available(db) else None
+        if match_query:
+            # Indexed search ranked by bm25 with SKU > name > description weights
+            weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+            search_cursor = db.execute(f'''
+                SELECT p.id, p.sku,
+                       CASE WHEN ? = 'zh' THEN p.name_zh ELSE p.name_en END as name,
+                       CASE WHEN ? = 'zh' THEN p.description_zh ELSE p.description_en END as description,
+                       p.pixel_pitch, pi.image_url
+                FROM products_fts
+                JOIN products p ON p.id = products_fts.rowid
+                LEFT JOIN product_images pi ON p.id = pi.product_id AND pi.is_primary = 1
+                WHERE products_fts MATCH ? AND p.is_active = 1
+                ORDER BY bm25(products_fts, {weights}), p.name_en
+                LIMIT 20
+            ''', (language, language, match_query))
+            return jsonify([dict(row) for row in search_cursor.fetchall()])
+        
+        # Queries shorter than a trigram fall back to LIKE matching
         search_cursor = db.execute('''
             SELECT p.id, p.sku,
                    CASE WHEN ? = 'zh' THEN p.name_zh ELSE p.name_en END as name,
@@ -1121,6 +1548,23 @@ def search_products():
     except sqlite3.Error:
         return jsonify([])
 
+# In-memory prefix index for typeahead, rebuilt when products change
+suggest_index = SuggestIndex(db_manager)
+
+@app.route('/api/search/suggest', methods=['GET'])
+def search_suggest():
+    """Typeahead completions for SKU, product name, pixel pitch and category"""
+    prefix = request.args.get('q', '')
+    language = request.args.get('lang', 'en')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    
+    try:
+        suggestions = suggest_index.suggest(prefix, language, limit)
+    except sqlite3.Error:
+        suggestions = []
+    
+    return jsonify({'query': prefix, 'suggestions': suggestions})
+
 @app.route('/api/admin/inquiries', methods=['GET'])
 @login_required
 def admin_get_inquiries():
@@ -1130,62 +1574,52 @@ def admin_get_inquiries():
     # Get parameters
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 20, type=int)
-    status = request.args.get('status', '')
-    priority = request.args.get('priority', '')
-    inquiry_type = request.args.get('type', '')
-    search = request.args.get('search', '')
     
     try:
-        # Build base query
-        base_query = '''
-            SELECT i.*, 
-                   CASE WHEN i.estimated_value IS NOT NULL THEN i.estimated_value ELSE 0 END as est_value
-            FROM inquiries i
-            WHERE 1=1
-        '''
-        count_query = 'SELECT COUNT(*) as total FROM inquiries i WHERE 1=1'
-        params = []
-        
-        # Add filters
-        if status:
-            base_query += ' AND i.status = ?'
-            count_query += ' AND i.status = ?'
-            params.append(status)
-        
-        if priority:
-            base_query += ' AND i.priority = ?'
-            count_query += ' AND i.priority = ?'
-            params.append(priority)
-        
-        if inquiry_type:
-            base_query += ' AND i.inquiry_type = ?'
-            count_query += ' AND i.inquiry_type = ?'
-            params.append(inquiry_type)
-        
-        if search:
-            search_condition = ' AND (i.name LIKE ? OR i.email LIKE ? OR i.company LIKE ?)'
-            base_query += search_condition
-            count_query += search_condition
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param, search_param])
-        
-        # Get total count
-        total_count = db.execute(count_query, params).fetchone()['total']
-        
-        # Add pagination
-        offset = (page - 1) * limit
-        base_query += ' ORDER BY i.created_at DESC LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-        
-        # Execute query
-        inquiries_cursor = db.execute(base_query, params)
-        inquiries = inquiries_cursor.fetchall()
+        filter_sql, params = build_inquiry_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    keyset = wants_keyset_pagination()
+    try:
+        # Cursor pagination on (created_at, id), newest first
+        cursor = decode_cursor(request.args.get('cursor')) if keyset else None
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        # Build query
+        query, query_params, count_query = admin_list_query('inquiries', filter_sql, params, limit, page, cursor, keyset)
+        
+        include_total = not keyset or request.args.get('include_total', 'false').lower() == 'true'
+        
+        # Total count is cached per inquiries (and, when filtering by tag, inquiry_tags) data version
+        version = table_version('inquiries')
+        if request.args.get('tag'):
+            version = (version, table_version('inquiry_tags'))
+        total_count = cached_count(db, count_query, params, version) if include_total else None
+        
+        if keyset:
+            rows = db.execute(query, query_params).fetchall()
+            inquiries, pagination = keyset_page(rows, cursor, limit)
+            pagination['total'] = total_count
+            inquiries = [dict(row) for row in inquiries]
+            attach_inquiry_tags(inquiries)
+            
+            return jsonify({
+                'inquiries': inquiries,
+                'pagination': pagination,
+                'total': total_count
+            })
+        
+        inquiries = [dict(row) for row in db.execute(query, query_params).fetchall()]
+        attach_inquiry_tags(inquiries)
         
         # Calculate pagination info
         total_pages = (total_count + limit - 1) // limit
         
         return jsonify({
-            'inquiries': [dict(row) for row in inquiries],
+            'inquiries': inquiries,
             'pagination': {
                 'current': page,
                 'pages': total_pages,
@@ -1230,102 +1664,35 @@ def admin_inquiries():
 @login_required
 def get_dashboard_stats():
     """Get comprehensive dashboard statistics"""
-    db = get_db()
-    
     try:
-        # Product statistics
-        total_products = db.execute('SELECT COUNT(*) as count FROM products').fetchone()['count']
-        active_products = db.execute('SELECT COUNT(*) as count FROM products WHERE is_active = 1').fetchone()['count']
-        featured_products = db.execute('SELECT COUNT(*) as count FROM products WHERE is_featured = 1').fetchone()['count']
-        
-        # Inquiry statistics
-        total_inquiries = db.execute('SELECT COUNT(*) as count FROM inquiries').fetchone()['count']
-        new_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE created_at >= datetime('now', '-7 days') AND status = 'new'
-        ''').fetchone()['count']
-        
-        pending_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE status IN ('new', 'contacted')
-        ''').fetchone()['count']
-        
-        high_priority = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE priority = 'high' AND status NOT IN ('closed', 'lost')
-        ''').fetchone()['count']
-        
-        # Monthly statistics
-        monthly_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE created_at >= datetime('now', 'start of month')
-        ''').fetchone()['count']
-        
-        # Today's statistics
-        today_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE DATE(created_at) = DATE('now')
-        ''').fetchone()['count']
-        
-        # Conversion statistics
-        quoted_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries WHERE status = 'quoted'
-        ''').fetchone()['count']
-        
-        closed_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries WHERE status = 'closed'
-        ''').fetchone()['count']
-        
-        conversion_rate = (closed_inquiries / total_inquiries * 100) if total_inquiries > 0 else 0
-        
-        # Response time statistics
-        avg_response_time = db.execute('''
-            SELECT AVG(
-                CASE 
-                    WHEN first_response_at IS NOT NULL 
-                    THEN (julianday(first_response_at) - julianday(created_at)) * 24 
-                    ELSE NULL 
-                END
-            ) as avg_hours
-            FROM inquiries 
-            WHERE first_response_at IS NOT NULL
-        ''').fetchone()['avg_hours'] or 0
-        
-        # Recent activity
-        recent_activity = db.execute('''
-            SELECT 
-                'inquiry' as type,
-                name as title,
-                created_at as timestamp,
-                'New inquiry from ' || name as description
-            FROM inquiries 
-            WHERE created_at >= datetime('now', '-24 hours')
-            ORDER BY created_at DESC 
-            LIMIT 5
-        ''').fetchall()
+        stats = db_manager.stats.dashboard()
+        inquiries = stats['inquiries']
+        
+        recent_activity = [
+            {
+                'type': 'inquiry',
+                'title': inquiry['name'],
+                'timestamp': inquiry['created_at'],
+                'description': 'New inquiry from ' + inquiry['name']
+            }
+            for inquiry in stats['recent_inquiries'] if inquiry['is_last_24_hours']
+        ]
         
         return jsonify({
-            'products': {
-                'total': total_products,
-                'active': active_products,
-                'featured': featured_products,
-                'inactive': total_products - active_products
-            },
+            'products': stats['products'],
             'inquiries': {
-                'total': total_inquiries,
-                'new': new_inquiries,
-                'pending': pending_inquiries,
-                'high_priority': high_priority,
-                'monthly': monthly_inquiries,
-                'today': today_inquiries,
-                'quoted': quoted_inquiries,
-                'closed': closed_inquiries,
-                'conversion_rate': round(conversion_rate, 1)
+                'total': inquiries['total'],
+                'new': inquiries['new_last_7_days'],
+                'pending': inquiries['pending'],
+                'high_priority': inquiries['high_priority'],
+                'monthly': inquiries['monthly'],
+                'today': inquiries['today'],
+                'quoted': inquiries['quoted'],
+                'closed': inquiries['closed'],
+                'conversion_rate': inquiries['conversion_rate']
             },
-            'performance': {
-                'avg_response_time': round(avg_response_time, 1)
-            },
-            'recent_activity': [dict(row) for row in recent_activity]
+            'performance': stats['performance'],
+            'recent_activity': recent_activity
         })
         
     except sqlite3.Error as e:
@@ -1338,14 +1705,9 @@ def get_dashboard_charts():
     db = get_db()
     
     try:
-        # Inquiry trend (last 7 days)
-        inquiry_trend = db.execute('''
-            SELECT DATE(created_at) as date, COUNT(*) as count
-            FROM inquiries 
-            WHERE created_at >= datetime('now', '-7 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        ''').fetchall()
+        # Inquiry trend (last 7 days) and types (last 30 days) come from the daily rollup
+        inquiry_trend = db_manager.stats.daily_trend(7)
+        inquiry_types = db_manager.stats.breakdown('inquiry_type', 30)
         
         # Product categories
         product_categories = db.execute('''
@@ -1356,15 +1718,6 @@ def get_dashboard_charts():
             ORDER BY count DESC
         ''').fetchall()
         
-        # Inquiry types
-        inquiry_types = db.execute('''
-            SELECT inquiry_type, COUNT(*) as count
-            FROM inquiries 
-            WHERE created_at >= datetime('now', '-30 days')
-            GROUP BY inquiry_type
-            ORDER BY count DESC
-        ''').fetchall()
-        
         return jsonify({
             'inquiry_trend': {
                 'labels': [row['date'] for row in inquiry_trend],
@@ -1413,6 +1766,7 @@ def get_inquiry_detail(inquiry_id):
         ''', (inquiry_id,)).fetchall()
         
         inquiry_dict['followups'] = [dict(row) for row in followups]
+        attach_inquiry_tags([inquiry_dict])
         
         return jsonify({
             'success': True,
@@ -1520,34 +1874,16 @@ def update_inquiry_status(inquiry_id):
 @login_required
 def get_admin_dashboard_stats():
     """Get statistics for inquiry management page"""
-    db = get_db()
-    
     try:
-        # Get inquiry counts by status
-        new_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries WHERE status = 'new'
-        ''').fetchone()['count']
-        
-        contacted_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries WHERE status IN ('contacted', 'quoted')
-        ''').fetchone()['count']
-        
-        high_priority = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries 
-            WHERE priority = 'high' AND status NOT IN ('closed', 'lost')
-        ''').fetchone()['count']
-        
-        closed_inquiries = db.execute('''
-            SELECT COUNT(*) as count FROM inquiries WHERE status = 'closed'
-        ''').fetchone()['count']
+        inquiries = db_manager.stats.dashboard()['inquiries']
         
         return jsonify({
             'success': True,
             'stats': {
-                'new_inquiries': new_inquiries,
-                'contacted_inquiries': contacted_inquiries,
-                'high_priority': high_priority,
-                'closed_inquiries': closed_inquiries
+                'new_inquiries': inquiries['new'],
+                'contacted_inquiries': inquiries['contacted'],
+                'high_priority': inquiries['high_priority'],
+                'closed_inquiries': inquiries['closed']
             }
         })
         
@@ -1608,196 +1944,396 @@ def get_product_categories():
             ]
         })
 
-@app.route('/api/admin/products/bulk', methods=['POST'])
-@login_required
-def bulk_update_products():
-    """Enhanced bulk update products with validation and logging"""
-    data = request.get_json()
-    
-    if not data or not data.get('product_ids') or not data.get('action'):
-        return jsonify({'success': False, 'error': 'Missing required fields'}), 400
-    
-    db = get_db()
-    product_ids = data.get('product_ids')
+def filter_args(filters):
+    """Turn a JSON filter object into list-endpoint style query arguments"""
+    args = MultiDict()
+    for key, value in filters.items():
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        elif isinstance(value, list):
+            value = ','.join(str(item) for item in value)
+        args[key] = str(value)
+    return args
+
+def product_bulk_statement(data):
+    """Statement for a product bulk action; raises ValueError on bad input"""
     action = data.get('action')
     
-    # Validate product IDs
-    if not isinstance(product_ids, list) or len(product_ids) == 0:
-        return jsonify({'success': False, 'error': 'Invalid product IDs'}), 400
-    
-    # Validate that all product IDs exist
-    placeholders = ','.join(['?'] * len(product_ids))
-    existing_products = db.execute(f'''
-        SELECT id, name_en FROM products WHERE id IN ({placeholders})
-    ''', product_ids).fetchall()
-    
-    if len(existing_products) != len(product_ids):
-        return jsonify({'success': False, 'error': 'Some products not found'}), 400
+    if action == 'activate':
+        return "UPDATE products SET is_active = 1, updated_at = datetime('now') WHERE is_active = 0 AND id IN {selection}", []
+    elif action == 'deactivate':
+        return "UPDATE products SET is_active = 0, updated_at = datetime('now') WHERE is_active = 1 AND id IN {selection}", []
+    elif action == 'feature':
+        return "UPDATE products SET is_featured = 1, updated_at = datetime('now') WHERE is_featured = 0 AND id IN {selection}", []
+    elif action == 'unfeature':
+        return "UPDATE products SET is_featured = 0, updated_at = datetime('now') WHERE is_featured = 1 AND id IN {selection}", []
+    elif action == 'delete':
+        # Soft delete - mark as inactive and set deleted timestamp
+        return ("UPDATE products SET is_active = 0, deleted_at = datetime('now'), updated_at = datetime('now') "
+                "WHERE deleted_at IS NULL AND id IN {selection}", [])
+    elif action == 'update_category':
+        category_id = data.get('category_id')
+        if not category_id:
+            raise ValueError('Category ID required for category update')
+        return "UPDATE products SET category_id = ?, updated_at = datetime('now') WHERE id IN {selection}", [category_id]
+    elif action == 'update_price':
+        price_adjustment = data.get('price_adjustment', {})
+        adjustment_type = price_adjustment.get('type')  # 'percentage' or 'fixed'
+        adjustment_value = price_adjustment.get('value', 0)
+        
+        if adjustment_type == 'percentage':
+            return ("UPDATE products SET price = price * (1 + ? / 100.0), updated_at = datetime('now') "
+                    "WHERE price IS NOT NULL AND id IN {selection}", [adjustment_value])
+        elif adjustment_type == 'fixed':
+            return ("UPDATE products SET price = price + ?, updated_at = datetime('now') "
+                    "WHERE price IS NOT NULL AND id IN {selection}", [adjustment_value])
+        raise ValueError('Invalid price adjustment type')
+    
+    raise ValueError('Invalid action')
+
+def inquiry_bulk_statement(data):
+    """Statement for an inquiry bulk action; raises ValueError on bad input"""
+    action = data.get('action')
     
+    if action == 'update_status':
+        if not data.get('status'):
+            raise ValueError('Status is required')
+        return "UPDATE inquiries SET status = ?, updated_at = datetime('now') WHERE id IN {selection}", [data['status']]
+    
+    elif action == 'update_priority':
+        if not data.get('priority'):
+            raise ValueError('Priority is required')
+        return "UPDATE inquiries SET priority = ?, updated_at = datetime('now') WHERE id IN {selection}", [data['priority']]
+    
+    elif action == 'assign':
+        return ("UPDATE inquiries SET assigned_to = ?, updated_at = datetime('now') WHERE id IN {selection}",
+                [data.get('assigned_to')])
+    
+    elif action in ('add_tag', 'remove_tag'):
+        tags = normalize_tags(data.get('tags', data.get('tag')))
+        if not tags:
+            raise ValueError('Tag is required')
+        
+        # One set-based statement per chunk covering every tag; the count is
+        # the number of (inquiry, tag) pairs actually added or removed
+        if action == 'add_tag':
+            return (f'''
+                INSERT OR IGNORE INTO inquiry_tags (inquiry_id, tag)
+                SELECT i.id, t.column1 FROM inquiries i, (VALUES {','.join(['(?)'] * len(tags))}) t
+                WHERE i.id IN {{selection}}
+            ''', tags)
+        return (f'''
+            DELETE FROM inquiry_tags
+            WHERE tag IN ({','.join(['?'] * len(tags))}) AND inquiry_id IN {{selection}}
+        ''', tags)
+    
+    raise ValueError('Invalid action')
+
+# entity -> (table, ID list key, filter builder, table alias, statement builder)
+BULK_TARGETS = {
+    'products': ('products', 'product_ids', build_product_filters, 'p', product_bulk_statement),
+    'inquiries': ('inquiries', 'inquiry_ids', build_inquiry_filters, 'i', inquiry_bulk_statement),
+}
+
+def open_bulk_selection(entity, data):
+    """Load the targets of a bulk action into a new BulkSelection.
+
+    Targets come from data[<ids key>] or a data['filter'] object. Returns
+    (selection, total_selected); raises ValueError for bad IDs or filters.
+    """
+    table, ids_key, build_filters, alias, _ = BULK_TARGETS[entity]
+    selection = BulkSelection(get_db(), table).open()
     try:
-        updated_count = 0
-        
-        if action == 'activate':
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET is_active = 1, updated_at = datetime('now')
-                WHERE id IN ({placeholders}) AND is_active = 0
-            ''', product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'deactivate':
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET is_active = 0, updated_at = datetime('now')
-                WHERE id IN ({placeholders}) AND is_active = 1
-            ''', product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'feature':
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET is_featured = 1, updated_at = datetime('now')
-                WHERE id IN ({placeholders}) AND is_featured = 0
-            ''', product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'unfeature':
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET is_featured = 0, updated_at = datetime('now')
-                WHERE id IN ({placeholders}) AND is_featured = 1
-            ''', product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'delete':
-            # Soft delete - mark as inactive and set deleted timestamp
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET is_active = 0, deleted_at = datetime('now'), updated_at = datetime('now')
-                WHERE id IN ({placeholders}) AND deleted_at IS NULL
-            ''', product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'update_category':
-            category_id = data.get('category_id')
-            if not category_id:
-                return jsonify({'success': False, 'error': 'Category ID required for category update'}), 400
-            
-            cursor = db.execute(f'''
-                UPDATE products 
-                SET category_id = ?, updated_at = datetime('now')
-                WHERE id IN ({placeholders})
-            ''', [category_id] + product_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'update_price':
-            price_adjustment = data.get('price_adjustment', {})
-            adjustment_type = price_adjustment.get('type')  # 'percentage' or 'fixed'
-            adjustment_value = price_adjustment.get('value', 0)
-            
-            if adjustment_type == 'percentage':
-                cursor = db.execute(f'''
-                    UPDATE products 
-                    SET price = price * (1 + ? / 100.0), updated_at = datetime('now')
-                    WHERE id IN ({placeholders}) AND price IS NOT NULL
-                ''', [adjustment_value] + product_ids)
-            elif adjustment_type == 'fixed':
-                cursor = db.execute(f'''
-                    UPDATE products 
-                    SET price = price + ?, updated_at = datetime('now')
-                    WHERE id IN ({placeholders}) AND price IS NOT NULL
-                ''', [adjustment_value] + product_ids)
-            else:
-                return jsonify({'success': False, 'error': 'Invalid price adjustment type'}), 400
-            
-            updated_count = cursor.rowcount
-            
+        if isinstance(data.get('filter'), dict):
+            filter_sql, params = build_filters(filter_args(data['filter']), alias)
+            total_selected = selection.add_filter(filter_sql, params, alias)
         else:
-            return jsonify({'success': False, 'error': 'Invalid action'}), 400
-        
-        db.commit()
-        
-        # Log the bulk operation
+            ids = data.get(ids_key)
+            if not isinstance(ids, list) or len(ids) == 0:
+                raise ValueError(f'Invalid {ids_key.replace("_", " ")}')
+            total_selected = selection.add_ids(ids)
+            # Explicit product IDs must all exist (one anti-join instead of re-selecting every product)
+            if entity == 'products' and selection.missing():
+                raise ValueError('Some products not found')
+    except (ValueError, sqlite3.Error):
+        selection.conn.rollback()
+        selection.close()
+        raise
+    return selection, total_selected
+
+def run_bulk_statement(selection, statement):
+    """Run a bulk statement chunk by chunk in one transaction, yielding progress.
+
+    Commits after the last chunk; rolls back if the run fails or is abandoned.
+    """
+    sql, params = statement
+    completed = False
+    try:
+        for progress in selection.run(sql, params):
+            yield progress
+        selection.conn.commit()
+        completed = True
+    finally:
+        if not completed:
+            selection.conn.rollback()
+        selection.close()
+
+def finish_bulk_action(entity, data, updated_count, total_selected, user_id, ip_address=None, user_agent=None):
+    """Invalidate caches and log a completed bulk action; returns the response payload"""
+    action = data.get('action')
+    if action in ('add_tag', 'remove_tag'):
+        # Tag actions count (inquiry, tag) pairs, not inquiries
+        message = f"{updated_count} tag assignments {'added' if action == 'add_tag' else 'removed'}"
+    elif entity == 'inquiries':
+        message = f'Successfully updated {updated_count} inquiries'
+    else:
+        message = f'Successfully {action}d {updated_count} of {total_selected} products'
+        response_cache.invalidate('products')
+        
+        # Log the bulk operation (ID lists are truncated)
+        logged = {'action': action, 'total_selected': total_selected}
+        if isinstance(data.get('filter'), dict):
+            logged['filter'] = data['filter']
+        else:
+            logged['product_ids'] = data['product_ids'][:100]
         try:
             db_manager.log_activity(
-                user_id=current_user.id if hasattr(current_user, 'id') else None,
+                user_id=user_id,
                 action=f'bulk_{action}',
                 table_name='products',
                 record_id=None,
-                new_values={'product_ids': product_ids, 'action': action},
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent', '')
+                new_values=logged,
+                ip_address=ip_address,
+                user_agent=user_agent
             )
         except:
             pass  # Don't fail the operation if logging fails
+    
+    return {
+        'success': True,
+        'message': message,
+        'updated_count': updated_count,
+        'total_selected': total_selected
+    }
+
+def handle_bulk_request(entity):
+    """Shared implementation of the product and inquiry bulk endpoints.
+
+    ?async=true queues the action as a background job (202); ?progress=true
+    streams NDJSON progress events per chunk, ending with a 'done' event.
+    """
+    data = request.get_json()
+    _, ids_key, _, _, build_statement = BULK_TARGETS[entity]
+    
+    if not data or not (data.get(ids_key) or data.get('filter')) or not data.get('action'):
+        return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+    
+    try:
+        statement = build_statement(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    user_id = current_user.id if hasattr(current_user, 'id') else None
+    if wants_async():
+        return job_accepted(job_queue.enqueue('bulk_update', {'entity': entity, 'data': data}, user_id))
+    
+    try:
+        selection, total_selected = open_bulk_selection(entity, data)
+    except (ValueError, sqlite3.Error) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    def finish(updated_count):
+        return finish_bulk_action(entity, data, updated_count, total_selected, user_id,
+                                  request.remote_addr, request.headers.get('User-Agent', ''))
+    
+    if request.args.get('progress', 'false').lower() == 'true':
+        def generate_progress():
+            updated_count = 0
+            try:
+                for progress in run_bulk_statement(selection, statement):
+                    updated_count = progress['affected']
+                    yield json.dumps(dict(progress, event='progress')) + '\n'
+            except sqlite3.Error as e:
+                yield json.dumps({'event': 'error', 'error': 'Database error'}) + '\n'
+                return
+            yield json.dumps(dict(finish(updated_count), event='done'), ensure_ascii=False) + '\n'
         
-        return jsonify({
-            'success': True,
-            'message': f'Successfully {action}d {updated_count} of {len(product_ids)} products',
-            'updated_count': updated_count,
-            'total_selected': len(product_ids)
-        })
-        
+        return Response(stream_with_context(generate_progress()), mimetype='application/x-ndjson')
+    
+    try:
+        updated_count = 0
+        for progress in run_bulk_statement(selection, statement):
+            updated_count = progress['affected']
     except sqlite3.Error as e:
         return jsonify({'success': False, 'error': 'Database error'}), 500
+    
+    return jsonify(finish(updated_count))
+
+@job_queue.handler('bulk_update')
+def run_bulk_update_job(payload, job):
+    entity, data = payload['entity'], payload['data']
+    statement = BULK_TARGETS[entity][4](data)
+    selection, total_selected = open_bulk_selection(entity, data)
+    
+    updated_count = 0
+    for progress in run_bulk_statement(selection, statement):
+        updated_count = progress['affected']
+        job.progress(progress['processed'], progress['total'])
+    
+    return finish_bulk_action(entity, data, updated_count, total_selected, job.created_by)
+
+@app.route('/api/admin/products/bulk', methods=['POST'])
+@login_required
+def bulk_update_products():
+    """Enhanced bulk update products with validation and logging.
+
+    Targets are given as product_ids (any number) or as a 'filter' object using
+    the admin product list parameters.
+    """
+    return handle_bulk_request('products')
+
+@app.route('/api/admin/products/import', methods=['POST'])
+@login_required
+@csrf_protect
+def import_products():
+    """Bulk upsert products by SKU from an uploaded CSV or NDJSON file.
+
+    All rows are written in one transaction; invalid rows are reported in
+    the response without aborting the import. ?dry_run=true validates and
+    rolls back. ?progress=true streams NDJSON progress events per batch,
+    ending with the full report.
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    
+    file_format = request.args.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    if file_format == 'jsonl':
+        file_format = 'ndjson'
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'Unsupported import format: {file_format}'}), 400
+    
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    
+    if wants_async():
+        # The upload is kept next to the job's other files until the job has run
+        job_id = uuid.uuid4().hex
+        os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+        upload_name = f'{job_id}.upload.{file_format}'
+        upload.save(os.path.join(JOB_OUTPUT_DIR, upload_name))
+        payload = {'upload': upload_name, 'format': file_format, 'dry_run': dry_run, 'filename': upload.filename}
+        user_id = current_user.id if hasattr(current_user, 'id') else None
+        return job_accepted(job_queue.enqueue('product_import', payload, user_id, job_id=job_id))
+    
+    db = get_db()
+    importer = ProductImporter(db)
+    rows = iter_import_rows(upload.stream, file_format)
+    
+    def finish(report):
+        if not dry_run and (report['inserted'] or report['updated']):
+            response_cache.invalidate('products')
+            try:
+                db_manager.log_activity(
+                    user_id=current_user.id if hasattr(current_user, 'id') else None,
+                    action='bulk_import',
+                    table_name='products',
+                    record_id=None,
+                    new_values=importer.summary(),
+                    ip_address=request.remote_addr,
+                    user_agent=request.headers.get('User-Agent', '')
+                )
+            except Exception:
+                pass  # Don't fail the import if logging fails
+        return dict(report, success=True, filename=upload.filename)
+    
+    if request.args.get('progress', 'false').lower() == 'true':
+        def generate_progress():
+            try:
+                for progress in importer.run_batches(rows, dry_run=dry_run):
+                    yield json.dumps(dict(progress, event='progress')) + '\n'
+            except (ValueError, sqlite3.Error) as e:
+                yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+                return
+            yield json.dumps(dict(finish(importer.report), event='done'), ensure_ascii=False) + '\n'
         
-        db.commit()
-        
-        return jsonify({'message': f'{len(inquiry_ids)} inquiries updated successfully'})
-        
-    except sqlite3.Error as e:
-        return jsonify({'error': 'Database error'}), 500
+        return Response(stream_with_context(generate_progress()), mimetype='application/x-ndjson')
+    
+    try:
+        report = importer.run(rows, dry_run=dry_run)
+    except (ValueError, sqlite3.Error) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify(finish(report))
+
+@job_queue.handler('product_import')
+def run_product_import_job(payload, job):
+    path = os.path.join(JOB_OUTPUT_DIR, payload['upload'])
+    importer = ProductImporter(get_db())
+    try:
+        with open(path, 'rb') as stream:
+            rows = iter_import_rows(stream, payload['format'])
+            for progress in importer.run_batches(rows, dry_run=payload['dry_run']):
+                job.progress(progress['processed'], message=f"{progress['inserted']} inserted, {progress['updated']} updated")
+    finally:
+        os.remove(path)
+    
+    report = importer.report
+    if not payload['dry_run'] and (report['inserted'] or report['updated']):
+        response_cache.invalidate('products')
+        try:
+            db_manager.log_activity(
+                user_id=job.created_by,
+                action='bulk_import',
+                table_name='products',
+                record_id=None,
+                new_values=importer.summary()
+            )
+        except Exception:
+            pass  # Don't fail the import if logging fails
+    return dict(report, success=True, filename=payload['filename'])
+
+# Rows fetched per round trip when streaming exports
+EXPORT_CHUNK_SIZE = 500
+
+def gzip_stream(chunks):
+    """Compress a stream of text or byte chunks into a gzip byte stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 @app.route('/api/admin/inquiries/export', methods=['GET'])
 @login_required
 def export_inquiries():
-    """Export inquiries to CSV"""
-    import csv
-    import io
-    
-    # Get filter parameters
-    status = request.args.get('status', '')
-    priority = request.args.get('priority', '')
-    inquiry_type = request.args.get('type', '')
-    search = request.args.get('search', '')
+    """Stream inquiries as CSV (optionally gzip encoded)"""
+    try:
+        filter_sql, params = build_inquiry_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    query = f'''
+        SELECT i.id, i.name, i.email, i.company, i.phone, i.country,
+               i.product_interest, i.inquiry_type, i.status, i.priority,
+               i.message, i.created_at, i.estimated_value
+        FROM inquiries i
+        WHERE 1=1{filter_sql}
+        ORDER BY i.created_at DESC
+    '''
     
     db = get_db()
-    
     try:
-        # Build query with filters
-        query = '''
-            SELECT i.id, i.name, i.email, i.company, i.phone, i.country,
-                   i.product_interest, i.inquiry_type, i.status, i.priority,
-                   i.message, i.created_at, i.estimated_value
-            FROM inquiries i
-            WHERE 1=1
-        '''
-        params = []
-        
-        if status:
-            query += ' AND i.status = ?'
-            params.append(status)
-        
-        if priority:
-            query += ' AND i.priority = ?'
-            params.append(priority)
-        
-        if inquiry_type:
-            query += ' AND i.inquiry_type = ?'
-            params.append(inquiry_type)
-        
-        if search:
-            query += ' AND (i.name LIKE ? OR i.email LIKE ? OR i.company LIKE ?)'
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param, search_param])
-        
-        query += ' ORDER BY i.created_at DESC'
-        
-        inquiries = db.execute(query, params).fetchall()
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Run the query up front so SQL errors still produce a JSON error
+        cursor = db.execute(query, params)
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
         
         # Write header
         writer.writerow([
@@ -1806,35 +2342,281 @@ def export_inquiries():
             'Message', 'Created At', 'Estimated Value'
         ])
         
-        # Write data
-        for inquiry in inquiries:
-            writer.writerow([
-                inquiry['id'], inquiry['name'], inquiry['email'],
-                inquiry['company'] or '', inquiry['phone'] or '',
-                inquiry['country'] or '', inquiry['product_interest'] or '',
-                inquiry['inquiry_type'], inquiry['status'], inquiry['priority'] or '',
-                inquiry['message'], inquiry['created_at'],
-                inquiry['estimated_value'] or ''
-            ])
-        
-        # Return CSV response
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=inquiries_{datetime.now().strftime("%Y%m%d")}.csv'
-            }
-        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            
+            for inquiry in rows:
+                writer.writerow([
+                    inquiry['id'], inquiry['name'], inquiry['email'],
+                    inquiry['company'] or '', inquiry['phone'] or '',
+                    inquiry['country'] or '', inquiry['product_interest'] or '',
+                    inquiry['inquiry_type'], inquiry['status'], inquiry['priority'] or '',
+                    inquiry['message'], inquiry['created_at'],
+                    inquiry['estimated_value'] or ''
+                ])
+            
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
         
-    except Exception as e:
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename=inquiries_{datetime.now().strftime("%Y%m%d")}.csv'
+    }
+    return export_response(generate_csv(), 'text/csv', headers)
+
+def export_response(body, mimetype, headers):
+    """Wrap an export generator in a streaming response, gzip encoded when requested"""
+    use_gzip = (request.args.get('gzip', 'false').lower() == 'true'
+                and 'gzip' in request.headers.get('Accept-Encoding', ''))
+    if use_gzip:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    
+    # stream_with_context keeps the pooled connection checked out until the export finishes
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+def attach_inquiry_followups(inquiries):
+    """Attach each inquiry's followups with one batched query per chunk"""
+    followups_by_inquiry = {inquiry['id']: [] for inquiry in inquiries}
+    rows = db_manager.fetch_in('''
+        SELECT f.inquiry_id, f.id, f.action_type, f.subject, f.notes,
+               f.next_action, f.next_action_date, f.user_id, f.created_at
+        FROM inquiry_followups f
+        WHERE f.inquiry_id IN ({placeholders})
+        ORDER BY f.inquiry_id, f.created_at
+    ''', list(followups_by_inquiry))
+    for row in rows:
+        followup = dict(row)
+        followups_by_inquiry[followup.pop('inquiry_id')].append(followup)
+    
+    for inquiry in inquiries:
+        inquiry['followups'] = followups_by_inquiry[inquiry['id']]
+
+def attach_inquiry_tags(inquiries):
+    """Attach each inquiry's tags with one batched query per chunk"""
+    tags = db_manager.get_inquiry_tags([inquiry['id'] for inquiry in inquiries])
+    for inquiry in inquiries:
+        inquiry['tags'] = tags[inquiry['id']]
+
+def attach_inquiry_children(inquiries):
+    attach_inquiry_followups(inquiries)
+    attach_inquiry_tags(inquiries)
+
+def attach_product_children(products):
+    db_manager.load_product_children(products)
+
+# dataset -> (filter builder, query template, nested collections, loader for nested collections)
+EXPORT_DATASETS = {
+    'inquiries': (
+        build_inquiry_filters,
+        '''
+            SELECT i.* FROM inquiries i
+            WHERE 1=1{filters}
+            ORDER BY i.created_at DESC, i.id DESC
+        ''',
+        ('followups', 'tags'),
+        attach_inquiry_children,
+    ),
+    'products': (
+        build_product_filters,
+        '''
+            SELECT p.*, c.slug as category_slug,
+                   c.name_en as category_name_en, c.name_zh as category_name_zh
+            FROM products p
+            LEFT JOIN product_categories c ON p.category_id = c.id
+            WHERE 1=1{filters}
+            ORDER BY p.id
+        ''',
+        PRODUCT_CHILD_COLLECTIONS,
+        attach_product_children,
+    ),
+}
+
+@app.route('/api/admin/export/<dataset>', methods=['GET'])
+@login_required
+def export_dataset(dataset):
+    """Stream inquiries (with followups) or products (with images/applications).
+
+    ?format= selects the exporter (csv, ndjson, xlsx, columnar); filters use the
+    same parameters as the matching admin list endpoint.
+    """
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'success': False, 'error': f'Unknown dataset: {dataset}'}), 404
+    build_filters, query, collections, attach_children = EXPORT_DATASETS[dataset]
+    
+    try:
+        exporter = get_exporter(request.args.get('format', 'ndjson'))
+        filter_sql, params = build_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if wants_async():
+        user_id = current_user.id if hasattr(current_user, 'id') else None
+        payload = {'dataset': dataset, 'args': request.args.to_dict()}
+        return job_accepted(job_queue.enqueue('export', payload, user_id))
+    
+    db = get_db()
+    try:
+        cursor = db.execute(query.format(filters=filter_sql), params)
+    except sqlite3.Error as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+    
+    columns = [column[0] for column in cursor.description] + list(collections)
+    headers = {'Content-Disposition': f'attachment; filename={export_filename(dataset, exporter)}'}
+    chunks = export_chunks(cursor, attach_children)
+    return export_response(exporter.stream(columns, chunks), exporter.content_type, headers)
+
+def export_filename(dataset, exporter):
+    return f'{dataset}_{datetime.now().strftime("%Y%m%d")}.{exporter.extension}'
+
+def export_chunks(cursor, attach_children):
+    """Fetch export rows in chunks, attaching nested collections per chunk"""
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+        if not rows:
+            break
+        records = [dict(row) for row in rows]
+        attach_children(records)
+        yield records
+
+@job_queue.handler('export')
+def run_export_job(payload, job):
+    dataset, args = payload['dataset'], MultiDict(payload['args'])
+    build_filters, query, collections, attach_children = EXPORT_DATASETS[dataset]
+    exporter = get_exporter(args.get('format', 'ndjson'))
+    filter_sql, params = build_filters(args)
+    query = query.format(filters=filter_sql)
+    
+    db = get_db()
+    total = db.execute(f'SELECT COUNT(*) FROM ({query})', params).fetchone()[0]
+    cursor = db.execute(query, params)
+    columns = [column[0] for column in cursor.description] + list(collections)
+    
+    exported = 0
+    def tracked_chunks():
+        nonlocal exported
+        for records in export_chunks(cursor, attach_children):
+            yield records
+            exported += len(records)
+            job.progress(exported, total)
+    
+    path = job.output_path(exporter.extension)
+    try:
+        with open(path, 'wb') as output:
+            for data in exporter.stream(columns, tracked_chunks()):
+                output.write(data)
+    except BaseException:
+        os.remove(path)
+        raise
+    
+    return {
+        'rows': exported,
+        'file': os.path.basename(path),
+        'filename': export_filename(dataset, exporter),
+        'content_type': exporter.content_type,
+        'size': os.path.getsize(path),
+    }
+
+@job_queue.handler('rebuild_stats')
+def run_rebuild_stats_job(payload, job):
+    db = get_db()
+    job.progress(0, 2, 'Rebuilding counters')
+    rebuild_stats_counters(db)
+    job.progress(1, 2, 'Rebuilding daily rollup')
+    rebuild_inquiry_rollup(db)
+    job.progress(2, 2)
+    return {'success': True}
+
+@app.route('/api/admin/dashboard/rebuild-stats', methods=['POST'])
+@login_required
+@csrf_protect
+def rebuild_stats():
+    """Recompute the dashboard counters and daily rollup from scratch (background job)"""
+    user_id = current_user.id if hasattr(current_user, 'id') else None
+    return job_accepted(job_queue.enqueue('rebuild_stats', {}, user_id))
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    """Recent background jobs, newest first (?status= filters)"""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    try:
+        return jsonify({'success': True, 'jobs': job_queue.list(request.args.get('status'), limit)})
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Status, progress and result of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/admin/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+@csrf_protect
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/admin/jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_job_output(job_id):
+    """Download the file produced by a finished export job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] != 'succeeded' or not (job['result'] or {}).get('file'):
+        return jsonify({'success': False, 'error': 'Job has no output to download'}), 409
+    
+    result = job['result']
+    return send_from_directory(JOB_OUTPUT_DIR, result['file'], mimetype=result['content_type'],
+                               as_attachment=True, download_name=result['filename'])
+
+@app.route('/api/admin/email-outbox', methods=['GET'])
+@login_required
+def get_email_outbox():
+    """Outbox counts per status plus the latest messages (?status=dead lists dead letters)"""
+    status = request.args.get('status')
+    if status and status not in OUTBOX_STATUSES:
+        return jsonify({'success': False, 'error': f'Invalid status: {status}'}), 400
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    try:
+        return jsonify({
+            'success': True,
+            'counts': email_dispatcher.status_counts(),
+            'transport': email_dispatcher.transport_metrics(),
+            'messages': email_dispatcher.list(status, limit)
+        })
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+
+@app.route('/api/admin/email-outbox/<int:message_id>/retry', methods=['POST'])
+@login_required
+@csrf_protect
+def retry_outbox_email(message_id):
+    """Queue a dead-lettered email for sending again"""
+    if not email_dispatcher.retry(message_id):
+        return jsonify({'success': False, 'error': 'No dead-lettered email with that ID'}), 404
+    return jsonify({'success': True})
 
 @app.route('/admin/static/<path:filename>')
 def serve_admin_static(filename):
     return send_from_directory('admin/static', filename)
 
 @app.route('/api/cases', methods=['GET'])
+@cached_endpoint('cases')
 def api_get_cases():
     """获取案例列表API"""
     try:
@@ -1855,6 +2637,7 @@ def api_get_cases():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/page-content/<page_key>', methods=['GET'])
+@cached_endpoint('content')
 def api_get_page_content(page_key):
     """获取页面内容API"""
     try:
@@ -1869,6 +2652,7 @@ def api_get_page_content(page_key):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/settings/public', methods=['GET'])
+@cached_endpoint('settings')
 def api_get_public_settings():
     """获取公开设置API"""
     try:
@@ -1901,6 +2685,20 @@ def api_get_inquiries():
         status = request.args.get('status')
         limit = request.args.get('limit', type=int)
         
+        if wants_keyset_pagination():
+            try:
+                cursor = decode_cursor(request.args.get('cursor'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            inquiries, pagination = db_manager.get_inquiries_page(status=status, limit=limit or 20, cursor=cursor)
+            return jsonify({
+                'success': True,
+                'inquiries': inquiries,
+                'count': len(inquiries),
+                'pagination': pagination
+            })
+        
         inquiries = db_manager.get_inquiries(status=status, limit=limit)
         
         return jsonify({
@@ -2128,86 +2926,124 @@ def reply_to_inquiry(inquiry_id):
 @app.route('/api/admin/inquiries/bulk-update', methods=['POST'])
 @login_required
 def bulk_update_inquiries():
-    """Bulk update inquiry status, priority, or assignment"""
-    data = request.get_json()
+    """Bulk update inquiry status, priority, assignment or tags.
+
+    Targets are given as inquiry_ids (any number) or as a 'filter' object using
+    the admin inquiry list parameters.
+    """
+    return handle_bulk_request('inquiries')
+
+@app.route('/api/admin/inquiries/campaigns', methods=['GET', 'POST'])
+@login_required
+@csrf_protect
+def inquiry_campaigns():
+    """List follow-up email campaigns, or start one (background job).
+
+    A campaign targets inquiry_ids or a 'filter' object using the admin
+    inquiry list parameters, and sends the followup_type template to each
+    distinct address through the throttled bulk lane of the email outbox.
+    """
+    db = get_db()
+    
+    if request.method == 'GET':
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        try:
+            return jsonify({'success': True, 'campaigns': campaigns.list_campaigns(db, limit)})
+        except sqlite3.Error as e:
+            return jsonify({'success': False, 'error': 'Database error'}), 500
+    
+    data = request.get_json() or {}
+    followup_type = data.get('followup_type')
+    if followup_type not in FOLLOWUP_TYPES:
+        return jsonify({'success': False, 'error': f'followup_type must be one of: {", ".join(FOLLOWUP_TYPES)}'}), 400
     
-    if not data or not data.get('inquiry_ids') or not data.get('action'):
+    if isinstance(data.get('filter'), dict):
+        selection = {'filter': data['filter']}
+        try:
+            build_inquiry_filters(filter_args(data['filter']))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    elif isinstance(data.get('inquiry_ids'), list) and data['inquiry_ids']:
+        selection = {'inquiry_ids': data['inquiry_ids']}
+    else:
         return jsonify({'success': False, 'error': 'Missing required fields'}), 400
     
+    name = (data.get('name') or '').strip() or f'{followup_type} follow-up'
+    user_id = current_user.id if hasattr(current_user, 'id') else None
+    job_id = uuid.uuid4().hex
+    try:
+        campaign_id = campaigns.create_campaign(db, name, followup_type, selection, user_id, job_id)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+    
+    payload = {'campaign_id': campaign_id, 'followup_type': followup_type, 'data': selection}
+    return job_accepted(job_queue.enqueue('email_campaign', payload, user_id, job_id=job_id),
+                        campaign_id=campaign_id)
+
+@app.route('/api/admin/inquiries/campaigns/<int:campaign_id>', methods=['GET'])
+@login_required
+def get_inquiry_campaign(campaign_id):
+    """A follow-up campaign with its outbox message counts per status"""
+    try:
+        campaign = campaigns.get_campaign(get_db(), campaign_id)
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+    if campaign is None:
+        return jsonify({'success': False, 'error': 'Campaign not found'}), 404
+    return jsonify({'success': True, 'campaign': campaign})
+
+@app.route('/api/admin/inquiries/campaigns/<int:campaign_id>/cancel', methods=['POST'])
+@login_required
+@csrf_protect
+def cancel_inquiry_campaign(campaign_id):
+    """Stop a campaign: its queuing job is cancelled and unsent emails are dropped"""
     db = get_db()
-    inquiry_ids = data.get('inquiry_ids')
-    action = data.get('action')
+    try:
+        cancelled = campaigns.cancel_campaign(db, campaign_id)
+        db.commit()
+        if cancelled is None:
+            return jsonify({'success': False, 'error': 'Campaign not found'}), 404
+        campaign = campaigns.get_campaign(db, campaign_id)
+    except sqlite3.Error as e:
+        db.rollback()
+        return jsonify({'success': False, 'error': 'Database error'}), 500
     
-    # Validate inquiry IDs
-    if not isinstance(inquiry_ids, list) or len(inquiry_ids) == 0:
-        return jsonify({'success': False, 'error': 'Invalid inquiry IDs'}), 400
+    if campaign['job_id']:
+        job_queue.cancel(campaign['job_id'])
+    return jsonify({'success': True, 'cancelled_messages': cancelled, 'campaign': campaign})
+
+@job_queue.handler('email_campaign')
+def run_email_campaign_job(payload, job):
+    campaign_id = payload['campaign_id']
+    db = get_db()
+    statement = campaigns.outbox_statement(campaign_id, payload['followup_type'])
     
     try:
-        placeholders = ','.join(['?'] * len(inquiry_ids))
-        updated_count = 0
-        
-        if action == 'update_status':
-            new_status = data.get('status')
-            if not new_status:
-                return jsonify({'success': False, 'error': 'Status is required'}), 400
-            
-            cursor = db.execute(f'''
-                UPDATE inquiries 
-                SET status = ?, updated_at = datetime('now')
-                WHERE id IN ({placeholders})
-            ''', [new_status] + inquiry_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'update_priority':
-            new_priority = data.get('priority')
-            if not new_priority:
-                return jsonify({'success': False, 'error': 'Priority is required'}), 400
-            
-            cursor = db.execute(f'''
-                UPDATE inquiries 
-                SET priority = ?, updated_at = datetime('now')
-                WHERE id IN ({placeholders})
-            ''', [new_priority] + inquiry_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'assign':
-            assigned_to = data.get('assigned_to')
-            cursor = db.execute(f'''
-                UPDATE inquiries 
-                SET assigned_to = ?, updated_at = datetime('now')
-                WHERE id IN ({placeholders})
-            ''', [assigned_to] + inquiry_ids)
-            updated_count = cursor.rowcount
-            
-        elif action == 'add_tag':
-            tag = data.get('tag')
-            if not tag:
-                return jsonify({'success': False, 'error': 'Tag is required'}), 400
-            
-            # Add tags to inquiries (assuming a tags field exists)
-            for inquiry_id in inquiry_ids:
-                current_tags = db.execute('SELECT tags FROM inquiries WHERE id = ?', (inquiry_id,)).fetchone()
-                if current_tags and current_tags['tags']:
-                    existing_tags = current_tags['tags'].split(',')
-                    if tag not in existing_tags:
-                        new_tags = ','.join(existing_tags + [tag])
-                        db.execute('UPDATE inquiries SET tags = ?, updated_at = datetime("now") WHERE id = ?', (new_tags, inquiry_id))
-                        updated_count += 1
-                else:
-                    db.execute('UPDATE inquiries SET tags = ?, updated_at = datetime("now") WHERE id = ?', (tag, inquiry_id))
-                    updated_count += 1
-                    
-        else:
-            return jsonify({'success': False, 'error': 'Invalid action'}), 400
-        
+        selection, total_selected = open_bulk_selection('inquiries', payload['data'])
+        queued_count = 0
+        for progress in run_bulk_statement(selection, statement):
+            queued_count = progress['affected']
+            job.progress(progress['processed'], progress['total'])
+    except BaseException as e:
+        campaigns.set_status(db, campaign_id, 'cancelled' if isinstance(e, JobCancelled) else 'failed')
         db.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Successfully updated {updated_count} inquiries',
-            'updated_count': updated_count
-        })
-        
+        raise
+    
+    if not campaigns.finish_queuing(db, campaign_id, total_selected, queued_count):
+        # Cancelled while the emails were being queued
+        campaigns.cancel_campaign(db, campaign_id)
+    db.commit()
+    email_dispatcher.wakeup()
+    return {'success': True, 'campaign_id': campaign_id, 'total_selected': total_selected, 'queued_count': queued_count}
+
+@app.route('/api/admin/inquiries/tags', methods=['GET'])
+@login_required
+def get_inquiry_tags():
+    """List every inquiry tag with its usage count"""
+    try:
+        return jsonify({'success': True, 'tags': db_manager.get_inquiry_tag_counts()})
     except sqlite3.Error as e:
         return jsonify({'success': False, 'error': 'Database error'}), 500
 
@@ -2215,78 +3051,8 @@ def bulk_update_inquiries():
 @login_required
 def get_inquiry_stats():
     """Get detailed inquiry statistics for reporting"""
-    db = get_db()
-    
     try:
-        # Status distribution
-        status_stats = db.execute('''
-            SELECT status, COUNT(*) as count
-            FROM inquiries
-            GROUP BY status
-            ORDER BY count DESC
-        ''').fetchall()
-        
-        # Priority distribution
-        priority_stats = db.execute('''
-            SELECT priority, COUNT(*) as count
-            FROM inquiries
-            WHERE priority IS NOT NULL
-            GROUP BY priority
-            ORDER BY 
-                CASE priority 
-                    WHEN 'high' THEN 1 
-                    WHEN 'normal' THEN 2 
-                    WHEN 'low' THEN 3 
-                END
-        ''').fetchall()
-        
-        # Monthly trend (last 12 months)
-        monthly_trend = db.execute('''
-            SELECT 
-                strftime('%Y-%m', created_at) as month,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'closed' THEN 1 ELSE 0 END) as closed,
-                SUM(CASE WHEN estimated_value IS NOT NULL THEN estimated_value ELSE 0 END) as total_value
-            FROM inquiries
-            WHERE created_at >= datetime('now', '-12 months')
-            GROUP BY strftime('%Y-%m', created_at)
-            ORDER BY month
-        ''').fetchall()
-        
-        # Response time analysis
-        response_time_stats = db.execute('''
-            SELECT 
-                AVG(CASE 
-                    WHEN first_response_at IS NOT NULL 
-                    THEN (julianday(first_response_at) - julianday(created_at)) * 24 
-                    ELSE NULL 
-                END) as avg_response_hours,
-                COUNT(CASE WHEN first_response_at IS NOT NULL THEN 1 END) as responded_count,
-                COUNT(*) as total_count
-            FROM inquiries
-            WHERE created_at >= datetime('now', '-30 days')
-        ''').fetchone()
-        
-        # Top product interests
-        product_interests = db.execute('''
-            SELECT 
-                product_interest,
-                COUNT(*) as count,
-                AVG(CASE WHEN estimated_value IS NOT NULL THEN estimated_value ELSE 0 END) as avg_value
-            FROM inquiries
-            WHERE product_interest IS NOT NULL AND product_interest != ''
-            GROUP BY product_interest
-            ORDER BY count DESC
-            LIMIT 10
-        ''').fetchall()
-        
-        return jsonify({
-            'status_distribution': [dict(row) for row in status_stats],
-            'priority_distribution': [dict(row) for row in priority_stats],
-            'monthly_trend': [dict(row) for row in monthly_trend],
-            'response_time': dict(response_time_stats) if response_time_stats else {},
-            'product_interests': [dict(row) for row in product_interests]
-        })
+        return jsonify(db_manager.stats.inquiry_report())
         
     except sqlite3.Error as e:
         return jsonify({'success': False, 'error': 'Database error'}), 500
@@ -2303,8 +3069,9 @@ def system_health():
         db.execute('SELECT 1').fetchone()
         
         # Get system stats
-        total_inquiries = db.execute('SELECT COUNT(*) as count FROM inquiries').fetchone()['count']
-        total_products = db.execute('SELECT COUNT(*) as count FROM products').fetchone()['count']
+        stats = db_manager.stats.dashboard()
+        total_inquiries = stats['inquiries']['total']
+        total_products = stats['products']['total']
         
         # Check disk space (simplified)
         import shutil
@@ -2318,6 +3085,10 @@ def system_health():
             'total_inquiries': total_inquiries,
             'total_products': total_products,
             'disk_free_gb': round(disk_free_gb, 2),
+            'db_pool': get_pool(DATABASE).stats(),
+            'response_cache': response_cache.stats(),
+            'rate_limiter': rate_limiter.stats(),
+            'stats_cache': db_manager.stats.stats(),
             'timestamp': datetime.now().isoformat()
         })
         
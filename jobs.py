@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+后台任务队列
+Background Job Queue
+
+耗时的后台操作 (大批量导出、批量更新、导入、统计重建) 写入 SQLite 的 jobs 表，
+由本进程内的工作线程池执行；接口立即返回 202，客户端通过
+/api/admin/jobs/<id> 轮询状态、进度和结果，也可以请求取消
+Slow admin operations (large exports, bulk updates, imports, statistics
+rebuilds) are persisted in the SQLite jobs table and executed by a local
+worker thread pool. Endpoints return 202 right away; clients poll
+/api/admin/jobs/<id> for status, progress and result, and can cancel
+
+进度先记录在内存中 (同一进程内实时可见)，任务连接不在事务中时才写回数据库；
+任务在单个事务中执行时，其他进程只能看到开始和结束状态
+Progress is kept in memory (live within the process) and written back to
+the database only while the job's connection is outside a transaction, so
+other processes see single-transaction jobs only as started and finished
+
+这类任务长时间没有心跳，因此领取任务时记录所属进程 (主机:进程号:启动ID)；
+同一主机上只有所属进程已退出的任务才会重新排队，其他主机的任务仍按心跳超时判断
+Such jobs write no heartbeat for as long as they run, so a claimed job
+records its owning process (host:pid:boot id). On the same host a running
+job is requeued only once that process is gone; jobs owned by another host
+still fall back to the heartbeat timeout
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from connection_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# 工作线程数 (0 表示本进程不执行任务，例如只负责入队的无服务器环境)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# 队列为空时的轮询间隔 (秒)；本进程入队时会立即唤醒工作线程
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+# 其他主机上的运行中任务超过该时间 (秒) 无心跳视为所在进程已退出，重新排队
+# (同一主机上的任务直接检查所属进程是否存在)
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 1800))
+# 已结束任务及其输出文件的保留天数
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+# 任务输出文件 (导出结果、待导入的上传文件) 目录，不放在站点静态目录下
+JOB_OUTPUT_DIR = os.environ.get('JOB_OUTPUT_DIR', os.path.join(tempfile.gettempdir(), 'led_display_jobs'))
+
+JOB_MAX_ATTEMPTS = 3
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# 进度写回数据库及检查取消标记的最小间隔 (秒)
+_PROGRESS_INTERVAL = 1.0
+
+# 本进程的标识: 进程号可能被重启后的新进程复用 (如容器中的 1 号进程)，启动ID用于区分
+_HOST = socket.gethostname()
+_BOOT_ID = uuid.uuid4().hex[:12]
+
+
+class JobCancelled(Exception):
+    """任务被请求取消 (由 JobContext.progress() 抛出)"""
+
+
+class JobContext:
+    """传给任务处理函数: 报告进度、检查取消"""
+
+    def __init__(self, queue: 'JobQueue', job: Dict):
+        self.queue = queue
+        self.id = job['id']
+        self.kind = job['kind']
+        self.payload = job['payload']
+        self.created_by = job['created_by']
+        self._last_sync = 0.0
+
+    def progress(self, current: int, total: Optional[int] = None, message: Optional[str] = None):
+        """记录进度；任务已被取消时抛出 JobCancelled"""
+        self.queue._live[self.id] = {'current': current, 'total': total, 'message': message}
+        now = time.monotonic()
+        if now - self._last_sync >= _PROGRESS_INTERVAL:
+            self._last_sync = now
+            self.queue._sync_progress(self.id)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.queue._is_cancel_requested(self.id):
+            raise JobCancelled()
+
+    def output_path(self, extension: str) -> str:
+        """本任务输出文件的路径"""
+        os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+        return os.path.join(JOB_OUTPUT_DIR, f'{self.id}.{extension}')
+
+
+class JobQueue:
+    """SQLite 持久化的任务队列和本地工作线程池"""
+
+    def __init__(self, db_path: str = 'database.db', workers: int = JOB_WORKERS):
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.workers = workers
+        self.handlers: Dict[str, Callable] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._live: Dict[str, Dict] = {}
+        self._cancelled = set()
+        self._last_requeue = None
+        self._last_prune = None
+        # 队列自身的记录连接，与任务处理使用的池连接分开，
+        # 使进度和状态写入不会混入任务自己的事务
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+    def handler(self, kind: str):
+        """注册任务处理函数: handler(payload, job_context) -> 可JSON序列化的结果"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    # ---- 记录连接 / bookkeeping connection ----
+
+    def _connection(self) -> sqlite3.Connection:
+        """记录连接 (调用方需持有 _conn_lock)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _execute(self, query: str, params=(), fetch: str = None):
+        with self._conn_lock:
+            cursor = self._connection().execute(query, params)
+            if fetch == 'one':
+                return cursor.fetchone()
+            if fetch == 'all':
+                return cursor.fetchall()
+            self._conn.commit()
+            return cursor.rowcount
+
+    @staticmethod
+    def _decode(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ('payload', 'result'):
+            if job.get(field) is not None:
+                job[field] = json.loads(job[field])
+        job['progress'] = {
+            'current': job.pop('progress_current'),
+            'total': job.pop('progress_total'),
+            'message': job.pop('progress_message'),
+        }
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    # ---- 客户端接口 / client API ----
+
+    def enqueue(self, kind: str, payload: Dict, created_by: Optional[int] = None,
+                job_id: Optional[str] = None) -> Dict:
+        """新建任务并唤醒工作线程，返回任务记录
+
+        job_id 可由调用方预先生成 (如先按任务ID保存上传文件)
+        """
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        job_id = job_id or uuid.uuid4().hex
+        self._execute('''
+            INSERT INTO jobs (id, kind, payload, created_by) VALUES (?, ?, ?, ?)
+        ''', (job_id, kind, json.dumps(payload, ensure_ascii=False), created_by))
+        self.start()
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._decode(self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,), fetch='one'))
+        live = self._live.get(job_id)
+        if job is not None and live is not None and job['status'] == 'running':
+            job['progress'] = dict(live)
+        return job
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        query = 'SELECT * FROM jobs'
+        params = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC, rowid DESC LIMIT ?'
+        params.append(limit)
+        jobs = [self._decode(row) for row in self._execute(query, params, fetch='all')]
+        for job in jobs:
+            live = self._live.get(job['id'])
+            if live is not None and job['status'] == 'running':
+                job['progress'] = dict(live)
+        return jobs
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """取消任务: 排队中的直接结束，运行中的在下一次报告进度时停止"""
+        job = self.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+
+        # 本进程内运行的任务立即可见；其他进程通过 cancel_requested 标记
+        if job['status'] == 'running':
+            self._cancelled.add(job_id)
+        try:
+            self._execute('''
+                UPDATE jobs SET
+                    status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'queued' THEN CURRENT_TIMESTAMP ELSE finished_at END,
+                    cancel_requested = 1
+                WHERE id = ? AND status IN ('queued', 'running')
+            ''', (job_id,))
+        except sqlite3.OperationalError as e:
+            # 数据库被长事务锁定时 (如本进程的批量更新)，内存中的标记仍然生效
+            logger.warning(f'Could not persist cancellation of job {job_id}: {e}')
+        return self.get(job_id)
+
+    # ---- 工作线程 / workers ----
+
+    def start(self):
+        """启动工作线程 (已启动或 workers <= 0 时不做任何事)"""
+        if self.workers <= 0:
+            return
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            self._stop.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, args=(f'{_HOST}:{os.getpid()}:{_BOOT_ID}:{number}',),
+                                          name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _work(self, worker: str):
+        while not self._stop.is_set():
+            try:
+                self._maintain()
+                job = self._claim(worker)
+            except sqlite3.Error as e:
+                # jobs 表尚未创建 (迁移未执行) 或数据库暂时被锁
+                logger.debug(f'Job queue poll failed: {e}')
+                job = None
+
+            if job is None:
+                self._wakeup.wait(JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self._run(job)
+            finally:
+                self.pool.release()
+
+    def _claim(self, worker: str) -> Optional[Dict]:
+        """原子地取出最早排队的任务"""
+        with self._conn_lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('''
+                    SELECT * FROM jobs WHERE status = 'queued'
+                    ORDER BY created_at, rowid LIMIT 1
+                ''').fetchone()
+                if row is not None:
+                    conn.execute('''
+                        UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                            started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (worker, row['id']))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return self._decode(row) if row is not None else None
+
+    def _run(self, job: Dict):
+        context = JobContext(self, job)
+        handler = self.handlers.get(job['kind'])
+        status, result, error = 'succeeded', None, None
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            result = handler(job['payload'], context)
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            logger.exception(f"Job {job['id']} ({job['kind']}) failed")
+            status, error = 'failed', str(e)
+
+        # 处理函数中断时未提交的写入一律回滚
+        conn = self.pool.acquire()
+        if conn.in_transaction:
+            conn.rollback()
+
+        live = self._live.pop(job['id'], None) or {}
+        self._cancelled.discard(job['id'])
+        self._execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP,
+                progress_current = COALESCE(?, progress_current),
+                progress_total = COALESCE(?, progress_total),
+                progress_message = COALESCE(?, progress_message)
+            WHERE id = ?
+        ''', (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+              live.get('current'), live.get('total'), live.get('message'), job['id']))
+
+    def _sync_progress(self, job_id: str):
+        """任务连接不在事务中时，把内存中的进度和心跳写回数据库"""
+        if self.pool.acquire().in_transaction:
+            return
+        live = self._live.get(job_id) or {}
+        try:
+            self._execute('''
+                UPDATE jobs SET progress_current = ?, progress_total = ?, progress_message = ?,
+                    heartbeat_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (live.get('current'), live.get('total'), live.get('message'), job_id))
+        except sqlite3.OperationalError as e:
+            logger.debug(f'Job progress not persisted: {e}')
+
+    def _is_cancel_requested(self, job_id: str) -> bool:
+        if job_id in self._cancelled:
+            return True
+        row = self._execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,), fetch='one')
+        return bool(row and row['cancel_requested'])
+
+    @staticmethod
+    def _owner_alive(worker: Optional[str], stale: bool) -> bool:
+        """任务所属进程是否仍在运行；无法判断时 (其他主机、旧格式) 以心跳是否超时为准"""
+        try:
+            host, pid, boot_id, _ = (worker or '').split(':')
+            pid = int(pid)
+        except ValueError:
+            return not stale
+        if host != _HOST:
+            return not stale
+        if pid == os.getpid():
+            return boot_id == _BOOT_ID
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _maintain(self):
+        """重新排队所属进程已退出的任务 (每个轮询间隔一次)，并定期清理过期任务 (至多每小时一次)"""
+        now = time.monotonic()
+        if self._last_requeue is None or now - self._last_requeue >= JOB_POLL_INTERVAL:
+            self._last_requeue = now
+            self._requeue_lost()
+        if self._last_prune is None or now - self._last_prune >= 3600:
+            self._last_prune = now
+            self._prune()
+
+    def _requeue_lost(self):
+        running = self._execute('''
+            SELECT id, worker,
+                (julianday('now') - julianday(COALESCE(heartbeat_at, started_at))) * 86400 > ? AS stale
+            FROM jobs WHERE status = 'running'
+        ''', (JOB_STALE_AFTER,), fetch='all')
+        for row in running:
+            if self._owner_alive(row['worker'], bool(row['stale'])):
+                continue
+            self._execute('''
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= ? THEN 'Worker lost' ELSE error END
+                WHERE id = ? AND status = 'running' AND worker = ?
+            ''', (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, row['id'], row['worker']))
+
+    def _prune(self):
+        expired = self._execute(f'''
+            SELECT id FROM jobs
+            WHERE status IN ({','.join('?' * len(FINISHED_STATUSES))})
+              AND finished_at < datetime('now', ?)
+        ''', FINISHED_STATUSES + (f'-{JOB_RETENTION_DAYS} days',), fetch='all')
+        for row in expired:
+            remove_job_files(row['id'])
+            self._execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+
+
+def remove_job_files(job_id: str):
+    """删除任务的输出文件"""
+    if not os.path.isdir(JOB_OUTPUT_DIR):
+        return
+    for filename in os.listdir(JOB_OUTPUT_DIR):
+        if filename.startswith(f'{job_id}.'):
+            try:
+                os.remove(os.path.join(JOB_OUTPUT_DIR, filename))
+            except OSError:
+                pass
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+邮件发送通道
+Mail Transport
+
+SMTP 连接池: 会话在多封邮件之间复用 (只做一次 TLS 握手和登录)，
+闲置较久的会话在复用前用 NOOP 检查，超过闲置上限或发送上限后关闭；
+send_many() 在同一会话中批量发送。另提供 Maildir 通道 (写入本地目录，
+用于测试和预发环境) 和控制台通道 (开发环境，只打印)
+Pooled SMTP transport: sessions are reused across messages (one TLS
+handshake and login each), checked with NOOP before reuse after sitting
+idle, and closed after the idle or per-session message limits.
+send_many() delivers a batch over a single session. A Maildir transport
+(writes to a local directory, for tests and staging) and a console
+transport (development, prints only) share the same interface
+
+每封邮件的发送耗时记录在 transport.metrics 中
+Per-message send latency is recorded in transport.metrics
+
+环境变量 / Environment:
+    MAIL_TRANSPORT  smtp | maildir | console (默认 console)
+    MAIL_SERVER, MAIL_PORT, MAIL_USE_TLS, MAIL_USE_SSL, MAIL_USERNAME, MAIL_PASSWORD
+    MAIL_MAILDIR    maildir 通道的目录
+"""
+
+import logging
+import mailbox
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每个进程最多同时打开的SMTP会话数
+MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE', 2))
+# 会话闲置超过该时间 (秒) 后复用前先发送 NOOP 检查
+MAIL_NOOP_AFTER = float(os.environ.get('MAIL_NOOP_AFTER', 15))
+# 会话闲置超过该时间 (秒) 后直接关闭 (多数服务器几分钟后会断开闲置连接)
+MAIL_MAX_IDLE = float(os.environ.get('MAIL_MAX_IDLE', 120))
+# 每个会话最多发送的邮件数，之后重新连接 (部分服务器限制单连接邮件数)
+MAIL_MAX_MESSAGES_PER_SESSION = int(os.environ.get('MAIL_MAX_MESSAGES_PER_SESSION', 100))
+MAIL_TIMEOUT = float(os.environ.get('MAIL_TIMEOUT', 10))
+
+DEFAULT_FROM_EMAIL = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@lianjin-led.com')
+
+# 这些错误只影响当前邮件，会话仍可继续使用
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def build_message(to_email: str, subject: str, body: str, html_body: Optional[str] = None,
+                  from_email: str = DEFAULT_FROM_EMAIL) -> EmailMessage:
+    """构造邮件 (纯文本，提供 HTML 时为 multipart/alternative)"""
+    message = EmailMessage()
+    message['From'] = from_email
+    message['To'] = to_email
+    message['Subject'] = subject
+    message.set_content(body)
+    if html_body:
+        message.add_alternative(html_body, subtype='html')
+    return message
+
+
+class TransportMetrics:
+    """发送计数和最近 window 封邮件的耗时分布"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.sent = 0
+        self.failed = 0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float, ok: bool):
+        milliseconds = seconds * 1000
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self._latencies.append(milliseconds)
+            self.max_ms = max(self.max_ms, milliseconds)
+
+    def record_failures(self, count: int):
+        """未能开始发送的邮件 (如无法连接)，只计数不计入耗时"""
+        with self._lock:
+            self.failed += count
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sent, failed, max_ms = self.sent, self.failed, self.max_ms
+
+        def percentile(fraction):
+            return round(latencies[min(int(len(latencies) * fraction), len(latencies) - 1)], 2) if latencies else None
+
+        return {
+            'sent': sent,
+            'failed': failed,
+            'latency_ms': {
+                'avg': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(max_ms, 2),
+                'samples': len(latencies),
+            }
+        }
+
+
+class MailTransport:
+    """发送通道基类: 子类实现 _deliver()，或覆盖 send_many()"""
+
+    name = 'base'
+
+    def __init__(self):
+        self.metrics = TransportMetrics()
+
+    def send(self, message: EmailMessage) -> Optional[Exception]:
+        """发送一封邮件，成功返回 None，失败返回异常"""
+        return self.send_many([message])[0]
+
+    def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        """批量发送，返回与 messages 一一对应的结果 (None 或异常)"""
+        results = []
+        for message in messages:
+            started = time.perf_counter()
+            try:
+                self._deliver(message)
+                error = None
+            except Exception as e:
+                error = e
+            self.metrics.record(time.perf_counter() - started, error is None)
+            results.append(error)
+        return results
+
+    def _deliver(self, message: EmailMessage):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ConsoleTransport(MailTransport):
+    """开发环境: 只打印邮件摘要"""
+
+    name = 'console'
+
+    def _deliver(self, message: EmailMessage):
+        print(f"📧 EMAIL NOTIFICATION:")
+        print(f"To: {message['To']}")
+        print(f"From: {message['From']}")
+        print(f"Subject: {message['Subject']}")
+        print(f"Has HTML: {'Yes' if message.is_multipart() else 'No'}")
+        print("-" * 50)
+
+
+class MaildirTransport(MailTransport):
+    """把邮件写入本地 Maildir 目录 (测试和预发环境使用，可用任意邮件客户端查看)"""
+
+    name = 'maildir'
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._mailbox = None
+
+    def _deliver(self, message: EmailMessage):
+        with self._lock:
+            if self._mailbox is None:
+                self._mailbox = mailbox.Maildir(self.path, create=True)
+            self._mailbox.add(message)
+
+    def messages(self) -> List[EmailMessage]:
+        """目录中的所有邮件"""
+        return list(mailbox.Maildir(self.path, create=True))
+
+
+class _Session:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+
+class SMTPTransport(MailTransport):
+    """带连接池的SMTP通道"""
+
+    name = 'smtp'
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True, use_ssl: bool = False,
+                 timeout: float = MAIL_TIMEOUT, pool_size: int = MAIL_POOL_SIZE,
+                 noop_after: float = MAIL_NOOP_AFTER, max_idle: float = MAIL_MAX_IDLE,
+                 max_messages: int = MAIL_MAX_MESSAGES_PER_SESSION):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.pool_size = max(pool_size, 1)
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self._idle: List[_Session] = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.connections_opened = 0
+
+    def _connect(self) -> _Session:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls and not self.use_ssl:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+        except BaseException:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return _Session(smtp)
+
+    def _healthy(self, session: _Session) -> bool:
+        idle = time.monotonic() - session.last_used
+        if idle > self.max_idle:
+            return False
+        if idle > self.noop_after:
+            try:
+                return session.smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def _checkout(self) -> _Session:
+        """取出一个可用会话，池满时等待其他线程归还"""
+        with self._cond:
+            while not self._idle and self._open >= self.pool_size:
+                self._cond.wait()
+            session = self._idle.pop() if self._idle else None
+            if session is None:
+                self._open += 1
+
+        try:
+            if session is not None and not self._healthy(session):
+                session.close()
+                session = None
+            if session is None:
+                session = self._connect()
+        except BaseException:
+            self._checkin(None)
+            raise
+        return session
+
+    def _checkin(self, session: Optional[_Session]):
+        """归还会话；None 表示会话已关闭，释放其名额"""
+        if session is not None and session.sent >= self.max_messages:
+            session.close()
+            session = None
+        with self._cond:
+            if session is None:
+                self._open -= 1
+            else:
+                session.last_used = time.monotonic()
+                self._idle.append(session)
+            self._cond.notify()
+
+    def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        """在一个会话中发送整批邮件；连接断开时重新连接后继续"""
+        results = []
+        try:
+            session = self._checkout()
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning(f'SMTP connection to {self.host}:{self.port} failed: {e}')
+            self.metrics.record_failures(len(messages))
+            return [e] * len(messages)
+
+        try:
+            for message in messages:
+                started = time.perf_counter()
+                session, error = self._send_one(session, message)
+                self.metrics.record(time.perf_counter() - started, error is None)
+                results.append(error)
+        finally:
+            self._checkin(session)
+        return results
+
+    def _send_one(self, session: Optional[_Session],
+                  message: EmailMessage) -> Tuple[Optional[_Session], Optional[Exception]]:
+        """发送一封邮件，返回 (之后继续使用的会话, 错误)
+
+        重连后的新会话总是交还给调用方；会话不可用时已关闭并返回 None，
+        后续邮件使用新连接
+        """
+        try:
+            if session is not None and session.sent >= self.max_messages:
+                session.close()
+                session = None
+            if session is None:
+                session = self._connect()
+            try:
+                session.smtp.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # 服务器关闭了闲置连接: 重连后重试一次
+                session.close()
+                session = None
+                session = self._connect()
+                session.smtp.send_message(message)
+        except _MESSAGE_ERRORS as e:
+            # 只有这封邮件被拒绝，会话仍可使用
+            return session, e
+        except (smtplib.SMTPException, OSError) as e:
+            if session is not None:
+                session.close()
+            return None, e
+        session.sent += 1
+        return session, None
+
+    def close(self):
+        """关闭所有闲置会话"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.close()
+
+
+def create_transport() -> MailTransport:
+    """按环境变量创建发送通道"""
+    kind = os.environ.get('MAIL_TRANSPORT', 'console').lower()
+    if kind == 'smtp':
+        return SMTPTransport(
+            host=os.environ.get('MAIL_SERVER', 'localhost'),
+            port=int(os.environ.get('MAIL_PORT', 587)),
+            username=os.environ.get('MAIL_USERNAME') or None,
+            password=os.environ.get('MAIL_PASSWORD') or None,
+            use_tls=_env_flag('MAIL_USE_TLS', 'true'),
+            use_ssl=_env_flag('MAIL_USE_SSL', 'false'),
+        )
+    if kind == 'maildir':
+        return MaildirTransport(os.environ.get('MAIL_MAILDIR', 'mail_outbox'))
+    if kind == 'console':
+        return ConsoleTransport()
+    raise ValueError(f'Unknown MAIL_TRANSPORT: {kind}')
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> MailTransport:
+    """本进程共享的发送通道"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = create_transport()
+        return _transport
+
+
+def set_transport(transport: MailTransport) -> MailTransport:
+    """替换本进程的发送通道 (测试或自定义通道)，返回原通道"""
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    if previous is not None and previous is not transport:
+        previous.close()
+    return previous
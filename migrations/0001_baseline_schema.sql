@@ -1,3 +1,11 @@
+-- 基线结构: 原 schema_enhanced.sql 中的表、索引、触发器和初始数据
+-- Baseline schema: tables, indexes, triggers and seed data (formerly
+-- schema_enhanced.sql)
+--
+-- 迁移机制之前创建的数据库也会执行一次 (语句均为 IF NOT EXISTS / OR IGNORE)
+-- Also runs once on databases created before migrations existed; every
+-- statement is idempotent
+
 -- ================================================================
 -- LED B2B WEBSITE - ENHANCED DATABASE SCHEMA
 -- Version: 2.0
@@ -136,6 +144,8 @@ CREATE TABLE IF NOT EXISTS inquiries (
     estimated_value DECIMAL(12,2), -- potential deal value
     notes TEXT, -- internal notes
     language TEXT DEFAULT 'en', -- preferred language
+    first_response_at TIMESTAMP, -- first reply from sales
+    last_contact_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (assigned_to) REFERENCES users(id)
@@ -278,15 +288,33 @@ CREATE TABLE IF NOT EXISTS activity_logs (
 
 -- Product indexes
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
-CREATE INDEX IF NOT EXISTS idx_products_sku ON products(sku);
 CREATE INDEX IF NOT EXISTS idx_products_featured ON products(is_featured);
-CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active);
+-- Catalog listings: active products ordered by sort_order, newest first
+CREATE INDEX IF NOT EXISTS idx_products_catalog ON products(is_active, sort_order, created_at);
+CREATE INDEX IF NOT EXISTS idx_products_catalog_category ON products(is_active, category_id, sort_order, created_at);
+-- Admin keyset pagination on (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_products_active_created ON products(is_active, created_at);
+
+-- Product child collections (batched IN loads and the primary image join)
+CREATE INDEX IF NOT EXISTS idx_product_images_product ON product_images(product_id, is_primary, sort_order);
+CREATE INDEX IF NOT EXISTS idx_product_applications_product ON product_applications(product_id, sort_order);
 
 -- Inquiry indexes
-CREATE INDEX IF NOT EXISTS idx_inquiries_status ON inquiries(status);
 CREATE INDEX IF NOT EXISTS idx_inquiries_created ON inquiries(created_at);
+CREATE INDEX IF NOT EXISTS idx_inquiries_status_created ON inquiries(status, created_at);
 CREATE INDEX IF NOT EXISTS idx_inquiries_assigned ON inquiries(assigned_to);
 CREATE INDEX IF NOT EXISTS idx_inquiries_email ON inquiries(email);
+CREATE INDEX IF NOT EXISTS idx_inquiry_followups_inquiry ON inquiry_followups(inquiry_id, created_at);
+
+-- Activity log indexes
+CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON activity_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created ON activity_logs(user_id, created_at);
+
+-- Superseded by the composite indexes above (sku is already covered by its UNIQUE constraint)
+DROP INDEX IF EXISTS idx_products_sku;
+DROP INDEX IF EXISTS idx_products_active;
+DROP INDEX IF EXISTS idx_products_active_category;
+DROP INDEX IF EXISTS idx_inquiries_status;
 
 -- User session indexes
 CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(session_token);
@@ -296,9 +324,155 @@ CREATE INDEX IF NOT EXISTS idx_sessions_expires ON user_sessions(expires_at);
 CREATE INDEX IF NOT EXISTS idx_page_contents_page ON page_contents(page_key);
 CREATE INDEX IF NOT EXISTS idx_news_published ON news_articles(is_published, published_at);
 CREATE INDEX IF NOT EXISTS idx_cases_featured ON cases(is_featured);
+CREATE INDEX IF NOT EXISTS idx_cases_published_date ON cases(is_published, project_date);
+CREATE INDEX IF NOT EXISTS idx_cases_published_featured ON cases(is_published, is_featured, created_at);
+CREATE INDEX IF NOT EXISTS idx_case_images_case ON case_images(case_id, sort_order);
+
+-- ----------------------------------------------------------------
+-- 7. DATA VERSIONS (HTTP ETag / Last-Modified)
+-- ----------------------------------------------------------------
+
+-- One row per catalog table (plus inquiries); bumped by triggers on every
+-- write so the APIs can answer conditional requests and reuse cached counts
+-- with a single PK lookup
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO data_versions (table_name) VALUES
+('products'),
+('product_categories'),
+('product_images'),
+('product_applications'),
+('page_contents'),
+('news_articles'),
+('cases'),
+('inquiries');
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_ins AFTER INSERT ON products
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_upd AFTER UPDATE ON products
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_del AFTER DELETE ON products
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_ins AFTER INSERT ON product_categories
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_upd AFTER UPDATE ON product_categories
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_del AFTER DELETE ON product_categories
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_images_version_ins AFTER INSERT ON product_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_images';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_images_version_upd AFTER UPDATE ON product_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_images';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_images_version_del AFTER DELETE ON product_images
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_images';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_applications_version_ins AFTER INSERT ON product_applications
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_applications';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_applications_version_upd AFTER UPDATE ON product_applications
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_applications';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_applications_version_del AFTER DELETE ON product_applications
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'product_applications';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_page_contents_version_ins AFTER INSERT ON page_contents
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'page_contents';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_page_contents_version_upd AFTER UPDATE ON page_contents
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'page_contents';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_page_contents_version_del AFTER DELETE ON page_contents
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'page_contents';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_news_articles_version_ins AFTER INSERT ON news_articles
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'news_articles';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_news_articles_version_upd AFTER UPDATE ON news_articles
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'news_articles';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_news_articles_version_del AFTER DELETE ON news_articles
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'news_articles';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_version_ins AFTER INSERT ON cases
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'cases';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_version_upd AFTER UPDATE ON cases
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'cases';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cases_version_del AFTER DELETE ON cases
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'cases';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_version_ins AFTER INSERT ON inquiries
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'inquiries';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_version_upd AFTER UPDATE ON inquiries
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'inquiries';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_version_del AFTER DELETE ON inquiries
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'inquiries';
+END;
 
 -- ----------------------------------------------------------------
--- 7. INITIAL DATA INSERTION
+-- 8. INITIAL DATA INSERTION
 -- ----------------------------------------------------------------
 
 -- Insert default admin user (password: admin123)
@@ -0,0 +1,26 @@
+"""
+产品筛选: pixel_pitch_mm 生成列及复合索引
+Product filtering: pixel_pitch_mm generated column and composite indexes
+"""
+
+# "P1.25" / "p2.5mm" -> 1.25 / 2.5 ；无数字时为 NULL
+PIXEL_PITCH_MM_SQL = (
+    "ALTER TABLE products ADD COLUMN pixel_pitch_mm REAL "
+    "GENERATED ALWAYS AS (CASE WHEN pixel_pitch GLOB '*[0-9]*' "
+    "THEN CAST(LTRIM(TRIM(pixel_pitch), 'Pp') AS REAL) END) VIRTUAL"
+)
+
+FILTER_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_products_active_pitch ON products(is_active, pixel_pitch_mm);
+CREATE INDEX IF NOT EXISTS idx_products_active_ip ON products(is_active, ip_rating);
+CREATE INDEX IF NOT EXISTS idx_products_active_brightness ON products(is_active, brightness);
+CREATE INDEX IF NOT EXISTS idx_products_active_refresh ON products(is_active, refresh_rate);
+"""
+
+
+def upgrade(migrator):
+    with migrator.transaction():
+        # VIRTUAL 生成列只修改表定义，不重写已有行
+        if 'pixel_pitch_mm' not in migrator.columns('products'):
+            migrator.conn.execute(PIXEL_PITCH_MM_SQL)
+        migrator.run_statements(FILTER_INDEXES_SQL)
@@ -0,0 +1,50 @@
+"""
+产品全文检索索引 (FTS5，不可用时回退到 LIKE 搜索)
+Product full-text search index (FTS5; LIKE search is used when unavailable)
+"""
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    sku, pixel_pitch, name_en, name_zh, description_en, description_zh,
+    content='products', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_ins AFTER INSERT ON products
+BEGIN
+    INSERT INTO products_fts (rowid, sku, pixel_pitch, name_en, name_zh, description_en, description_zh)
+    VALUES (new.id, new.sku, new.pixel_pitch, new.name_en, new.name_zh, new.description_en, new.description_zh);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_del AFTER DELETE ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, sku, pixel_pitch, name_en, name_zh, description_en, description_zh)
+    VALUES ('delete', old.id, old.sku, old.pixel_pitch, old.name_en, old.name_zh, old.description_en, old.description_zh);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_upd
+AFTER UPDATE OF sku, pixel_pitch, name_en, name_zh, description_en, description_zh ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, sku, pixel_pitch, name_en, name_zh, description_en, description_zh)
+    VALUES ('delete', old.id, old.sku, old.pixel_pitch, old.name_en, old.name_zh, old.description_en, old.description_zh);
+    INSERT INTO products_fts (rowid, sku, pixel_pitch, name_en, name_zh, description_en, description_zh)
+    VALUES (new.id, new.sku, new.pixel_pitch, new.name_en, new.name_zh, new.description_en, new.description_zh);
+END;
+"""
+
+
+def upgrade(migrator):
+    exists = migrator.table_exists('products_fts')
+    try:
+        with migrator.transaction():
+            migrator.run_statements(SEARCH_INDEX_SQL)
+            if not exists:
+                # 首次创建时从 products 表重建索引
+                migrator.conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite 未编译 FTS5 或版本过旧 (trigram 需要 3.34+)
+        logger.warning(f"FTS5 search index unavailable, falling back to LIKE search: {e}")
@@ -0,0 +1,86 @@
+"""
+仪表板计数表 stat_counters 及维护触发器
+Dashboard counters table (stat_counters) and its maintenance triggers
+
+在同一事务中创建触发器并从 inquiries / products 完整重建计数 (每表一次
+GROUP BY)。分批回填不可行: 已回填的行在触发器创建前被修改或删除，计数会永久偏差
+Creates the triggers and rebuilds the counts from inquiries / products
+(one GROUP BY per table) in a single transaction. A batched backfill is not
+safe here: updates or deletes of already backfilled rows made before the
+triggers exist would leave the counters permanently wrong
+"""
+
+# 计数分桶: inquiries 为 "status|priority"，products 为 "is_active|is_featured"
+STATS_COUNTERS_SQL = """
+CREATE TABLE IF NOT EXISTS stat_counters (
+    entity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (entity, bucket)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_counters_ins AFTER INSERT ON inquiries
+BEGIN
+    INSERT INTO stat_counters (entity, bucket, count)
+    VALUES ('inquiries', COALESCE(new.status, '') || '|' || COALESCE(new.priority, ''), 1)
+    ON CONFLICT (entity, bucket) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_counters_del AFTER DELETE ON inquiries
+BEGIN
+    UPDATE stat_counters SET count = count - 1
+    WHERE entity = 'inquiries' AND bucket = COALESCE(old.status, '') || '|' || COALESCE(old.priority, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_counters_upd AFTER UPDATE OF status, priority ON inquiries
+WHEN old.status IS NOT new.status OR old.priority IS NOT new.priority
+BEGIN
+    UPDATE stat_counters SET count = count - 1
+    WHERE entity = 'inquiries' AND bucket = COALESCE(old.status, '') || '|' || COALESCE(old.priority, '');
+    INSERT INTO stat_counters (entity, bucket, count)
+    VALUES ('inquiries', COALESCE(new.status, '') || '|' || COALESCE(new.priority, ''), 1)
+    ON CONFLICT (entity, bucket) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_counters_ins AFTER INSERT ON products
+BEGIN
+    INSERT INTO stat_counters (entity, bucket, count)
+    VALUES ('products', COALESCE(new.is_active, 0) || '|' || COALESCE(new.is_featured, 0), 1)
+    ON CONFLICT (entity, bucket) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_counters_del AFTER DELETE ON products
+BEGIN
+    UPDATE stat_counters SET count = count - 1
+    WHERE entity = 'products' AND bucket = COALESCE(old.is_active, 0) || '|' || COALESCE(old.is_featured, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_counters_upd AFTER UPDATE OF is_active, is_featured ON products
+WHEN old.is_active IS NOT new.is_active OR old.is_featured IS NOT new.is_featured
+BEGIN
+    UPDATE stat_counters SET count = count - 1
+    WHERE entity = 'products' AND bucket = COALESCE(old.is_active, 0) || '|' || COALESCE(old.is_featured, 0);
+    INSERT INTO stat_counters (entity, bucket, count)
+    VALUES ('products', COALESCE(new.is_active, 0) || '|' || COALESCE(new.is_featured, 0), 1)
+    ON CONFLICT (entity, bucket) DO UPDATE SET count = count + 1;
+END;
+"""
+
+REBUILD_COUNTERS_SQL = """
+DELETE FROM stat_counters WHERE entity IN ('inquiries', 'products');
+INSERT INTO stat_counters (entity, bucket, count)
+    SELECT 'inquiries', COALESCE(status, '') || '|' || COALESCE(priority, ''), COUNT(*)
+    FROM inquiries GROUP BY 1, 2;
+INSERT INTO stat_counters (entity, bucket, count)
+    SELECT 'products', COALESCE(is_active, 0) || '|' || COALESCE(is_featured, 0), COUNT(*)
+    FROM products GROUP BY 1, 2;
+"""
+
+
+def upgrade(migrator):
+    if migrator.trigger_exists('trg_inquiries_counters_ins'):
+        # 迁移机制之前的启动流程已创建并维护计数
+        return
+
+    with migrator.transaction():
+        migrator.run_statements(STATS_COUNTERS_SQL + REBUILD_COUNTERS_SQL)
@@ -0,0 +1,31 @@
+"""
+询盘响应时间列 first_response_at / last_contact_at
+Inquiry response columns: first_response_at / last_contact_at
+
+旧询盘按跟进记录分批回填: 最早一条为首次响应，最近一条为最后联系
+Older inquiries are backfilled in batches from their follow-ups: the first
+one is the first response, the latest one the last contact
+"""
+
+INQUIRY_RESPONSE_COLUMNS = {
+    'first_response_at': 'TIMESTAMP',
+    'last_contact_at': 'TIMESTAMP',
+}
+
+BACKFILL_SQL = """
+UPDATE inquiries SET
+    first_response_at = (SELECT MIN(f.created_at) FROM inquiry_followups f WHERE f.inquiry_id = inquiries.id),
+    last_contact_at = COALESCE(last_contact_at,
+        (SELECT MAX(f.created_at) FROM inquiry_followups f WHERE f.inquiry_id = inquiries.id))
+WHERE id BETWEEN :batch_start AND :batch_end
+  AND first_response_at IS NULL
+  AND EXISTS (SELECT 1 FROM inquiry_followups f WHERE f.inquiry_id = inquiries.id)
+"""
+
+
+def upgrade(migrator):
+    with migrator.transaction():
+        for column, column_type in INQUIRY_RESPONSE_COLUMNS.items():
+            migrator.add_column('inquiries', column, column_type)
+
+    migrator.batched('inquiries', BACKFILL_SQL)
@@ -0,0 +1,101 @@
+"""
+询盘按日汇总表 inquiry_daily_rollup 及维护触发器
+Daily inquiry rollup table (inquiry_daily_rollup) and its maintenance triggers
+
+同 0004: 在同一事务中创建触发器并从 inquiries 完整重建汇总 (一次 GROUP BY)
+Like 0004: the triggers are created and the rollup rebuilt from inquiries
+(one GROUP BY) in a single transaction, so no change can slip between the
+backfill and the triggers
+"""
+
+# 询盘按日汇总: 日期 × 状态 × 类型 × 优先级 × 国家，空值记为 ''
+INQUIRY_ROLLUP_SQL = """
+CREATE TABLE IF NOT EXISTS inquiry_daily_rollup (
+    day TEXT NOT NULL,
+    status TEXT NOT NULL,
+    inquiry_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    country TEXT NOT NULL,
+    inquiry_count INTEGER NOT NULL DEFAULT 0,
+    estimated_value_sum REAL NOT NULL DEFAULT 0,
+    responded_count INTEGER NOT NULL DEFAULT 0,
+    response_hours_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status, inquiry_type, priority, country)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_rollup_ins AFTER INSERT ON inquiries
+BEGIN
+    INSERT INTO inquiry_daily_rollup (
+        day, status, inquiry_type, priority, country,
+        inquiry_count, estimated_value_sum, responded_count, response_hours_sum
+    ) VALUES (
+        date(new.created_at), COALESCE(new.status, ''), COALESCE(new.inquiry_type, ''), COALESCE(new.priority, ''), COALESCE(new.country, ''), 1, COALESCE(new.estimated_value, 0),
+        new.first_response_at IS NOT NULL,
+        COALESCE((julianday(new.first_response_at) - julianday(new.created_at)) * 24, 0)
+    )
+    ON CONFLICT (day, status, inquiry_type, priority, country) DO UPDATE SET
+        inquiry_count = inquiry_count + 1,
+        estimated_value_sum = estimated_value_sum + excluded.estimated_value_sum,
+        responded_count = responded_count + excluded.responded_count,
+        response_hours_sum = response_hours_sum + excluded.response_hours_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_rollup_del AFTER DELETE ON inquiries
+BEGIN
+    UPDATE inquiry_daily_rollup SET
+        inquiry_count = inquiry_count - 1,
+        estimated_value_sum = estimated_value_sum - COALESCE(old.estimated_value, 0),
+        responded_count = responded_count - (old.first_response_at IS NOT NULL),
+        response_hours_sum = response_hours_sum
+            - COALESCE((julianday(old.first_response_at) - julianday(old.created_at)) * 24, 0)
+    WHERE day = date(old.created_at) AND status = COALESCE(old.status, '') AND inquiry_type = COALESCE(old.inquiry_type, '') AND priority = COALESCE(old.priority, '') AND country = COALESCE(old.country, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiries_rollup_upd
+AFTER UPDATE OF status, inquiry_type, priority, country, estimated_value, first_response_at, created_at ON inquiries
+WHEN old.status IS NOT new.status OR old.inquiry_type IS NOT new.inquiry_type OR old.priority IS NOT new.priority OR old.country IS NOT new.country OR old.estimated_value IS NOT new.estimated_value OR old.first_response_at IS NOT new.first_response_at OR old.created_at IS NOT new.created_at
+BEGIN
+    UPDATE inquiry_daily_rollup SET
+        inquiry_count = inquiry_count - 1,
+        estimated_value_sum = estimated_value_sum - COALESCE(old.estimated_value, 0),
+        responded_count = responded_count - (old.first_response_at IS NOT NULL),
+        response_hours_sum = response_hours_sum
+            - COALESCE((julianday(old.first_response_at) - julianday(old.created_at)) * 24, 0)
+    WHERE day = date(old.created_at) AND status = COALESCE(old.status, '') AND inquiry_type = COALESCE(old.inquiry_type, '') AND priority = COALESCE(old.priority, '') AND country = COALESCE(old.country, '');
+    INSERT INTO inquiry_daily_rollup (
+        day, status, inquiry_type, priority, country,
+        inquiry_count, estimated_value_sum, responded_count, response_hours_sum
+    ) VALUES (
+        date(new.created_at), COALESCE(new.status, ''), COALESCE(new.inquiry_type, ''), COALESCE(new.priority, ''), COALESCE(new.country, ''), 1, COALESCE(new.estimated_value, 0),
+        new.first_response_at IS NOT NULL,
+        COALESCE((julianday(new.first_response_at) - julianday(new.created_at)) * 24, 0)
+    )
+    ON CONFLICT (day, status, inquiry_type, priority, country) DO UPDATE SET
+        inquiry_count = inquiry_count + 1,
+        estimated_value_sum = estimated_value_sum + excluded.estimated_value_sum,
+        responded_count = responded_count + excluded.responded_count,
+        response_hours_sum = response_hours_sum + excluded.response_hours_sum;
+END;
+"""
+
+REBUILD_ROLLUP_SQL = """
+DELETE FROM inquiry_daily_rollup;
+INSERT INTO inquiry_daily_rollup (
+    day, status, inquiry_type, priority, country,
+    inquiry_count, estimated_value_sum, responded_count, response_hours_sum
+)
+SELECT date(i.created_at), COALESCE(i.status, ''), COALESCE(i.inquiry_type, ''), COALESCE(i.priority, ''), COALESCE(i.country, ''),
+       COUNT(*), SUM(COALESCE(i.estimated_value, 0)), COUNT(i.first_response_at),
+       SUM(COALESCE((julianday(i.first_response_at) - julianday(i.created_at)) * 24, 0))
+FROM inquiries i
+GROUP BY 1, 2, 3, 4, 5;
+"""
+
+
+def upgrade(migrator):
+    if migrator.trigger_exists('trg_inquiries_rollup_ins'):
+        # 迁移机制之前的启动流程已创建并维护汇总
+        return
+
+    with migrator.transaction():
+        migrator.run_statements(INQUIRY_ROLLUP_SQL + REBUILD_ROLLUP_SQL)
@@ -0,0 +1,25 @@
+-- 询盘标签: 每个 (询盘, 标签) 一行，按标签筛选走 idx_inquiry_tags_tag
+-- Inquiry tags, one row per (inquiry, tag); tag filters use idx_inquiry_tags_tag
+
+CREATE TABLE IF NOT EXISTS inquiry_tags (
+    inquiry_id INTEGER NOT NULL,
+    tag TEXT NOT NULL COLLATE NOCASE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (inquiry_id, tag),
+    FOREIGN KEY (inquiry_id) REFERENCES inquiries(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_inquiry_tags_tag ON inquiry_tags(tag, inquiry_id);
+
+-- 标签变化使按标签筛选的计数缓存失效
+INSERT OR IGNORE INTO data_versions (table_name) VALUES ('inquiry_tags');
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiry_tags_version_ins AFTER INSERT ON inquiry_tags
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'inquiry_tags';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_inquiry_tags_version_del AFTER DELETE ON inquiry_tags
+BEGIN
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'inquiry_tags';
+END;
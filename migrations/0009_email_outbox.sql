@@ -0,0 +1,21 @@
+-- 邮件发件箱 (email_outbox.py)
+-- Transactional email outbox drained by email_outbox.OutboxDispatcher
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    template TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    context TEXT NOT NULL, -- JSON
+    inquiry_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, sending, sent, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    FOREIGN KEY (inquiry_id) REFERENCES inquiries(id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_inquiry ON email_outbox(inquiry_id);
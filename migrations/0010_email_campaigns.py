@@ -0,0 +1,51 @@
+"""
+询盘跟进邮件群发 (campaigns.py)
+Bulk follow-up email campaigns (campaigns.py)
+
+群发邮件走发件箱中限速的低优先级通道 (priority 1)，排在事务邮件 (0) 之后；
+未发送的群发邮件可以取消 (email_outbox.status = 'cancelled')。
+列通过 Migrator.add_column 添加，重复执行时跳过
+Campaign mail goes through the outbox in a throttled low-priority lane
+(priority 1) behind transactional mail (0); unsent campaign mail can be
+cancelled (email_outbox.status = 'cancelled'). Columns are added through
+Migrator.add_column so a rerun skips them
+"""
+
+CAMPAIGNS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS email_campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    followup_type TEXT NOT NULL,
+    selection TEXT, -- JSON: {"filter": {...}} or {"inquiry_ids": [...]}
+    status TEXT NOT NULL DEFAULT 'queuing', -- queuing, sending, cancelled, failed
+    total_selected INTEGER NOT NULL DEFAULT 0,
+    queued_count INTEGER NOT NULL DEFAULT 0,
+    sent_count INTEGER NOT NULL DEFAULT 0, -- 已发送的邮件不会在发件箱中永久保留
+    job_id TEXT,
+    created_by INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    queued_at TIMESTAMP,
+    FOREIGN KEY (created_by) REFERENCES users(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_campaigns_created ON email_campaigns(created_at);
+"""
+
+OUTBOX_COLUMNS = {
+    'campaign_id': 'INTEGER REFERENCES email_campaigns(id)',
+    'priority': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+OUTBOX_INDEXES_SQL = """
+DROP INDEX IF EXISTS idx_email_outbox_due;
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, priority, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_campaign ON email_outbox(campaign_id, recipient);
+"""
+
+
+def upgrade(migrator):
+    with migrator.transaction():
+        migrator.run_statements(CAMPAIGNS_TABLE_SQL)
+        for column, definition in OUTBOX_COLUMNS.items():
+            migrator.add_column('email_outbox', column, definition)
+        migrator.run_statements(OUTBOX_INDEXES_SQL)
@@ -0,0 +1,9 @@
+-- 群发邮件令牌桶 (email_outbox.OutboxDispatcher._claim)
+-- Shared token bucket for bulk mail, read and updated inside the outbox
+-- claim transaction so every dispatcher process draws on one EMAIL_BULK_RATE
+
+CREATE TABLE IF NOT EXISTS email_throttle (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    refilled_at REAL NOT NULL -- Unix 时间戳 (秒)
+) WITHOUT ROWID;
@@ -0,0 +1,9 @@
+"""
+产品软删除列 deleted_at (批量操作 delete 写入)
+Product soft delete column deleted_at, set by the bulk delete action
+"""
+
+
+def upgrade(migrator):
+    with migrator.transaction():
+        migrator.add_column('products', 'deleted_at', 'TIMESTAMP')
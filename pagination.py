@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+游标分页
+Keyset (Cursor) Pagination
+
+基于 (created_at, id) 的游标分页，以及按数据版本缓存的总数统计
+Keyset pagination on (created_at, id) plus a total-count cache keyed by
+the table's data version
+"""
+
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from response_cache import ResponseCache
+
+# 总数缓存: 键中包含表的数据版本，写入后自动失效；TTL 兜底
+count_cache = ResponseCache(ttl=60, max_bytes=1024 * 1024, max_entries=512)
+
+
+def encode_cursor(row, direction: str) -> str:
+    """将行的 (created_at, id) 编码为不透明游标"""
+    payload = json.dumps({'c': row['created_at'], 'i': row['id'], 'd': direction},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Dict]:
+    """解析游标，格式错误时抛出 ValueError"""
+    if not token:
+        return None
+
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if cursor.get('d') not in ('next', 'prev') or not isinstance(cursor.get('i'), int):
+            raise ValueError
+        return cursor
+    except (ValueError, TypeError, UnicodeDecodeError, AttributeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_clause(alias: str, cursor: Optional[Dict]) -> Tuple[str, list, str]:
+    """生成游标条件和排序 (按 created_at, id 倒序浏览)
+
+    返回 (附加的 AND 条件, 参数, ORDER BY 子句)；向前翻页时按正序取数，
+    由 keyset_page() 再反转
+    """
+    if cursor is None:
+        return '', [], f'{alias}.created_at DESC, {alias}.id DESC'
+
+    if cursor['d'] == 'next':
+        return (f' AND ({alias}.created_at, {alias}.id) < (?, ?)', [cursor['c'], cursor['i']],
+                f'{alias}.created_at DESC, {alias}.id DESC')
+
+    return (f' AND ({alias}.created_at, {alias}.id) > (?, ?)', [cursor['c'], cursor['i']],
+            f'{alias}.created_at ASC, {alias}.id ASC')
+
+
+def keyset_page(rows: List, cursor: Optional[Dict], limit: int) -> Tuple[List, Dict]:
+    """截取一页 (查询需多取一行以判断是否还有更多) 并生成前后游标"""
+    direction = cursor['d'] if cursor else 'next'
+    has_extra = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_extra if direction == 'next' else True
+    has_prev = cursor is not None if direction == 'next' else has_extra
+
+    return rows, {
+        'limit': limit,
+        'has_more': has_next and bool(rows),
+        'next_cursor': encode_cursor(rows[-1], 'next') if has_next and rows else None,
+        'prev_cursor': encode_cursor(rows[0], 'prev') if has_prev and rows else None,
+    }
+
+
+def cached_count(db, count_query: str, params: list, version=None) -> int:
+    """执行 COUNT 查询，结果按 (查询, 参数, 数据版本) 缓存"""
+    key = (count_query, tuple(params), version)
+    total = count_cache.get(key)
+    if total is None:
+        total = db.execute(count_query, params).fetchone()[0]
+        count_cache.set(key, total, size=64)
+    return total
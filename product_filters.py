@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+产品规格筛选
+Faceted Product Filtering
+
+基于数值化规格字段 (像素间距、亮度、刷新率等) 的区间筛选与分面统计，
+供 /api/products/filter 使用
+Range filters and facet counts over the numeric product specs,
+backing /api/products/filter
+"""
+
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+# 区间筛选参数 -> (字段, 比较符)
+RANGE_FILTERS = {
+    'pitch_min': ('p.pixel_pitch_mm', '>='),
+    'pitch_max': ('p.pixel_pitch_mm', '<='),
+    'brightness_min': ('p.brightness', '>='),
+    'brightness_max': ('p.brightness', '<='),
+    'refresh_min': ('p.refresh_rate', '>='),
+    'power_max': ('p.power_consumption', '<='),
+    'weight_max': ('p.weight', '<='),
+}
+
+# 多选分面参数 -> 字段
+FACET_FILTERS = {
+    'category': 'c.slug',
+    'ip_rating': 'p.ip_rating',
+    'pixel_pitch': 'p.pixel_pitch',
+}
+
+# 返回最小/最大值的数值字段
+RANGE_FIELDS = {
+    'pixel_pitch_mm': 'p.pixel_pitch_mm',
+    'brightness': 'p.brightness',
+    'refresh_rate': 'p.refresh_rate',
+    'power_consumption': 'p.power_consumption',
+    'weight': 'p.weight',
+}
+
+SORT_OPTIONS = {
+    'default': 'p.sort_order, p.created_at DESC',
+    'pitch': 'p.pixel_pitch_mm, p.id',
+    'pitch_desc': 'p.pixel_pitch_mm DESC, p.id',
+    'brightness': 'p.brightness DESC, p.id',
+    'refresh_rate': 'p.refresh_rate DESC, p.id',
+    'newest': 'p.created_at DESC, p.id DESC',
+}
+
+
+class ProductFilter:
+    """解析查询参数并按分面生成 WHERE 子句"""
+
+    def __init__(self, args):
+        self.ranges: List[Tuple[str, float]] = []
+        self.facets: Dict[str, List[str]] = {}
+        self.featured_only = args.get('featured', 'false').lower() == 'true'
+
+        for name, (column, operator) in RANGE_FILTERS.items():
+            value = args.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                self.ranges.append((f'{column} {operator} ?', float(value)))
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+
+        for name in FACET_FILTERS:
+            values = []
+            for raw in args.getlist(name):
+                values.extend(value.strip() for value in raw.split(',') if value.strip())
+            if values:
+                self.facets[name] = values
+
+    def where(self, exclude_facet: Optional[str] = None) -> Tuple[str, list]:
+        """生成 WHERE 子句；统计某分面时排除该分面自身的条件 (多选分面)"""
+        conditions = ['p.is_active = 1']
+        params = []
+
+        if self.featured_only:
+            conditions.append('p.is_featured = 1')
+
+        for condition, value in self.ranges:
+            conditions.append(condition)
+            params.append(value)
+
+        for name, values in self.facets.items():
+            if name == exclude_facet:
+                continue
+            placeholders = ','.join(['?'] * len(values))
+            conditions.append(f'{FACET_FILTERS[name]} IN ({placeholders})')
+            params.extend(values)
+
+        return 'WHERE ' + ' AND '.join(conditions), params
+
+
+def get_facet_counts(db: sqlite3.Connection, product_filter: ProductFilter, language: str = 'en') -> Dict:
+    """各分面取值及数量 (每个分面的统计排除其自身的已选条件)"""
+    facets = {}
+
+    where, params = product_filter.where(exclude_facet='category')
+    rows = db.execute(f'''
+        SELECT c.slug as value,
+               CASE WHEN ? = 'zh' THEN c.name_zh ELSE c.name_en END as label,
+               COUNT(*) as count
+        FROM products p
+        JOIN product_categories c ON p.category_id = c.id
+        {where}
+        GROUP BY c.id
+        ORDER BY c.sort_order
+    ''', [language] + params).fetchall()
+    facets['category'] = [dict(row) for row in rows]
+
+    for name in ('ip_rating', 'pixel_pitch'):
+        where, params = product_filter.where(exclude_facet=name)
+        order = 'MIN(p.pixel_pitch_mm)' if name == 'pixel_pitch' else 'value'
+        rows = db.execute(f'''
+            SELECT {FACET_FILTERS[name]} as value, COUNT(*) as count
+            FROM products p
+            LEFT JOIN product_categories c ON p.category_id = c.id
+            {where} AND {FACET_FILTERS[name]} IS NOT NULL AND {FACET_FILTERS[name]} != ''
+            GROUP BY {FACET_FILTERS[name]}
+            ORDER BY {order}
+        ''', params).fetchall()
+        facets[name] = [dict(row) for row in rows]
+
+    return facets
+
+
+def get_range_bounds(db: sqlite3.Connection, product_filter: ProductFilter) -> Dict:
+    """当前筛选结果中各数值字段的最小/最大值"""
+    where, params = product_filter.where()
+    selects = ', '.join(
+        f'MIN({column}) as {name}_min, MAX({column}) as {name}_max'
+        for name, column in RANGE_FIELDS.items()
+    )
+    row = db.execute(f'''
+        SELECT {selects}
+        FROM products p
+        LEFT JOIN product_categories c ON p.category_id = c.id
+        {where}
+    ''', params).fetchone()
+
+    return {
+        name: {'min': row[f'{name}_min'], 'max': row[f'{name}_max']}
+        for name in RANGE_FIELDS
+    }
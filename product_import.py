@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+产品批量导入
+Bulk Product Import
+
+解析CSV/NDJSON文件并按SKU批量插入或更新产品 (executemany，单个事务)，
+同时批量写入图片和应用场景；行级错误记入报告而不中断导入
+Parses CSV/NDJSON uploads and upserts products by SKU in batches
+(executemany inside one transaction), bulk-loading images and applications.
+Row-level errors are collected in the report instead of aborting the import
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from typing import Dict, Iterator, List, Tuple
+
+# 每批处理的行数
+IMPORT_BATCH_SIZE = 500
+
+# 报告中最多保留的错误条数
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# 可导入的产品字段及类型
+TEXT_FIELDS = (
+    'name_en', 'name_zh', 'description_en', 'description_zh', 'specs_en', 'specs_zh',
+    'currency', 'pixel_pitch', 'resolution', 'viewing_angle', 'ip_rating', 'dimensions',
+    'meta_title_en', 'meta_title_zh', 'meta_description_en', 'meta_description_zh',
+)
+INTEGER_FIELDS = ('brightness', 'refresh_rate', 'sort_order')
+REAL_FIELDS = ('price', 'power_consumption', 'weight')
+BOOLEAN_FIELDS = ('is_featured', 'is_active')
+
+PRODUCT_FIELDS = ('category_id',) + TEXT_FIELDS + INTEGER_FIELDS + REAL_FIELDS + BOOLEAN_FIELDS
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+_FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+# CSV 中多值字段的分隔符
+LIST_SEPARATOR = '|'
+
+
+class ImportRowError(ValueError):
+    """单行数据无效"""
+
+
+def iter_import_rows(stream, file_format: str) -> Iterator[Tuple[int, object]]:
+    """逐行读取上传文件，返回 (行号, 记录)；无法解析的行返回 (行号, ImportRowError)"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            # 行号包含表头
+            yield reader.line_num, _parse_csv_record(record)
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ImportRowError(f'Invalid JSON: {e.msg}')
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ImportRowError('Each line must be a JSON object')
+                continue
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported import format '{file_format}'. Available: {', '.join(IMPORT_FORMATS)}")
+
+
+def _parse_csv_record(record: Dict) -> Dict:
+    """CSV 空单元格视为未提供；图片/应用场景用 "|" 分隔"""
+    parsed = {}
+    for key, value in record.items():
+        if key is None or value is None:
+            continue
+        value = value.strip()
+        if value == '':
+            continue
+        parsed[key.strip()] = value
+
+    if 'images' in parsed:
+        parsed['images'] = [url.strip() for url in parsed['images'].split(LIST_SEPARATOR) if url.strip()]
+
+    if 'applications_en' in parsed or 'applications_zh' in parsed:
+        english = [item.strip() for item in parsed.pop('applications_en', '').split(LIST_SEPARATOR)]
+        chinese = [item.strip() for item in parsed.pop('applications_zh', '').split(LIST_SEPARATOR)]
+        parsed['applications'] = [
+            {'application_en': en or zh, 'application_zh': zh or en}
+            for en, zh in zip(english + [''] * (len(chinese) - len(english)),
+                              chinese + [''] * (len(english) - len(chinese)))
+            if en or zh
+        ]
+
+    return parsed
+
+
+def _coerce(field: str, value):
+    if value is None or value == '':
+        return None
+    try:
+        if field in INTEGER_FIELDS:
+            return int(float(value))
+        if field in REAL_FIELDS:
+            return float(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f'{field} must be a number')
+    if field in BOOLEAN_FIELDS:
+        if isinstance(value, bool):
+            return int(value)
+        normalized = str(value).strip().lower()
+        if normalized in _TRUE_VALUES:
+            return 1
+        if normalized in _FALSE_VALUES:
+            return 0
+        raise ImportRowError(f'{field} must be true or false')
+    return str(value)
+
+
+def _normalize_images(images) -> List[Dict]:
+    if not isinstance(images, list):
+        raise ImportRowError('images must be a list')
+
+    normalized = []
+    for position, image in enumerate(images):
+        if isinstance(image, str):
+            image = {'image_url': image}
+        if not isinstance(image, dict) or not image.get('image_url'):
+            raise ImportRowError('each image needs an image_url')
+        normalized.append({
+            'image_url': str(image['image_url']),
+            'alt_text_en': image.get('alt_text_en'),
+            'alt_text_zh': image.get('alt_text_zh'),
+            'sort_order': image.get('sort_order', position),
+            'is_primary': image.get('is_primary'),
+        })
+
+    # 未指定主图时第一张为主图
+    if normalized and not any(image['is_primary'] for image in normalized):
+        normalized[0]['is_primary'] = 1
+    for image in normalized:
+        image['is_primary'] = 1 if image['is_primary'] else 0
+    return normalized
+
+
+def _normalize_applications(applications) -> List[Dict]:
+    if not isinstance(applications, list):
+        raise ImportRowError('applications must be a list')
+
+    normalized = []
+    for position, application in enumerate(applications):
+        if isinstance(application, str):
+            application = {'application_en': application, 'application_zh': application}
+        if not isinstance(application, dict):
+            raise ImportRowError('each application must be a string or object')
+        english = application.get('application_en') or application.get('application_zh')
+        chinese = application.get('application_zh') or english
+        if not english:
+            raise ImportRowError('each application needs application_en or application_zh')
+        normalized.append({
+            'application_en': str(english),
+            'application_zh': str(chinese),
+            'sort_order': application.get('sort_order', position),
+        })
+    return normalized
+
+
+class ProductImporter:
+    """按SKU批量导入产品
+
+    已存在的SKU只更新文件中提供的字段；新SKU需要 name_en 和分类
+    (category_id 或 category_slug)，name_zh 缺省时使用 name_en。
+    提供 images / applications 时整体替换该产品原有的图片/应用场景
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = IMPORT_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.report = {
+            'processed': 0,
+            'inserted': 0,
+            'updated': 0,
+            'failed': 0,
+            'images': 0,
+            'applications': 0,
+            'errors': [],
+        }
+        self._categories = self._load_categories()
+        self._existing_skus = set()
+
+    def _load_categories(self) -> Dict[str, int]:
+        categories = {}
+        for row in self.conn.execute('SELECT id, slug FROM product_categories'):
+            categories[str(row[0])] = row[0]
+            if row[1]:
+                categories[row[1]] = row[0]
+        return categories
+
+    def run(self, rows: Iterator[Tuple[int, object]], dry_run: bool = False) -> Dict:
+        """在单个事务中导入全部行；dry_run 时校验并执行后回滚"""
+        for _ in self.run_batches(rows, dry_run=dry_run):
+            pass
+        return self.report
+
+    def run_batches(self, rows: Iterator[Tuple[int, object]], dry_run: bool = False) -> Iterator[Dict]:
+        """同 run()，每处理完一批返回一次进度"""
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN')
+
+        try:
+            batch = []
+            for row_number, record in rows:
+                batch.append((row_number, record))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch)
+                    batch = []
+                    yield self.summary()
+            if batch:
+                self._import_batch(batch)
+                yield self.summary()
+        except BaseException:
+            # 包括客户端断开导致的 GeneratorExit
+            self.conn.rollback()
+            raise
+
+        if dry_run:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+
+        self.report['dry_run'] = dry_run
+
+    def summary(self) -> Dict:
+        """不含错误明细的进度信息"""
+        return {key: value for key, value in self.report.items() if key != 'errors'}
+
+    def _error(self, row_number: int, sku, message: str):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'row': row_number, 'sku': sku, 'error': message})
+
+    def _import_batch(self, batch: List[Tuple[int, object]]):
+        self.report['processed'] += len(batch)
+
+        skus = [record.get('sku') for _, record in batch if isinstance(record, dict) and record.get('sku')]
+        self._load_existing_skus(skus)
+
+        inserts, updates = [], []
+        for row_number, record in batch:
+            if isinstance(record, Exception):
+                self._error(row_number, None, str(record))
+                continue
+
+            sku = str(record.get('sku') or '').strip()
+            try:
+                if not sku:
+                    raise ImportRowError('sku is required')
+                product = self._validate(record, is_new=sku not in self._existing_skus)
+            except ImportRowError as e:
+                self._error(row_number, sku or None, str(e))
+                continue
+
+            if sku in self._existing_skus:
+                updates.append((row_number, sku, product))
+            else:
+                inserts.append((row_number, sku, product))
+                # 同一文件中重复的SKU，后出现的行作为更新处理
+                self._existing_skus.add(sku)
+
+        inserted = self._execute_rows('INSERT', inserts)
+        updated = self._execute_rows('UPDATE', updates)
+        self.report['inserted'] += len(inserted)
+        self.report['updated'] += len(updated)
+
+        self._replace_children(inserted + updated)
+
+    def _load_existing_skus(self, skus: List[str]):
+        unknown = [sku for sku in set(skus) if sku not in self._existing_skus]
+        if not unknown:
+            return
+        placeholders = ','.join(['?'] * len(unknown))
+        rows = self.conn.execute(f'SELECT sku FROM products WHERE sku IN ({placeholders})', unknown)
+        self._existing_skus.update(row[0] for row in rows)
+
+    def _validate(self, record: Dict, is_new: bool) -> Dict:
+        product = {}
+
+        category = record.get('category_id', record.get('category_slug'))
+        if category not in (None, ''):
+            category_id = self._categories.get(str(category).strip())
+            if category_id is None:
+                raise ImportRowError(f'Unknown category: {category}')
+            product['category_id'] = category_id
+
+        for field in PRODUCT_FIELDS:
+            if field != 'category_id' and field in record:
+                product[field] = _coerce(field, record[field])
+
+        if is_new:
+            if not product.get('name_en'):
+                raise ImportRowError('name_en is required for new products')
+            if not product.get('category_id'):
+                raise ImportRowError('category_id or category_slug is required for new products')
+            if not product.get('name_zh'):
+                product['name_zh'] = product['name_en']
+
+        if 'images' in record:
+            product['images'] = _normalize_images(record['images'])
+        if 'applications' in record:
+            product['applications'] = _normalize_applications(record['applications'])
+
+        return product
+
+    def _execute_rows(self, operation: str, rows: List[Tuple[int, str, Dict]]) -> List[Tuple[int, str, Dict]]:
+        """executemany 批量执行；整批失败或有 UPDATE 未匹配到产品时逐行重试以定位出错的行"""
+        if not rows:
+            return []
+
+        if operation == 'INSERT':
+            columns = ('sku',) + PRODUCT_FIELDS
+            query = (f"INSERT INTO products ({', '.join(columns)}) "
+                     f"VALUES ({', '.join(['?'] * len(columns))})")
+            params = [
+                (sku,) + tuple(self._insert_value(product, field) for field in PRODUCT_FIELDS)
+                for _, sku, product in rows
+            ]
+        else:
+            # 未提供的字段保持原值
+            assignments = ', '.join(f'{field} = COALESCE(?, {field})' for field in PRODUCT_FIELDS)
+            query = f'UPDATE products SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE sku = ?'
+            params = [
+                tuple(product.get(field) for field in PRODUCT_FIELDS) + (sku,)
+                for _, sku, product in rows
+            ]
+
+        self.conn.execute('SAVEPOINT product_import_batch')
+        try:
+            cursor = self.conn.executemany(query, params)
+            # 同一文件中重复的SKU若插入失败，其后的更新行匹配不到产品
+            if operation == 'INSERT' or cursor.rowcount == len(rows):
+                self.conn.execute('RELEASE SAVEPOINT product_import_batch')
+                return rows
+        except sqlite3.Error:
+            pass
+        self.conn.execute('ROLLBACK TO SAVEPOINT product_import_batch')
+
+        succeeded = []
+        for row, row_params in zip(rows, params):
+            row_number, sku, _ = row
+            try:
+                cursor = self.conn.execute(query, row_params)
+            except sqlite3.Error as e:
+                if operation == 'INSERT':
+                    self._existing_skus.discard(sku)
+                self._error(row_number, sku, str(e))
+                continue
+            if cursor.rowcount == 0:
+                self._error(row_number, sku, 'Product not found (an earlier row with this SKU failed)')
+                continue
+            succeeded.append(row)
+        self.conn.execute('RELEASE SAVEPOINT product_import_batch')
+        return succeeded
+
+    @staticmethod
+    def _insert_value(product: Dict, field: str):
+        value = product.get(field)
+        if value is None:
+            # 与 products 表的默认值保持一致
+            return {'currency': 'USD', 'is_featured': 0, 'is_active': 1, 'sort_order': 0}.get(field)
+        return value
+
+    def _replace_children(self, rows: List[Tuple[int, str, Dict]]):
+        with_children = [(sku, product) for _, sku, product in rows
+                         if 'images' in product or 'applications' in product]
+        if not with_children:
+            return
+
+        skus = list({sku for sku, _ in with_children})
+        placeholders = ','.join(['?'] * len(skus))
+        product_ids = dict(self.conn.execute(
+            f'SELECT sku, id FROM products WHERE sku IN ({placeholders})', skus
+        ).fetchall())
+
+        for collection, columns in (
+            ('images', ('image_url', 'alt_text_en', 'alt_text_zh', 'is_primary', 'sort_order')),
+            ('applications', ('application_en', 'application_zh', 'sort_order')),
+        ):
+            # 同一SKU在批次中出现多次时以最后一行为准
+            latest = {sku: product[collection] for sku, product in with_children if collection in product}
+            if not latest:
+                continue
+
+            table = f'product_{collection}'
+            self.conn.executemany(f'DELETE FROM {table} WHERE product_id = ?',
+                                  [(product_ids[sku],) for sku in latest])
+            children = [
+                (product_ids[sku],) + tuple(child[column] for column in columns)
+                for sku, items in latest.items()
+                for child in items
+            ]
+            self.conn.executemany(
+                f"INSERT INTO {table} (product_id, {', '.join(columns)}) "
+                f"VALUES (?, {', '.join(['?'] * len(columns))})",
+                children
+            )
+            self.report[collection] += len(children)
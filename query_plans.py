@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+热点查询执行计划检查
+Hot Query Plan Check
+
+对各接口的热点查询执行 EXPLAIN QUERY PLAN，出现全表扫描 (SCAN 且未使用索引)
+或自动索引即判定为退化。有查询构造函数的接口 (列表、导出、批量操作、发件箱)
+由 hot_queries() 调用同一构造函数生成SQL；其余固定SQL登记在 HOT_QUERIES。
+test_query_plans.py 在由 run_migrations 建立的临时数据库上运行本检查
+Runs EXPLAIN QUERY PLAN over the hot queries behind the API endpoints and
+fails when any of them degrades to a full table scan or an automatic
+index. Endpoints with a query builder (lists, exports, bulk actions, the
+outbox) are checked with SQL generated by hot_queries() from that same
+builder; fixed SQL without a builder is registered in HOT_QUERIES.
+test_query_plans.py runs the check against a database built by
+run_migrations
+
+用法 / Usage:
+    python query_plans.py [database.db]
+"""
+
+import re
+import sqlite3
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from bulk_actions import BULK_CHUNK_SIZE, CHUNK_SELECTION_SQL, BulkSelection, filter_selection_sql
+from campaigns import MESSAGE_COUNTS_SQL, outbox_statement
+from email_outbox import DUE_MESSAGES_SQL, PRIORITY_BULK
+
+
+class HotQuery(NamedTuple):
+    name: str
+    sql: str
+    params: Tuple = ()
+    # 允许全表扫描的小表 (如分类表)
+    allow_scan: Tuple[str, ...] = ()
+
+
+# 列表接口的筛选参数组合: (名称后缀, 查询参数)
+LIST_FILTERS = {
+    'products': [
+        ('', {}),
+        ('_by_category', {'category_id': '1'}),
+    ],
+    'inquiries': [
+        ('', {}),
+        ('_by_status', {'status': 'new'}),
+        ('_by_tag', {'tag': 'trade-show'}),
+        ('_date_range', {'date_from': '2024-01-01', 'date_to': '2024-12-31'}),
+    ],
+}
+
+# 游标分页的后续页
+_CURSOR = {'c': '2030-01-01 00:00:00', 'i': 1, 'd': 'next'}
+
+# 批量操作的请求参数 (每种操作一条)
+BULK_ACTIONS = {
+    'products': [
+        {'action': 'activate'}, {'action': 'deactivate'}, {'action': 'feature'}, {'action': 'unfeature'},
+        {'action': 'delete'}, {'action': 'update_category', 'category_id': 1},
+        {'action': 'update_price', 'price_adjustment': {'type': 'percentage', 'value': 10}},
+    ],
+    'inquiries': [
+        {'action': 'update_status', 'status': 'contacted'}, {'action': 'update_priority', 'priority': 'high'},
+        {'action': 'assign', 'assigned_to': 1},
+        {'action': 'add_tag', 'tags': ['vip']}, {'action': 'remove_tag', 'tags': ['vip']},
+    ],
+}
+
+# 没有查询构造函数的固定SQL (与接口中的SQL保持一致)
+HOT_QUERIES = [
+    # --- 产品目录 / Catalog ---
+    HotQuery('public_catalog', '''
+        SELECT p.id, p.sku, p.name_en, pi.image_url
+        FROM products p
+        LEFT JOIN product_categories c ON p.category_id = c.id
+        LEFT JOIN product_images pi ON p.id = pi.product_id AND pi.is_primary = 1
+        WHERE p.is_active = 1
+        ORDER BY p.sort_order, p.created_at DESC
+    '''),
+    HotQuery('public_catalog_by_category_slug', '''
+        SELECT p.id, p.sku, p.name_en, pi.image_url
+        FROM products p
+        LEFT JOIN product_categories c ON p.category_id = c.id
+        LEFT JOIN product_images pi ON p.id = pi.product_id AND pi.is_primary = 1
+        WHERE p.is_active = 1 AND c.slug = ?
+        ORDER BY p.sort_order, p.created_at DESC
+    ''', ('fine-pitch-led',)),
+    HotQuery('catalog_by_category', '''
+        SELECT p.*, c.name_en as category_name_en
+        FROM products p
+        LEFT JOIN product_categories c ON p.category_id = c.id
+        WHERE p.is_active = 1 AND p.category_id = ?
+        ORDER BY p.sort_order, p.name_en
+    ''', (1,)),
+    HotQuery('product_images_batch', '''
+        SELECT * FROM product_images
+        WHERE product_id IN (?, ?, ?)
+        ORDER BY product_id, is_primary DESC, sort_order
+    ''', (1, 2, 3)),
+    HotQuery('product_applications_batch', '''
+        SELECT * FROM product_applications
+        WHERE product_id IN (?, ?, ?)
+        ORDER BY product_id, sort_order
+    ''', (1, 2, 3)),
+    HotQuery('product_by_sku', 'SELECT id FROM products WHERE sku = ?', ('LED-1',)),
+
+    # --- 询盘 / Inquiries ---
+    HotQuery('inquiry_tags_batch', '''
+        SELECT inquiry_id, tag FROM inquiry_tags
+        WHERE inquiry_id IN (?, ?, ?)
+        ORDER BY inquiry_id, tag
+    ''', (1, 2, 3)),
+    HotQuery('dashboard_recent_inquiries', '''
+        SELECT i.*, u.username as assigned_user
+        FROM inquiries i
+        LEFT JOIN users u ON i.assigned_to = u.id
+        ORDER BY i.created_at DESC
+        LIMIT 5
+    '''),
+    HotQuery('inquiry_followups', '''
+        SELECT f.*, u.username
+        FROM inquiry_followups f
+        LEFT JOIN users u ON f.user_id = u.id
+        WHERE f.inquiry_id = ?
+        ORDER BY f.created_at DESC
+    ''', (1,)),
+    HotQuery('inquiry_followups_batch', '''
+        SELECT f.* FROM inquiry_followups f
+        WHERE f.inquiry_id IN (?, ?, ?)
+        ORDER BY f.inquiry_id, f.created_at
+    ''', (1, 2, 3)),
+    HotQuery('inquiry_daily_trend', '''
+        SELECT day, SUM(inquiry_count) FROM inquiry_daily_rollup
+        WHERE day >= date('now', ?)
+        GROUP BY day
+    ''', ('-7 days',)),
+
+    # --- 内容 / Content ---
+    HotQuery('news_published', '''
+        SELECT id, title_en FROM news_articles
+        WHERE is_published = 1
+        ORDER BY published_at DESC LIMIT ?
+    ''', (10,)),
+    HotQuery('cases_published', '''
+        SELECT id, title_en FROM cases
+        WHERE is_published = 1
+        ORDER BY project_date DESC LIMIT ?
+    ''', (12,)),
+    HotQuery('cases_featured_first', '''
+        SELECT * FROM cases
+        WHERE is_published = 1
+        ORDER BY is_featured DESC, created_at DESC
+    '''),
+    HotQuery('case_images', '''
+        SELECT * FROM case_images WHERE case_id = ? ORDER BY sort_order
+    ''', (1,)),
+    HotQuery('page_content', '''
+        SELECT section_key, content_en FROM page_contents
+        WHERE page_key = ? AND is_active = 1
+    ''', ('home',)),
+
+    # --- 后台 / Admin ---
+    HotQuery('activity_logs_recent', '''
+        SELECT l.*, u.username
+        FROM activity_logs l
+        LEFT JOIN users u ON l.user_id = u.id
+        ORDER BY l.created_at DESC
+        LIMIT ?
+    ''', (50,)),
+    HotQuery('activity_logs_by_user', '''
+        SELECT l.*, u.username
+        FROM activity_logs l
+        LEFT JOIN users u ON l.user_id = u.id
+        WHERE l.user_id = ?
+        ORDER BY l.created_at DESC
+        LIMIT ?
+    ''', (1, 50)),
+    HotQuery('user_by_username', 'SELECT * FROM users WHERE username = ?', ('admin',)),
+    HotQuery('session_by_token', 'SELECT * FROM user_sessions WHERE session_token = ?', ('token',)),
+]
+
+def hot_queries() -> List[HotQuery]:
+    """由各接口的查询构造函数生成热点查询，加上 HOT_QUERIES 中的固定SQL"""
+    # 延迟导入: 导入服务模块会创建应用
+    from werkzeug.datastructures import MultiDict
+
+    import integrated_server as server
+    from product_filters import ProductFilter
+
+    queries = []
+    for entity, filters in LIST_FILTERS.items():
+        table, _, build_filters, alias, build_statement = server.BULK_TARGETS[entity]
+        _, export_query, _, _ = server.EXPORT_DATASETS[entity]
+        for suffix, args in filters:
+            filter_sql, params = build_filters(MultiDict(args))
+            # 列表: 偏移分页、首页游标分页与后续游标分页
+            for variant, keyset, cursor in (('page', False, None), ('keyset', True, None),
+                                            ('keyset_next', True, _CURSOR)):
+                sql, query_params, _ = server.admin_list_query(entity, filter_sql, params, 20, 1, cursor, keyset)
+                queries.append(HotQuery(f'admin_{entity}{suffix}_{variant}', sql, tuple(query_params)))
+            queries.append(HotQuery(f'export_{entity}{suffix}', export_query.format(filters=filter_sql),
+                                    tuple(params)))
+            queries.append(HotQuery(f'bulk_select_{entity}{suffix}',
+                                    filter_selection_sql(table, alias, filter_sql), tuple(params)))
+
+        for data in BULK_ACTIONS[entity]:
+            sql, params = build_statement(data)
+            # add_tag 的标签列表 (VALUES t) 是常量行
+            allow_scan = ('t',) if data['action'] == 'add_tag' else ()
+            queries.append(_chunk_query(f"bulk_{entity}_{data['action']}", sql, params, allow_scan))
+
+    queries.append(_chunk_query('campaign_queue', *outbox_statement(1, 'general')))
+    queries.append(HotQuery('email_outbox_due', DUE_MESSAGES_SQL, (PRIORITY_BULK, 20)))
+    queries.append(HotQuery('email_campaign_counts', MESSAGE_COUNTS_SQL, (1,)))
+
+    where, params = ProductFilter(MultiDict({'pitch_min': '1.0', 'pitch_max': '2.5'})).where()
+    queries.append(HotQuery('product_filter', f'''
+        SELECT p.id FROM products p
+        LEFT JOIN product_categories c ON p.category_id = c.id
+        {where}
+    ''', tuple(params)))
+
+    return queries + HOT_QUERIES
+
+
+def _chunk_query(name: str, sql: str, params: List, allow_scan: Tuple[str, ...] = ()) -> HotQuery:
+    """BulkSelection.run 按块执行的语句 (需要已打开的 temp.bulk_selection)"""
+    return HotQuery(name, sql.format(selection=CHUNK_SELECTION_SQL), tuple(params) + (1, BULK_CHUNK_SIZE),
+                    allow_scan)
+
+
+# 全表扫描: "SCAN products" / "SCAN p"，不含 "USING ... INDEX" 或虚拟表
+_FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?: LEFT-JOIN)?$')
+
+
+def explain(conn: sqlite3.Connection, query: HotQuery) -> List[str]:
+    """返回查询计划各步骤的描述"""
+    rows = conn.execute(f'EXPLAIN QUERY PLAN {query.sql}', query.params).fetchall()
+    return [row[3] for row in rows]
+
+
+def _scanned_table(query: HotQuery, alias: str) -> str:
+    """将计划中的别名解析为表名"""
+    match = re.search(rf'\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?{alias}\b', query.sql, re.IGNORECASE)
+    return match.group(1) if match else alias
+
+
+def check_query_plans(conn: sqlite3.Connection, queries: Optional[List[HotQuery]] = None) -> List[Dict]:
+    """检查热点查询 (默认为 hot_queries() 的全部查询)，返回每条查询的结果 (ok / plan / problems)"""
+    if queries is None:
+        queries = hot_queries()
+    # 按块执行的批量语句引用临时表 bulk_selection
+    with BulkSelection(conn, 'products'):
+        return [_check(conn, query) for query in queries]
+
+
+def _check(conn: sqlite3.Connection, query: HotQuery) -> Dict:
+    result = {'name': query.name, 'ok': True, 'plan': [], 'problems': [], 'warnings': []}
+    try:
+        result['plan'] = explain(conn, query)
+    except sqlite3.Error as e:
+        result['ok'] = False
+        result['problems'].append(f'cannot explain: {e}')
+        return result
+
+    for step in result['plan']:
+        match = _FULL_SCAN.match(step)
+        if match:
+            table = _scanned_table(query, match.group(1))
+            if table not in query.allow_scan:
+                result['ok'] = False
+                result['problems'].append(f'full table scan of {table}: {step}')
+        elif 'AUTOMATIC' in step:
+            # SQLite 临时为本次查询建索引，说明缺少索引
+            result['ok'] = False
+            result['problems'].append(f'automatic index: {step}')
+        elif 'USE TEMP B-TREE' in step:
+            result['warnings'].append(step)
+    return result
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    database = argv[0] if argv else 'database.db'
+
+    conn = sqlite3.connect(database)
+    try:
+        results = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    failures = [result for result in results if not result['ok']]
+    for result in results:
+        status = 'OK  ' if result['ok'] else 'FAIL'
+        print(f"{status} {result['name']}")
+        for problem in result['problems']:
+            print(f'       {problem}')
+        for warning in result['warnings']:
+            print(f'       note: {warning}')
+
+    print(f'\n{len(results) - len(failures)}/{len(results)} hot queries use indexes')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+请求限流
+Request Rate Limiting
+
+滑动窗口计数器: 每个键只保存当前窗口与上一窗口的请求数，按当前窗口已过去
+的比例加权估算滑动窗口内的请求数，每次请求 O(1)。两种存储:
+  - memory: 进程内 (按最近访问排序，闲置的键被淘汰，键数有上限)
+  - sqlite: 独立的SQLite文件，多个 gunicorn worker 共享同一计数
+Sliding window counter: each key keeps only the request counts of the
+current and the previous fixed window; the previous count is weighted by
+the part of it still inside the sliding window, so every check is O(1).
+Two backends:
+  - memory: per process (kept in access order; idle keys are evicted and
+    the number of keys is capped)
+  - sqlite: a separate SQLite file whose counters are shared by every
+    gunicorn worker on the host
+
+RATE_LIMIT_BACKEND=memory|sqlite 选择存储，RATE_LIMIT_DB 为 sqlite 文件路径
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', 'rate_limits.db')
+# 内存存储最多保留的键数，超出时淘汰最久未访问的键
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+# sqlite 存储清理过期计数的间隔 (秒)
+_PRUNE_INTERVAL = 60
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float        # 距当前窗口结束的秒数
+    retry_after: float  # 被拒绝时，距下一次允许请求的秒数
+
+    def headers(self) -> Dict[str, str]:
+        """X-RateLimit-* 响应头 (被拒绝时附加 Retry-After)"""
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+# 计数状态: (窗口序号, 当前窗口请求数, 上一窗口请求数)
+WindowState = Tuple[int, int, int]
+
+
+def sliding_window_hit(state: Optional[WindowState], now: float, limit: int,
+                       window: float) -> Tuple[WindowState, RateLimitResult]:
+    """记录一次请求，返回 (新状态, 结果)；被拒绝的请求不计数"""
+    index = int(now // window)
+    current = previous = 0
+    if state is not None:
+        if state[0] == index:
+            current, previous = state[1], state[2]
+        elif state[0] == index - 1:
+            previous = state[1]
+
+    elapsed = now - index * window
+    reset = window - elapsed
+    estimate = previous * (1 - elapsed / window) + current
+
+    if estimate + 1 > limit:
+        if current + 1 <= limit:
+            # 等上一窗口的权重下降到足够小
+            retry_after = window * (1 - (limit - current - 1) / previous) - elapsed
+        else:
+            # 等到下一窗口，当前窗口的计数成为上一窗口
+            retry_after = reset + window * (1 - (limit - 1) / current)
+        return (index, current, previous), RateLimitResult(False, limit, 0, reset, retry_after)
+
+    current += 1
+    remaining = max(int(limit - estimate - 1), 0)
+    return (index, current, previous), RateLimitResult(True, limit, remaining, reset, 0.0)
+
+
+class MemoryRateLimiter:
+    """进程内存储；两个窗口内无请求的键 (不再影响计数) 在访问时顺带淘汰"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (状态, 窗口长度, 最后访问时间)，按最近访问排序
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            state, result = sliding_window_hit(entry[0] if entry else None, now, limit, window)
+            self._entries[key] = (state, window, now)
+            self._evict(now)
+        return result
+
+    def _evict(self, now: float):
+        # 最久未访问的键在最前面；每次最多检查少量键，保持 O(1)
+        for _ in range(4):
+            if not self._entries:
+                break
+            oldest_key = next(iter(self._entries))
+            _, window, last_seen = self._entries[oldest_key]
+            if now - last_seen < 2 * window and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[oldest_key]
+            self._evictions += 1
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'backend': self.name, 'keys': len(self._entries), 'evictions': self._evictions,
+                    'max_keys': self.max_keys}
+
+
+class SQLiteRateLimiter:
+    """多进程共享的存储: 每次请求在一个 BEGIN IMMEDIATE 事务中读写一行
+
+    计数放在独立的数据库文件中，不与业务库争用写锁；丢失计数无害，因此关闭同步
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str = RATE_LIMIT_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    window_index INTEGER NOT NULL,
+                    current_count INTEGER NOT NULL,
+                    previous_count INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits(expires_at)')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''
+                SELECT window_index, current_count, previous_count FROM rate_limits WHERE key = ?
+            ''', (key,)).fetchone()
+            state, result = sliding_window_hit(tuple(row) if row else None, now, limit, window)
+            if result.allowed:
+                # 两个窗口后计数不再有影响，可以删除
+                conn.execute('''
+                    INSERT OR REPLACE INTO rate_limits
+                        (key, window_index, current_count, previous_count, expires_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (key,) + state + ((state[0] + 2) * window,))
+            if now - self._last_prune >= _PRUNE_INTERVAL:
+                self._last_prune = now
+                conn.execute('DELETE FROM rate_limits WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def reset(self):
+        self._connection().execute('DELETE FROM rate_limits')
+
+    def stats(self) -> Dict:
+        count = self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        return {'backend': self.name, 'keys': count, 'db_path': self.db_path}
+
+
+def create_rate_limiter(backend: str = RATE_LIMIT_BACKEND):
+    """按 RATE_LIMIT_BACKEND 创建限流存储"""
+    if backend == 'sqlite':
+        return SQLiteRateLimiter(RATE_LIMIT_DB)
+    if backend != 'memory':
+        logger.warning(f'Unknown RATE_LIMIT_BACKEND {backend!r}, using memory')
+    return MemoryRateLimiter()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+响应缓存
+In-process Response Cache
+
+公开目录接口的读穿透缓存 (TTL + LRU，按内存预算淘汰)，
+由后台写操作按标签显式失效
+Read-through cache for public catalog endpoints (TTL + LRU with a memory
+budget), invalidated explicitly by tag from the admin write paths
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+DEFAULT_CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+DEFAULT_CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2048))
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL, max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = ttl > 0
+
+        # key -> (expires_at, size, tags, value)，按最近使用排序
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[3]
+
+    def set(self, key: Hashable, value: Any, size: int, tags: Iterable[str] = (),
+            ttl: Optional[float] = None):
+        """写入缓存，超出条目数或内存预算时淘汰最久未使用的条目"""
+        if not self.enabled or size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        tags = tuple(tags)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (expires_at, size, tags, value)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, *tags: str) -> int:
+        """按标签失效缓存，不传标签时清空全部"""
+        with self._lock:
+            if not tags:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+                self._bytes = 0
+            else:
+                keys = set()
+                for tag in tags:
+                    keys |= self._tags.pop(tag, set())
+                removed = 0
+                for key in keys:
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+
+            self._counters['invalidations'] += removed
+            return removed
+
+    def _remove(self, key: Hashable):
+        _, size, tags, _ = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict:
+        """缓存统计信息"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups * 100, 1) if lookups else 0
+        stats['max_bytes'] = self.max_bytes
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
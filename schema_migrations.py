@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+数据库结构迁移
+Versioned Schema Migrations
+
+按版本号顺序执行 migrations/ 目录下的迁移文件 (NNNN_name.sql 或 NNNN_name.py)，
+已执行的版本记录在 schema_version 表中，启动时只执行尚未应用的迁移；
+没有待执行迁移时只需一次查询。大表上的数据迁移通过 Migrator.batched()
+按 id 区间分批提交，避免长时间持有写锁
+Applies the numbered files in migrations/ in order and records each one in
+the schema_version table, so startup only runs what is pending (a single
+query when nothing is). Data migrations on large tables go through
+Migrator.batched(), which commits per id range instead of holding the
+write lock for the whole backfill
+
+编写迁移 / Writing migrations:
+    - NNNN_name.sql: 整个文件在一个事务中执行
+    - NNNN_name.py: 定义 upgrade(migrator)，可自行分批提交
+    - 已发布的迁移文件不要再修改，结构变更请新增迁移
+    - SQL 写在迁移文件中，不要从其他模块导入 (校验和只覆盖迁移文件本身)
+
+用法 / Usage:
+    python schema_migrations.py [database.db] [--status]
+"""
+
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# 数据迁移每批处理的行数
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 5000))
+
+# 其他进程正在执行同一迁移时的最长等待时间 (秒)，超时视为中断，接管执行
+MIGRATION_LOCK_TIMEOUT = 600
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    applied_at TIMESTAMP,  -- NULL 表示正在执行
+    duration_ms INTEGER
+)
+"""
+
+_MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+    kind: str  # 'sql' | 'py'
+
+    @property
+    def checksum(self) -> str:
+        with open(self.path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """按版本号列出迁移文件，版本号重复时报错"""
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f'Duplicate migration version {version:04d}: {filename}')
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename), match.group(3))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(script: str) -> List[str]:
+    """将SQL脚本拆分为完整语句 (正确处理触发器中的 BEGIN ... END)"""
+    statements = []
+    buffer = ''
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip().strip(';').strip():
+                statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip() and not all(
+        not line.strip() or line.strip().startswith('--') for line in buffer.splitlines()
+    ):
+        raise MigrationError(f'Incomplete SQL statement: {buffer.strip()[:80]}')
+    return statements
+
+
+class Migrator:
+    """迁移执行上下文，传给 Python 迁移的 upgrade()"""
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = MIGRATION_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+
+    def table_exists(self, table: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def trigger_exists(self, trigger: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,)
+        ).fetchone() is not None
+
+    def columns(self, table: str) -> set:
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_xinfo({table})")}
+
+    def add_column(self, table: str, column: str, definition: str) -> bool:
+        """列不存在时添加 (SQLite 添加可空列不重写表)"""
+        if column in self.columns(table):
+            return False
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    @contextmanager
+    def transaction(self):
+        """IMMEDIATE 事务: 开始时即获取写锁，异常时回滚"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def run_statements(self, script: str):
+        """在当前事务中逐条执行SQL脚本 (executescript 会先提交，不能用于事务内)"""
+        for statement in split_statements(script):
+            self.conn.execute(statement)
+
+    def execute_script(self, script: str):
+        """在一个事务中执行SQL脚本"""
+        with self.transaction():
+            self.run_statements(script)
+
+    def batched(self, table: str, sql: str, upper: Optional[int] = None, key: str = 'id') -> int:
+        """按 key 区间分批执行 sql，每批单独提交以释放写锁
+
+        sql 中用 :batch_start / :batch_end 引用当前区间；upper 限定处理的最大 key
+        (之后新写入的行由触发器负责)。返回受影响的行数
+        """
+        low, high = self.conn.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}").fetchone()
+        if low is None:
+            return 0
+        if upper is not None:
+            high = min(high, upper)
+
+        affected = 0
+        for start in range(low, high + 1, self.batch_size):
+            end = min(start + self.batch_size - 1, high)
+            with self.transaction():
+                cursor = self.conn.execute(sql, {'batch_start': start, 'batch_end': end})
+            affected += max(cursor.rowcount, 0)
+            logger.info(f'  {table}: {key} {start}-{end} of {high} done')
+        return affected
+
+
+def ensure_version_table(conn: sqlite3.Connection):
+    conn.execute(SCHEMA_VERSION_SQL)
+    conn.commit()
+
+
+def applied_versions(conn: sqlite3.Connection) -> Dict[int, sqlite3.Row]:
+    """已完成的迁移: {版本号: 记录}"""
+    conn_factory = conn.row_factory
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            'SELECT * FROM schema_version WHERE applied_at IS NOT NULL ORDER BY version'
+        ).fetchall()
+    finally:
+        conn.row_factory = conn_factory
+    return {row['version']: row for row in rows}
+
+
+def pending_migrations(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    migrations = discover_migrations() if migrations is None else migrations
+    applied = applied_versions(conn)
+    for migration in migrations:
+        record = applied.get(migration.version)
+        if record is not None and record['checksum'] != migration.checksum:
+            logger.warning(f'Migration {migration.version:04d}_{migration.name} changed after it was applied')
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def _claim(conn: sqlite3.Connection, migration: Migration) -> bool:
+    """登记迁移为执行中；已完成返回 False，其他进程执行中则等待其结束"""
+    deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT applied_at, (julianday('now') - julianday(started_at)) * 86400 "
+                "FROM schema_version WHERE version = ?", (migration.version,)
+            ).fetchone()
+            if row is not None and row[0] is not None:
+                conn.commit()
+                return False
+            if row is None or row[1] > MIGRATION_LOCK_TIMEOUT or time.monotonic() > deadline:
+                conn.execute('''
+                    INSERT INTO schema_version (version, name, checksum, started_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (version) DO UPDATE SET started_at = CURRENT_TIMESTAMP
+                ''', (migration.version, migration.name, migration.checksum))
+                conn.commit()
+                return True
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        time.sleep(0.5)
+
+
+def _load_module(migration: Migration):
+    spec = importlib.util.spec_from_file_location(f'migration_{migration.version:04d}', migration.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, 'upgrade'):
+        raise MigrationError(f'{os.path.basename(migration.path)} does not define upgrade(migrator)')
+    return module
+
+
+def apply_migration(conn: sqlite3.Connection, migration: Migration, batch_size: int = MIGRATION_BATCH_SIZE) -> bool:
+    """执行单个迁移，返回是否实际执行 (已被其他进程完成时为 False)"""
+    started = time.perf_counter()
+
+    if migration.kind == 'sql':
+        with open(migration.path, encoding='utf-8') as f:
+            script = f.read()
+        migrator = Migrator(conn, batch_size)
+        with migrator.transaction():
+            if conn.execute(
+                'SELECT 1 FROM schema_version WHERE version = ? AND applied_at IS NOT NULL', (migration.version,)
+            ).fetchone():
+                return False
+            migrator.run_statements(script)
+            conn.execute('''
+                INSERT INTO schema_version (version, name, checksum, applied_at, duration_ms)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+                ON CONFLICT (version) DO UPDATE SET
+                    applied_at = excluded.applied_at, duration_ms = excluded.duration_ms
+            ''', (migration.version, migration.name, migration.checksum,
+                  int((time.perf_counter() - started) * 1000)))
+        return True
+
+    # Python 迁移自行管理事务 (可分批提交)，执行期间以 applied_at 为空的记录占位
+    module = _load_module(migration)
+    if not _claim(conn, migration):
+        return False
+    try:
+        module.upgrade(Migrator(conn, batch_size))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        conn.execute('DELETE FROM schema_version WHERE version = ? AND applied_at IS NULL', (migration.version,))
+        conn.commit()
+        raise
+    conn.execute(
+        'UPDATE schema_version SET applied_at = CURRENT_TIMESTAMP, duration_ms = ? WHERE version = ?',
+        (int((time.perf_counter() - started) * 1000), migration.version)
+    )
+    conn.commit()
+    return True
+
+
+def run_migrations(conn: sqlite3.Connection, directory: str = MIGRATIONS_DIR,
+                   batch_size: int = MIGRATION_BATCH_SIZE) -> List[Migration]:
+    """执行所有待执行的迁移，返回本次实际执行的迁移"""
+    migrations = discover_migrations(directory)
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        latest = conn.execute(
+            'SELECT MAX(version), COUNT(*) FROM schema_version WHERE applied_at IS NOT NULL'
+        ).fetchone()
+        if migrations and tuple(latest) == (migrations[-1].version, len(migrations)):
+            return []
+    except sqlite3.OperationalError:
+        # schema_version 尚不存在 (新数据库或迁移机制之前创建的数据库)
+        ensure_version_table(conn)
+
+    applied = []
+    for migration in pending_migrations(conn, migrations):
+        logger.info(f'Applying migration {migration.version:04d}_{migration.name}')
+        try:
+            if apply_migration(conn, migration, batch_size):
+                applied.append(migration)
+        except Exception as e:
+            raise MigrationError(f'Migration {migration.version:04d}_{migration.name} failed: {e}') from e
+    return applied
+
+
+def migration_status(conn: sqlite3.Connection, directory: str = MIGRATIONS_DIR) -> List[Dict]:
+    """各迁移的执行状态"""
+    ensure_version_table(conn)
+    applied = applied_versions(conn)
+    status = []
+    for migration in discover_migrations(directory):
+        record = applied.get(migration.version)
+        status.append({
+            'version': migration.version,
+            'name': migration.name,
+            'applied_at': record['applied_at'] if record else None,
+            'duration_ms': record['duration_ms'] if record else None,
+            'modified': bool(record) and record['checksum'] != migration.checksum,
+        })
+    return status
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    show_status = '--status' in argv
+    args = [arg for arg in argv if not arg.startswith('--')]
+    database = args[0] if args else 'database.db'
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(database, timeout=30)
+    try:
+        if not show_status:
+            applied = run_migrations(conn)
+            print(f'{len(applied)} migration(s) applied')
+        for item in migration_status(conn):
+            state = item['applied_at'] or 'pending'
+            note = ' (modified since applied)' if item['modified'] else ''
+            print(f"{item['version']:04d}_{item['name']:<32} {state}{note}")
+    except MigrationError as e:
+        print(e)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+产品全文检索索引
+Product Full-Text Search Index
+
+基于SQLite FTS5 (trigram分词，中英文子串均可匹配) 的产品检索索引，
+由 products 表上的触发器保持同步
+SQLite FTS5 index over the product text fields (trigram tokenizer, so both
+English and Chinese substrings match), kept in sync by triggers on products
+
+另提供内存前缀索引，用于输入联想 (/api/search/suggest)
+Also provides the in-memory prefix index behind /api/search/suggest
+"""
+
+import bisect
+import sqlite3
+import threading
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 索引字段顺序 (bm25 权重按此顺序传入)
+FTS_COLUMNS = ('sku', 'pixel_pitch', 'name_en', 'name_zh', 'description_en', 'description_zh')
+
+# 字段权重: SKU > 像素间距/名称 > 描述
+BM25_WEIGHTS = (10.0, 4.0, 5.0, 5.0, 1.0, 1.0)
+
+# trigram 分词器至少需要3个字符才能使用索引
+MIN_QUERY_LENGTH = 3
+
+LANGUAGE_COLUMNS = {
+    'en': ('name_en', 'description_en'),
+    'zh': ('name_zh', 'description_zh'),
+}
+
+_fts_available: Optional[bool] = None
+
+
+def rebuild_search_index(conn: sqlite3.Connection):
+    """从 products 表完整重建索引"""
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def fts_available(conn: sqlite3.Connection) -> bool:
+    """当前数据库是否可使用FTS5索引"""
+    global _fts_available
+
+    if _fts_available is None:
+        _fts_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ).fetchone() is not None
+    return _fts_available
+
+
+def build_match_query(query: str, language: str = 'en') -> Optional[str]:
+    """构造 MATCH 表达式: 按语言限定检索字段，整个查询作为子串短语匹配
+
+    查询过短 (trigram 无法使用索引) 时返回 None
+    """
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return None
+
+    columns = ('sku', 'pixel_pitch') + LANGUAGE_COLUMNS.get(language, ())
+    phrase = '"' + query.replace('"', '""') + '"'
+    return '{' + ' '.join(columns) + '} : ' + phrase
+
+
+# ================================================================
+# 输入联想 / Typeahead Suggestions
+# ================================================================
+
+# 建议类型排序优先级
+SUGGESTION_TYPE_PRIORITY = {'sku': 0, 'name': 1, 'pixel_pitch': 2, 'category': 3}
+
+# 短前缀匹配过多时最多扫描的候选条数
+MAX_PREFIX_SCAN = 500
+
+
+class SuggestIndex:
+    """内存前缀索引: 排序数组 + 二分查找，数据变化时整体重建
+
+    查询完全不访问SQLite；每隔 refresh_interval 秒最多读取一次
+    data_versions 判断 products 表是否变化
+    """
+
+    def __init__(self, db_manager, refresh_interval: float = 5.0):
+        self.db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # 每种语言一个 (keys, entries) 快照，重建时整体替换
+        self._snapshots = {}
+        self._version = None
+        self._checked_at = 0.0
+        self.rebuilds = 0
+
+    def _current_version(self):
+        versions = self.db_manager.get_data_versions(('products', 'product_categories'))
+        return tuple(sorted((name, row['version']) for name, row in versions.items()))
+
+    def refresh(self, force: bool = False):
+        """必要时重建索引"""
+        now = time.monotonic()
+        if not force and self._snapshots and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and self._snapshots and now - self._checked_at < self.refresh_interval:
+                return
+            version = self._current_version()
+            self._checked_at = now
+            if force or version != self._version or not self._snapshots:
+                self._snapshots = self._build()
+                self._version = version
+                self.rebuilds += 1
+
+    def _build(self):
+        products = self.db_manager.execute_query("""
+            SELECT p.id, p.sku, p.name_en, p.name_zh, p.pixel_pitch, p.is_featured
+            FROM products p
+            WHERE p.is_active = 1
+        """)
+        categories = self.db_manager.execute_query("""
+            SELECT id, slug, name_en, name_zh FROM product_categories WHERE is_active = 1
+        """)
+
+        snapshots = {}
+        for language in LANGUAGE_COLUMNS:
+            pairs = []
+            pitches = {}
+
+            for product in products:
+                weight = 1 if product['is_featured'] else 0
+                if product['sku']:
+                    entry = ('sku', product['sku'], product['id'], weight)
+                    pairs.append((product['sku'].casefold(), entry))
+
+                name = product[f'name_{language}']
+                if name:
+                    entry = ('name', name, product['id'], weight)
+                    for key in _word_start_keys(name):
+                        pairs.append((key, entry))
+
+                pitch = product['pixel_pitch']
+                if pitch:
+                    pitches[pitch] = pitches.get(pitch, 0) + 1
+
+            for pitch, count in pitches.items():
+                entry = ('pixel_pitch', pitch, None, count)
+                key = pitch.casefold()
+                pairs.append((key, entry))
+                # 允许不带 "P" 前缀输入，如 "1.25"
+                if key.startswith('p') and len(key) > 1:
+                    pairs.append((key[1:], entry))
+
+            for category in categories:
+                name = category[f'name_{language}']
+                if name:
+                    entry = ('category', name, category['slug'], 0)
+                    for key in _word_start_keys(name):
+                        pairs.append((key, entry))
+
+            pairs.sort(key=lambda pair: pair[0])
+            snapshots[language] = ([key for key, _ in pairs], [entry for _, entry in pairs])
+
+        return snapshots
+
+    def suggest(self, prefix: str, language: str = 'en', limit: int = 10):
+        """返回前缀匹配的前K条建议"""
+        self.refresh()
+
+        prefix = ' '.join(prefix.casefold().split())
+        snapshot = self._snapshots.get(language) or self._snapshots.get('en')
+        if not prefix or not snapshot:
+            return []
+
+        keys, entries = snapshot
+        start = bisect.bisect_left(keys, prefix)
+        seen = set()
+        candidates = []
+        for position in range(start, min(start + MAX_PREFIX_SCAN, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            entry = entries[position]
+            if entry[:2] in seen:
+                continue
+            seen.add(entry[:2])
+            candidates.append(entry)
+
+        candidates.sort(key=lambda entry: (SUGGESTION_TYPE_PRIORITY[entry[0]], -entry[3], len(entry[1]), entry[1]))
+
+        suggestions = []
+        for suggestion_type, text, ref, _ in candidates[:limit]:
+            suggestion = {'type': suggestion_type, 'text': text}
+            if suggestion_type in ('sku', 'name'):
+                suggestion['product_id'] = ref
+            elif suggestion_type == 'category':
+                suggestion['category_slug'] = ref
+            suggestions.append(suggestion)
+        return suggestions
+
+
+def _word_start_keys(text: str):
+    """整段文本及每个单词起始处的后缀，如 "fine pitch led" -> "pitch led", "led"
+
+    中文名称没有空格分词，只索引整段前缀
+    """
+    words = text.casefold().split()
+    return [' '.join(words[i:]) for i in range(len(words))]
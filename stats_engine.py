@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+仪表板统计引擎
+Dashboard Statistics Engine
+
+产品/询盘的分组计数由触发器维护在 stat_counters 表中，时间窗口类指标
+用少量条件聚合查询计算；结果按数据版本短时缓存，供所有仪表板接口共用
+Per-bucket product/inquiry counts are kept current by triggers in the
+stat_counters table; time-window metrics come from a few conditional
+aggregate queries. Results are cached briefly per data version and shared
+by every dashboard endpoint
+
+图表和趋势数据读取 inquiry_daily_rollup 按日汇总表 (同样由触发器增量维护，
+可随时从 inquiries 表重建)，查询耗时与历史数据量无关
+Charts and trends read the inquiry_daily_rollup table (also maintained
+incrementally by triggers and rebuildable from inquiries), so their cost
+does not grow with history
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List
+
+from response_cache import ResponseCache
+
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 30))
+
+# 计数分桶: inquiries 为 "status|priority"，products 为 "is_active|is_featured"
+# (须与迁移 0004 中维护计数的触发器一致)
+COUNTER_BUCKETS = {
+    'inquiries': "COALESCE(status, '') || '|' || COALESCE(priority, '')",
+    'products': "COALESCE(is_active, 0) || '|' || COALESCE(is_featured, 0)",
+}
+
+REBUILD_COUNTERS_SQL = "DELETE FROM stat_counters WHERE entity IN ('inquiries', 'products');" + ''.join(
+    f"""
+INSERT INTO stat_counters (entity, bucket, count)
+    SELECT '{entity}', {bucket}, COUNT(*)
+    FROM {entity} GROUP BY 1, 2;"""
+    for entity, bucket in COUNTER_BUCKETS.items()
+)
+
+# 询盘按日汇总: 日期 × 状态 × 类型 × 优先级 × 国家，空值记为 ''
+# (须与迁移 0006 中维护汇总的触发器一致)
+ROLLUP_DIMENSIONS = ('status', 'inquiry_type', 'priority', 'country')
+
+
+def _rollup_key(ref: str) -> str:
+    return ', '.join([f"date({ref}.created_at)"] + [f"COALESCE({ref}.{column}, '')" for column in ROLLUP_DIMENSIONS])
+
+
+REBUILD_ROLLUP_SQL = f"""
+INSERT INTO inquiry_daily_rollup (
+    day, {', '.join(ROLLUP_DIMENSIONS)},
+    inquiry_count, estimated_value_sum, responded_count, response_hours_sum
+)
+SELECT {_rollup_key('i')},
+       COUNT(*), SUM(COALESCE(i.estimated_value, 0)), COUNT(i.first_response_at),
+       SUM(COALESCE((julianday(i.first_response_at) - julianday(i.created_at)) * 24, 0))
+FROM inquiries i
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+# 视为"待处理"和"已结束"的询盘状态
+PENDING_STATUSES = ('new', 'contacted')
+FINISHED_STATUSES = ('closed', 'lost')
+
+PRIORITY_ORDER = {'urgent': 0, 'high': 1, 'normal': 2, 'low': 3}
+
+
+def rebuild_stats_counters(conn: sqlite3.Connection):
+    """从 inquiries / products 表完整重建计数"""
+    for statement in REBUILD_COUNTERS_SQL.strip().split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    conn.commit()
+
+
+def rebuild_inquiry_rollup(conn: sqlite3.Connection):
+    """从 inquiries 表完整重建按日汇总"""
+    conn.execute("DELETE FROM inquiry_daily_rollup")
+    conn.execute(REBUILD_ROLLUP_SQL)
+    conn.commit()
+
+
+class StatsEngine:
+    """仪表板指标的唯一计算入口"""
+
+    def __init__(self, db_manager, ttl: float = STATS_CACHE_TTL):
+        self.db_manager = db_manager
+        self.cache = ResponseCache(ttl=ttl, max_bytes=1024 * 1024, max_entries=16)
+
+    def _cache_key(self, name: str):
+        versions = self.db_manager.get_data_versions(('inquiries', 'products', 'cases'))
+        return (name,) + tuple(sorted((table, row['version']) for table, row in versions.items()))
+
+    def _cached(self, name: str, compute):
+        key = self._cache_key(name)
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            self.cache.set(key, result, size=4096)
+        return result
+
+    def _counters(self) -> Dict:
+        rows = self.db_manager.execute_query(
+            "SELECT entity, bucket, count FROM stat_counters WHERE count != 0"
+        )
+        inquiries = {'total': 0, 'by_status': {}, 'by_priority': {}, 'open_high_priority': 0}
+        products = {'total': 0, 'active': 0, 'featured': 0}
+
+        for row in rows:
+            left, _, right = row['bucket'].partition('|')
+            count = row['count']
+            if row['entity'] == 'inquiries':
+                status, priority = left or None, right or None
+                inquiries['total'] += count
+                inquiries['by_status'][status] = inquiries['by_status'].get(status, 0) + count
+                if priority:
+                    inquiries['by_priority'][priority] = inquiries['by_priority'].get(priority, 0) + count
+                if priority == 'high' and status not in FINISHED_STATUSES:
+                    inquiries['open_high_priority'] += count
+            elif row['entity'] == 'products':
+                products['total'] += count
+                if left == '1':
+                    products['active'] += count
+                if right == '1':
+                    products['featured'] += count
+
+        products['inactive'] = products['total'] - products['active']
+        return {'inquiries': inquiries, 'products': products}
+
+    def dashboard(self) -> Dict:
+        """仪表板指标 (计数 + 时间窗口指标 + 最近询盘)"""
+        return self._cached('dashboard', self._compute_dashboard)
+
+    def _compute_dashboard(self) -> Dict:
+        counters = self._counters()
+        inquiries = counters['inquiries']
+        by_status = inquiries['by_status']
+
+        # 时间窗口指标和平均响应时间均来自按日汇总表
+        window = self.db_manager.execute_query("""
+            SELECT
+                COALESCE(SUM(CASE WHEN day >= date('now', '-7 days') AND status = 'new'
+                                  THEN inquiry_count END), 0) as new_last_7_days,
+                COALESCE(SUM(CASE WHEN day >= date('now', 'start of month') THEN inquiry_count END), 0) as monthly,
+                COALESCE(SUM(CASE WHEN day = date('now') THEN inquiry_count END), 0) as today,
+                SUM(response_hours_sum) / NULLIF(SUM(responded_count), 0) as avg_response_hours,
+                (SELECT COUNT(*) FROM cases WHERE is_published = 1) as published_cases
+            FROM inquiry_daily_rollup
+        """, fetch_one=True)
+        avg_response_time = window['avg_response_hours'] or 0
+
+        recent = self.db_manager.execute_query("""
+            SELECT i.*, u.username as assigned_user,
+                   i.created_at >= datetime('now', '-24 hours') as is_last_24_hours
+            FROM inquiries i
+            LEFT JOIN users u ON i.assigned_to = u.id
+            ORDER BY i.created_at DESC
+            LIMIT 5
+        """)
+
+        total = inquiries['total']
+        closed = by_status.get('closed', 0)
+        return {
+            'products': counters['products'],
+            'inquiries': {
+                'total': total,
+                'by_status': by_status,
+                'by_priority': inquiries['by_priority'],
+                'new': by_status.get('new', 0),
+                'new_last_7_days': window['new_last_7_days'],
+                'pending': sum(by_status.get(status, 0) for status in PENDING_STATUSES),
+                'contacted': by_status.get('contacted', 0) + by_status.get('quoted', 0),
+                'quoted': by_status.get('quoted', 0),
+                'closed': closed,
+                'high_priority': inquiries['open_high_priority'],
+                'monthly': window['monthly'],
+                'today': window['today'],
+                'conversion_rate': round(closed / total * 100, 1) if total else 0,
+            },
+            'cases': {'published': window['published_cases']},
+            'performance': {'avg_response_time': round(avg_response_time, 1)},
+            'recent_inquiries': [dict(row) for row in recent],
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def inquiry_report(self) -> Dict:
+        """询盘报表 (状态/优先级分布、月度趋势、响应时间、热门产品)"""
+        return self._cached('inquiry_report', self._compute_inquiry_report)
+
+    def _compute_inquiry_report(self) -> Dict:
+        counters = self._counters()['inquiries']
+
+        response_time = self.db_manager.execute_query("""
+            SELECT
+                SUM(response_hours_sum) / NULLIF(SUM(responded_count), 0) as avg_response_hours,
+                COALESCE(SUM(responded_count), 0) as responded_count,
+                COALESCE(SUM(inquiry_count), 0) as total_count
+            FROM inquiry_daily_rollup
+            WHERE day >= date('now', '-30 days')
+        """, fetch_one=True)
+
+        product_interests = self.db_manager.execute_query("""
+            SELECT
+                product_interest,
+                COUNT(*) as count,
+                AVG(COALESCE(estimated_value, 0)) as avg_value
+            FROM inquiries
+            WHERE product_interest IS NOT NULL AND product_interest != ''
+            GROUP BY product_interest
+            ORDER BY count DESC
+            LIMIT 10
+        """)
+
+        status_distribution = sorted(
+            ({'status': status, 'count': count} for status, count in counters['by_status'].items()),
+            key=lambda item: -item['count']
+        )
+        priority_distribution = sorted(
+            ({'priority': priority, 'count': count} for priority, count in counters['by_priority'].items()),
+            key=lambda item: PRIORITY_ORDER.get(item['priority'], len(PRIORITY_ORDER))
+        )
+
+        return {
+            'status_distribution': status_distribution,
+            'priority_distribution': priority_distribution,
+            'monthly_trend': self.monthly_trend(12),
+            'response_time': dict(response_time) if response_time else {},
+            'product_interests': [dict(row) for row in product_interests],
+        }
+
+    # ------------------------------------------------------------
+    # 图表数据 (均读取 inquiry_daily_rollup)
+    # ------------------------------------------------------------
+
+    def daily_trend(self, days: int = 7) -> List[Dict]:
+        """最近N天每日询盘数"""
+        def compute():
+            rows = self.db_manager.execute_query("""
+                SELECT day as date, SUM(inquiry_count) as count
+                FROM inquiry_daily_rollup
+                WHERE day >= date('now', ?)
+                GROUP BY day
+                HAVING SUM(inquiry_count) > 0
+                ORDER BY day
+            """, (f'-{int(days)} days',))
+            return [dict(row) for row in rows]
+        return self._cached(('daily_trend', days), compute)
+
+    def monthly_trend(self, months: int = 12) -> List[Dict]:
+        """最近N个月每月询盘数、成交数和预估金额"""
+        def compute():
+            rows = self.db_manager.execute_query("""
+                SELECT
+                    substr(day, 1, 7) as month,
+                    SUM(inquiry_count) as total,
+                    SUM(CASE WHEN status = 'closed' THEN inquiry_count ELSE 0 END) as closed,
+                    SUM(estimated_value_sum) as total_value
+                FROM inquiry_daily_rollup
+                WHERE day >= date('now', ?)
+                GROUP BY substr(day, 1, 7)
+                HAVING SUM(inquiry_count) > 0
+                ORDER BY month
+            """, (f'-{int(months)} months',))
+            return [dict(row) for row in rows]
+        return self._cached(('monthly_trend', months), compute)
+
+    def breakdown(self, dimension: str, days: int = 30) -> List[Dict]:
+        """最近N天按某一维度 (status/inquiry_type/priority/country) 的询盘数"""
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f'Unknown rollup dimension: {dimension}')
+
+        def compute():
+            rows = self.db_manager.execute_query(f"""
+                SELECT NULLIF({dimension}, '') as {dimension}, SUM(inquiry_count) as count
+                FROM inquiry_daily_rollup
+                WHERE day >= date('now', ?)
+                GROUP BY {dimension}
+                HAVING SUM(inquiry_count) > 0
+                ORDER BY count DESC
+            """, (f'-{int(days)} days',))
+            return [dict(row) for row in rows]
+        return self._cached(('breakdown', dimension, days), compute)
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
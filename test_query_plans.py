@@ -0,0 +1,36 @@
+"""
+热点查询执行计划测试
+Hot Query Plan Test
+
+在由 run_migrations 建立的临时数据库上检查 query_plans.hot_queries()，
+任何查询出现全表扫描或自动索引即失败
+Checks query_plans.hot_queries() against a temporary database built by
+run_migrations and fails when any query does a full table scan or needs
+an automatic index
+
+    python -m pytest -q test_query_plans.py
+"""
+
+import sqlite3
+
+import pytest
+
+from query_plans import check_query_plans
+from schema_migrations import run_migrations
+
+
+@pytest.fixture
+def migrated_db(tmp_path, monkeypatch):
+    # 导入 integrated_server 会在当前目录创建日志和上传目录
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect(str(tmp_path / 'query_plans.db'))
+    run_migrations(conn)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(migrated_db):
+    results = check_query_plans(migrated_db)
+    failures = [f"{result['name']}: {'; '.join(result['problems'])}" for result in results if not result['ok']]
+    assert results
+    assert not failures, '\n'.join(failures)